@@ -0,0 +1,46 @@
+# Configuración de gunicorn. Se lee sola al arrancar desde la raíz del proyecto:
+#   gunicorn
+# Todo se puede cambiar con variables de entorno (o con las opciones de la línea de comandos).
+import multiprocessing
+import os
+
+wsgi_app = 'mi_proyecto.wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Django se importa una vez en el proceso maestro y los workers nacen con fork: arrancan
+# ya cargados y comparten esa memoria. Un cambio de código necesita reiniciar el maestro
+# (con preload, kill -HUP no vuelve a importar la aplicación).
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# gthread: cada worker atiende varias peticiones a la vez con hilos (las consultas y la
+# red sueltan el GIL). Workers = núcleos, para usar toda la CPU. Cada hilo usa a lo sumo
+# una conexión a la base: con DB_POOL conviene threads <= DB_POOL_MAX, y en todo caso
+# workers * threads tiene que caber en el max_connections del servidor.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Reinicia cada worker tras max_requests peticiones (libera memoria fragmentada); el jitter
+# evita que todos se reinicien a la vez
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Con preload: se calienta una sola vez en el maestro, antes de crear los workers
+    if server.cfg.preload_app:
+        from pagina_usuario.arranque import calentar
+
+        calentar(pdf=True)
+
+
+def post_worker_init(worker):
+    # Sin preload: cada worker calienta lo suyo (sin ReportLab, que se carga al usarlo)
+    if not worker.cfg.preload_app:
+        from pagina_usuario.arranque import calentar
+
+        calentar()
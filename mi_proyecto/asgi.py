@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings')
+# Bajo ASGI, tareas, hoja de vida y PDF usan las vistas async (pagina_usuario/vistas_async.py)
+os.environ.setdefault('ROOT_URLCONF', 'mi_proyecto.urls_asgi')
 
 application = get_asgi_application()
@@ -53,25 +53,30 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya al resto de middlewares
+    'pagina_usuario.metricas.MedicionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Justo después de SecurityMiddleware: los estáticos no pasan por sesión ni autenticación
+    'pagina_usuario.estaticos.WhiteNoiseAsyncMiddleware',
+    # Antes de sesiones y autenticación: también ellas leen de la réplica o del primario
+    'pagina_usuario.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
-ROOT_URLCONF = 'mi_proyecto.urls'
+# asgi.py usa mi_proyecto.urls_asgi: las mismas rutas, con las páginas de lectura async
+ROOT_URLCONF = os.environ.get('ROOT_URLCONF', 'mi_proyecto.urls')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (ver pagina_usuario/metricas.py)
+        'BACKEND': 'pagina_usuario.metricas.PlantillasMedidas',
         # AQUÍ ESTÁ EL TRUCO:
         'DIRS': [BASE_DIR / 'pagina_usuario' / 'templates'], 
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -79,6 +84,14 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Cada plantilla se compila una vez por proceso (arranque.calentar() lo hace al
+            # iniciar el worker). Con runserver, el autoreload la vuelve a leer si cambia.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -89,13 +102,115 @@ WSGI_APPLICATION = 'mi_proyecto.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Conexiones:
+#   DB_POOL=True  -> pool de psycopg 3 en cada proceso (solo Postgres): entre DB_POOL_MIN y
+#                    DB_POOL_MAX conexiones; una petición espera hasta DB_POOL_TIMEOUT segundos
+#                    por una libre. Con N workers, N * DB_POOL_MAX tiene que caber en el
+#                    max_connections del servidor (el uso real se ve en /diagnostico/bd/).
+#   DB_POOL=False -> cada hilo mantiene su conexión abierta CONN_MAX_AGE segundos.
+# En los dos casos la conexión se verifica antes de usarla (CONN_HEALTH_CHECKS): después de
+# reiniciar Postgres no se usan conexiones muertas.
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+
+_CONEXION = {
+    # Con pool, las conexiones vuelven al pool al terminar la petición
+    'conn_max_age': 0 if DB_POOL else int(os.environ.get('CONN_MAX_AGE', 600)),
+    'conn_health_checks': True,
+}
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600
-    )
+    'default': dj_database_url.config(default=os.environ.get('DATABASE_URL'), **_CONEXION)
 }
 
+# Réplica de lectura (opcional): las peticiones leen de ella y escriben en 'default'
+# (pagina_usuario/replicas.py). Quien acaba de escribir sigue leyendo del primario durante
+# REPLICA_PIN_SEGUNDOS, que tiene que cubrir el atraso normal de la réplica.
+# Para probarlo en local con dos SQLite: migrar las dos (migrate --database replica) y
+# copiar el archivo del primario sobre el de la réplica cuando se quiera "replicar".
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+REPLICA_PIN_SEGUNDOS = int(os.environ.get('REPLICA_PIN_SEGUNDOS', 10))
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL, **_CONEXION)
+    # En los tests es la misma base que 'default'
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['pagina_usuario.replicas.RouterReplica']
+
+for _bd in DATABASES.values():
+    if DB_POOL and _bd.get('ENGINE') == 'django.db.backends.postgresql':
+        _bd.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Las que sobran se cierran tras estar ociosas; todas se renuevan cada tanto
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 60 * 10)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 60 * 60)),
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Por defecto en memoria del proceso: cada worker guarda sus propios fragmentos, pero la
+# versión de cada CV está en la base (DatosPersonales.version_cv), así que ninguno sirve
+# uno viejo. CACHE_BACKEND=file los comparte entre todos los workers.
+
+if os.environ.get('CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'hoja-de-vida',
+        }
+    }
+
+# Sesión y usuario autenticado desde la caché: dos consultas menos por petición. Por defecto
+# solo con la caché compartida: con locmem, un logout o un cambio de contraseña en un worker
+# no se vería en los demás hasta que venza la caché.
+_CACHE_COMPARTIDA = os.environ.get('CACHE_BACKEND') == 'file'
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if _CACHE_COMPARTIDA else 'django.contrib.sessions.backends.db',
+)
+# Segundos que se guarda el usuario de cada sesión (0 = no se guarda)
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60 * 5 if _CACHE_COMPARTIDA else 0))
+
+# Segundos que se guardan los fragmentos de la página del CV (hoja_vida.html)
+CV_CACHE_TIMEOUT = int(os.environ.get('CV_CACHE_TIMEOUT', 60 * 60 * 24))
+# max-age de la página pública del CV (/cv/<slug>/) en navegadores y proxies. Tras un
+# cambio, quien ya la tiene puede ver la versión anterior hasta que venza
+CV_PUBLICO_MAX_AGE = int(os.environ.get('CV_PUBLICO_MAX_AGE', 60 * 5))
+
+
+AUTHENTICATION_BACKENDS = [
+    'pagina_usuario.autenticacion.BackendConCache',
+    # Solo para las sesiones iniciadas antes de BackendConCache
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# El PBKDF2 de siempre, pero como mucho AUTH_HASH_HILOS hashes a la vez por proceso
+PASSWORD_HASHERS = [
+    'pagina_usuario.autenticacion.PBKDF2PasswordHasherAcotado',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+AUTH_HASH_HILOS = int(os.environ.get('AUTH_HASH_HILOS', 2))
+
+# Intentos de signin: cubeta de fichas por IP y por (nombre de usuario, IP) (en memoria de cada
+# proceso). RAFAGA intentos seguidos, y después POR_MINUTO por minuto.
+SIGNIN_RAFAGA_IP = int(os.environ.get('SIGNIN_RAFAGA_IP', 20))
+SIGNIN_POR_MINUTO_IP = int(os.environ.get('SIGNIN_POR_MINUTO_IP', 10))
+SIGNIN_RAFAGA_USUARIO = int(os.environ.get('SIGNIN_RAFAGA_USUARIO', 5))
+SIGNIN_POR_MINUTO_USUARIO = int(os.environ.get('SIGNIN_POR_MINUTO_USUARIO', 2))
+# Proxies propios delante de la app (Railway y Render ponen uno): la IP del cliente se toma
+# de X-Forwarded-For a esa profundidad. 0 = REMOTE_ADDR (sin proxy, o proxy que no lo agrega)
+SIGNIN_PROXIES_CONFIABLES = int(os.environ.get('SIGNIN_PROXIES_CONFIABLES', 0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -147,8 +262,72 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
-if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Igual en todos los entornos: collectstatic agrega el hash del contenido a cada nombre
+# (css/base.3f2a91c0e4b1.css) y deja al lado las versiones .gz y .br (Brotli). WhiteNoise
+# sirve la comprimida que acepte el navegador y, como el nombre cambia cuando cambia el
+# archivo, con Cache-Control immutable de 10 años. Con DEBUG, los nombres van sin hash.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'pagina_usuario.estaticos.EstaticosComprimidos'},
+}
 
 # Asegúrate de que esto no esté dentro de ninguna llave extra
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cantidad máxima de PDFs de CV que cada proceso guarda en memoria (se descartan los menos usados)
+CV_PDF_CACHE_MAX_ENTRADAS = int(os.environ.get('CV_PDF_CACHE_MAX_ENTRADAS', 128))
+# PDFs más grandes que esto no se guardan en esa caché (solo su ETag)
+CV_PDF_CACHE_MAX_BYTES_ENTRADA = int(os.environ.get('CV_PDF_CACHE_MAX_BYTES_ENTRADA', 2 * 1024 * 1024))
+# Tamaño a partir del cual el PDF en construcción pasa de memoria a un archivo temporal
+CV_PDF_SPOOL_MAX_BYTES = int(os.environ.get('CV_PDF_SPOOL_MAX_BYTES', 1024 * 1024))
+# Hilos por proceso que dibujan PDFs en las vistas async: el event loop sigue atendiendo
+# mientras tanto, y a lo sumo estos PDFs se dibujan a la vez
+CV_PDF_HILOS = int(os.environ.get('CV_PDF_HILOS', 2))
+
+# Exportación masiva de CVs (comando exportar_cvs y acción del admin)
+CV_EXPORT_PROCESOS = int(os.environ.get('CV_EXPORT_PROCESOS', os.cpu_count() or 1))
+CV_EXPORT_TAMANO_LOTE = int(os.environ.get('CV_EXPORT_TAMANO_LOTE', 200))
+# La acción del admin arma el ZIP en segundo plano en esta carpeta (None = una dentro de la
+# temporal del sistema) y se descarga desde el admin: no va a MEDIA_ROOT porque tiene datos
+# personales. Cada exportación se borra CV_EXPORT_CONSERVAR_HORAS después
+CV_EXPORT_DIR = os.environ.get('CV_EXPORT_DIR')
+CV_EXPORT_CONSERVAR_HORAS = int(os.environ.get('CV_EXPORT_CONSERVAR_HORAS', 24))
+
+# Importación masiva de CVs (comando importar_cvs y subida en el admin): candidatos por
+# lote, cada uno en su transacción. Un corte pierde a lo sumo el lote en curso
+CV_IMPORT_TAMANO_LOTE = int(os.environ.get('CV_IMPORT_TAMANO_LOTE', 500))
+
+# Resultados por página en la búsqueda de candidatos (buscar_cvs)
+CV_SEARCH_PAGE_SIZE = int(os.environ.get('CV_SEARCH_PAGE_SIZE', 20))
+
+# Tareas por tramo en cada lista del panel (el resto se pide con "Cargar más")
+TASKS_PAGE_SIZE = int(os.environ.get('TASKS_PAGE_SIZE', 20))
+# Segundos que se guardan en caché las estadísticas de tareas (se invalidan al crear o completar)
+TASKS_STATS_CACHE_TIMEOUT = int(os.environ.get('TASKS_STATS_CACHE_TIMEOUT', 60 * 10))
+
+# Adjuntos de tareas
+TASK_UPLOAD_MAX_BYTES = int(os.environ.get('TASK_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+TASK_UPLOAD_EXTENSIONES = [
+    '.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.txt', '.csv',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip',
+]
+# Carpeta de los temporales de subida (None = la del sistema)
+FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR')
+
+# Trabajo en segundo plano (mover adjuntos, etc.). En False se ejecuta dentro de la petición.
+SEGUNDO_PLANO_ASINCRONO = os.environ.get('SEGUNDO_PLANO_ASINCRONO', 'True') == 'True'
+SEGUNDO_PLANO_HILOS = int(os.environ.get('SEGUNDO_PLANO_HILOS', 2))
+
+# Medición por petición (Server-Timing y /metricas/ para Prometheus). Apagado no cuesta nada.
+METRICAS_ACTIVAS = os.environ.get('METRICAS_ACTIVAS', 'False') == 'True'
+# Si se define, /metricas/ pide "Authorization: Bearer <token>"; si no, solo lo ve el staff
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Cómo se envían los archivos de MEDIA_ROOT:
+#   'django'     -> FileResponse (sendfile vía wsgi.file_wrapper) con soporte de Range
+#   'x-accel'    -> nginx: location MEDIA_ACCEL_PREFIX { internal; alias MEDIA_ROOT/; }
+#   'x-sendfile' -> Apache mod_xsendfile / lighttpd
+MEDIA_SERVE_BACKEND = os.environ.get('MEDIA_SERVE_BACKEND', 'django')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Segundos de caché para archivos cuyo nombre no incluye el hash del contenido
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 60 * 60))
@@ -17,9 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from pagina_usuario.media import servir_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('pagina_usuario.urls')), 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Archivos subidos: con permisos (adjuntos solo para su dueño), rangos y caché
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:ruta>", servir_media, name='media'),
+]
\ No newline at end of file
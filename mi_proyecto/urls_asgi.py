@@ -0,0 +1,11 @@
+# URLs del proyecto bajo ASGI (ver asgi.py): las páginas de solo lectura usan las vistas
+# async; todo lo demás es lo mismo que en urls.py. Van primero para que tengan prioridad.
+from django.urls import path, include
+from pagina_usuario import vistas_async
+
+urlpatterns = [
+    path('tasks/', vistas_async.tasks, name='tasks'),
+    path('hojavida/', vistas_async.hoja_vida, name='hoja_vida'),
+    path('descargar-cv/', vistas_async.descargar_cv_pdf, name='descargar_cv'),
+    path('', include('mi_proyecto.urls')),
+]
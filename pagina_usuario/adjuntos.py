@@ -0,0 +1,180 @@
+import glob
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.utils import timezone
+
+from .models import Task
+from .segundo_plano import encolar
+
+logger = logging.getLogger(__name__)
+
+# Temporal ya entregado a guardar_adjunto: tarea-<pk><extensión>.subida
+_TEMPORAL_DE_TAREA = re.compile(r'^tarea-(\d+)[.]')
+
+
+class AdjuntoRecibido(UploadedFile):
+    # Archivo ya escrito en disco por SubidaConHashHandler, con su SHA-256
+    def __init__(self, ruta_temporal, sha256, name, content_type, size, charset):
+        super().__init__(open(ruta_temporal, 'rb'), name, content_type, size, charset)
+        self.ruta_temporal = ruta_temporal
+        self.sha256 = sha256
+
+
+class SubidaConHashHandler(FileUploadHandler):
+    """Escribe el adjunto por partes en un archivo temporal y calcula su hash mientras llega.
+
+    Rechaza tipos no permitidos y archivos más grandes que TASK_UPLOAD_MAX_BYTES
+    sin escribirlos; el motivo queda en request.error_subida.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._archivo = None
+        extension = os.path.splitext(self.file_name or '')[1].lower()
+        if extension not in settings.TASK_UPLOAD_EXTENSIONES:
+            self.request.error_subida = f"Tipo de archivo no permitido ({extension or 'sin extensión'})"
+            raise SkipFile()
+        if self.content_length and self.content_length > settings.TASK_UPLOAD_MAX_BYTES:
+            self._rechazar_por_tamano()
+
+        descriptor, self._ruta = tempfile.mkstemp(suffix='.subida', dir=_carpeta_temporal())
+        self._archivo = os.fdopen(descriptor, 'wb')
+        self._hash = hashlib.sha256()
+        self._tamano = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self._tamano += len(raw_data)
+        if self._tamano > settings.TASK_UPLOAD_MAX_BYTES:
+            self._descartar()
+            self._rechazar_por_tamano()
+        self._hash.update(raw_data)
+        self._archivo.write(raw_data)
+
+    def file_complete(self, file_size):
+        self._archivo.close()
+        return AdjuntoRecibido(
+            self._ruta, self._hash.hexdigest(), self.file_name, self.content_type, file_size, self.charset
+        )
+
+    def upload_interrupted(self):
+        if self._archivo is not None:
+            self._descartar()
+
+    def _rechazar_por_tamano(self):
+        limite = settings.TASK_UPLOAD_MAX_BYTES // (1024 * 1024)
+        self.request.error_subida = f"El archivo supera el máximo de {limite} MB"
+        raise SkipFile()
+
+    def _descartar(self):
+        self._archivo.close()
+        self._archivo = None
+        os.unlink(self._ruta)
+
+
+def _carpeta_temporal():
+    return settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir()
+
+
+def entregar_adjunto(task, adjunto):
+    """Encola guardar_adjunto para la tarea ya creada.
+
+    Antes renombra el temporal a tarea-<pk>: si el proceso muere con el trabajo en
+    cola (p. ej. al reciclar el worker), reintentar_adjuntos lo encuentra por el pk.
+    """
+    adjunto.close()
+    ruta = os.path.join(_carpeta_temporal(), f"tarea-{task.pk}{os.path.splitext(adjunto.name)[1].lower()}.subida")
+    os.replace(adjunto.ruta_temporal, ruta)
+    adjunto.ruta_temporal = None  # ahora lo borra guardar_adjunto
+    encolar(guardar_adjunto, task.pk, ruta, adjunto.sha256, adjunto.name)
+
+
+def descartar_temporales(request):
+    # Para el finally de la vista: borra los temporales de la petición que no se entregaron
+    for adjuntos in request.FILES.lists():
+        for adjunto in adjuntos[1]:
+            if isinstance(adjunto, AdjuntoRecibido) and adjunto.ruta_temporal:
+                adjunto.close()
+                try:
+                    os.unlink(adjunto.ruta_temporal)
+                except FileNotFoundError:
+                    pass
+                adjunto.ruta_temporal = None
+
+
+def nombre_en_almacenamiento(sha256, nombre_original):
+    # Mismo contenido => mismo nombre: un archivo repetido se guarda una sola vez
+    extension = os.path.splitext(nombre_original)[1].lower()
+    return f"tareas/{sha256[:2]}/{sha256}{extension}"
+
+
+def guardar_adjunto(task_id, ruta_temporal, sha256, nombre_original):
+    # Se ejecuta en segundo plano (segundo_plano.encolar): mueve el temporal a tareas/
+    try:
+        destino = nombre_en_almacenamiento(sha256, nombre_original)
+        if not default_storage.exists(destino):
+            with open(ruta_temporal, 'rb') as origen:
+                destino = default_storage.save(destino, File(origen))
+        Task.objects.filter(pk=task_id).update(archivo=destino, estado_archivo=Task.EstadoArchivo.LISTO)
+    except Exception:
+        Task.objects.filter(pk=task_id).update(estado_archivo=Task.EstadoArchivo.ERROR)
+        raise
+    finally:
+        os.unlink(ruta_temporal)
+
+
+def reintentar_adjuntos(minutos):
+    """Retoma los adjuntos que llevan más de `minutos` en "pendiente".
+
+    Pasa cuando el proceso se cae o se recicla (max_requests) con guardar_adjunto
+    todavía en cola. Si el temporal sigue en disco se vuelve a guardar; si no, la
+    tarea queda en ERROR. También borra los temporales de subida de esa antigüedad
+    que ya no son de ninguna tarea pendiente. Devuelve (reintentados, fallidos, borrados).
+    """
+    carpeta = _carpeta_temporal()
+    atascadas = Task.objects.filter(
+        estado_archivo=Task.EstadoArchivo.PENDIENTE, created__lt=timezone.now() - timedelta(minutes=minutos),
+    ).values_list('pk', 'archivo_sha256')
+    reintentados = fallidos = 0
+    for task_id, sha256 in atascadas:
+        temporales = glob.glob(os.path.join(glob.escape(carpeta), f"tarea-{task_id}.*"))
+        if not temporales:
+            Task.objects.filter(pk=task_id, estado_archivo=Task.EstadoArchivo.PENDIENTE).update(
+                estado_archivo=Task.EstadoArchivo.ERROR
+            )
+            fallidos += 1
+            continue
+        try:
+            guardar_adjunto(task_id, temporales[0], sha256, os.path.basename(temporales[0])[:-len('.subida')])
+        except Exception:
+            logger.exception("No se pudo guardar el adjunto de la tarea %s", task_id)
+            fallidos += 1
+        else:
+            reintentados += 1
+
+    pendientes = set(
+        Task.objects.filter(estado_archivo=Task.EstadoArchivo.PENDIENTE).values_list('pk', flat=True)
+    )
+    limite = time.time() - minutos * 60
+    borrados = 0
+    for ruta in glob.glob(os.path.join(glob.escape(carpeta), '*.subida')):
+        de_tarea = _TEMPORAL_DE_TAREA.match(os.path.basename(ruta))
+        if de_tarea and int(de_tarea.group(1)) in pendientes:
+            continue
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.unlink(ruta)
+                borrados += 1
+        except FileNotFoundError:  # lo borró guardar_adjunto mientras tanto
+            pass
+    return reintentados, fallidos, borrados
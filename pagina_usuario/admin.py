@@ -1,8 +1,27 @@
-from django.contrib import admin
+import math
+import os
+import tempfile
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from . import busqueda
+from .exportacion import estado_exportacion, exportar_en_segundo_plano, nueva_exportacion, ruta_exportacion
+from .form import BaseFormSetCV
+from .importacion import FORMATOS, importar_en_segundo_plano
 from .models import (
     DatosPersonales, ExperienciaLaboral, Curso, 
-    ProductoLaboral, ProductoAcademico, Recomendacion
+    ProductoLaboral, ProductoAcademico, Recomendacion, ImportacionCV
 )
+from .segundo_plano import encolar
 
 # ==========================================================
 # 1. CONFIGURACIÓN GLOBAL DEL PANEL DE ADMINISTRACIÓN
@@ -16,34 +35,131 @@ admin.site.site_url = '/'  # Apunta al inicio de tu web (localhost:8000/)
 # ==========================================================
 # 2. CONFIGURACIÓN DE INLINES
 # ==========================================================
-class ExperienciaInline(admin.TabularInline):
-    model = ExperienciaLaboral
+class FormSetPaginado(BaseFormSetCV):
+    # Solo carga y arma formularios para una página de filas (InlinePaginado fija la página)
+    pagina = 1
+    filas_por_pagina = 20
+    consulta = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.total_filas = queryset.count() if self.instance.pk else 0
+            self.paginas = max(math.ceil(self.total_filas / self.filas_por_pagina), 1)
+            self.pagina = min(self.pagina, self.paginas)
+            desde = (self.pagina - 1) * self.filas_por_pagina
+            self._queryset = queryset[desde:desde + self.filas_por_pagina]
+        return self._queryset
+
+    def save_existing(self, form, obj, commit=True):
+        # Igual que en editar_perfil: un autoguardado abierto con la versión anterior recibe 409
+        obj.version = F('version') + 1
+        return super().save_existing(form, obj, commit)
+
+    @classmethod
+    def parametro_pagina(cls):
+        return f'pagina_{cls.get_default_prefix()}'
+
+    def enlaces_paginas(self):
+        consulta = self.consulta.copy()
+        for numero in range(1, self.paginas + 1):
+            consulta[self.parametro_pagina()] = numero
+            yield numero, f'?{consulta.urlencode()}'
+
+
+class InlinePaginado(admin.TabularInline):
+    """TabularInline que muestra las filas de a 'filas_por_pagina', con enlaces entre páginas.
+
+    La página va en la URL (?pagina_<prefijo>=N) y el formulario se envía a esa
+    misma URL, así al guardar se validan exactamente las filas que se mostraron.
+    """
     extra = 1
+    exclude = ('version',)
+    filas_por_pagina = 20
+    formset = FormSetPaginado
+    template = 'admin/pagina_usuario/tabular_paginado.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        FormSet = super().get_formset(request, obj, **kwargs)
+        try:
+            FormSet.pagina = max(int(request.GET.get(FormSet.parametro_pagina(), 1)), 1)
+        except ValueError:
+            FormSet.pagina = 1
+        FormSet.filas_por_pagina = self.filas_por_pagina
+        FormSet.consulta = request.GET
+        return FormSet
+
 
-class CursoInline(admin.TabularInline):
+class ExperienciaInline(InlinePaginado):
+    model = ExperienciaLaboral
+
+class CursoInline(InlinePaginado):
     model = Curso
-    extra = 1
 
-class RecomendacionInline(admin.TabularInline):
+class RecomendacionInline(InlinePaginado):
     model = Recomendacion
-    extra = 1
 
-class ProductoLaboralInline(admin.TabularInline):
+class ProductoLaboralInline(InlinePaginado):
     model = ProductoLaboral
-    extra = 1
 
-class ProductoAcademicoInline(admin.TabularInline):
+class ProductoAcademicoInline(InlinePaginado):
     model = ProductoAcademico
-    extra = 1
 
 # ==========================================================
-# 3. REGISTRO DE MODELOS Y PERSONALIZACIÓN
+# 3. ACCIONES
 # ==========================================================
+@admin.action(description="Exportar CVs seleccionados (ZIP de PDFs)")
+def exportar_cvs_zip(modeladmin, request, queryset):
+    # Con miles de perfiles no entra en el timeout de gunicorn: el ZIP se arma en segundo
+    # plano, en disco, y se descarga desde el enlace del mensaje cuando está listo
+    nombre = nueva_exportacion()
+    encolar(
+        exportar_en_segundo_plano, queryset, nombre,
+        settings.CV_EXPORT_PROCESOS, settings.CV_EXPORT_TAMANO_LOTE,
+    )
+    url = reverse('admin:pagina_usuario_datospersonales_exportacion', args=[nombre])
+    modeladmin.message_user(request, format_html(
+        'Se está generando el ZIP con los CVs seleccionados. <a href="{}">Descargarlo</a> cuando esté listo.', url,
+    ))
+
+
+class ImportarCVsForm(forms.Form):
+    archivo = forms.FileField(help_text="CSV, JSON (arreglo o JSON Lines) o JSON Resume")
+    formato = forms.ChoiceField(
+        choices=[('', 'Según la extensión'), *((f, f.upper()) for f in FORMATOS)], required=False,
+    )
+
+def _copia_temporal(archivo):
+    # La subida se borra al terminar la petición, antes de que termine la importación
+    descriptor, ruta = tempfile.mkstemp(suffix='.importacion', dir=settings.FILE_UPLOAD_TEMP_DIR)
+    with os.fdopen(descriptor, 'wb') as destino:
+        for bloque in archivo.chunks():
+            destino.write(bloque)
+    return ruta
+
+# ==========================================================
+# 4. REGISTRO DE MODELOS Y PERSONALIZACIÓN
+# ==========================================================
+
+def _contar(modelo):
+    # Subconsulta por perfil: varios Count() con JOIN multiplicarían las filas entre sí
+    filas = modelo.objects.filter(perfil=OuterRef('pk')).order_by().values('perfil').annotate(n=Count('pk'))
+    return Coalesce(Subquery(filas.values('n'), output_field=IntegerField()), 0)
+
 
 @admin.register(DatosPersonales)
 class DatosPersonalesAdmin(admin.ModelAdmin):
-    list_display = ('nombres', 'apellidos', 'cedula', 'nacionalidad')
+    list_display = ('nombres', 'apellidos', 'cedula', 'nacionalidad', 'experiencias', 'cursos')
+    # Solo para que aparezca la caja de búsqueda: la consulta real la resuelve get_search_results
     search_fields = ('nombres', 'apellidos', 'cedula')
+    search_help_text = "Busca en nombre, cédula, experiencia, cursos y productos"
+    actions = [exportar_cvs_zip]
+    # Agrega el botón "Importar CVs"
+    change_list_template = 'admin/pagina_usuario/datospersonales/change_list.html'
+    # Con muchos perfiles, el COUNT(*) de toda la tabla sin filtros no vale lo que cuesta
+    show_full_result_count = False
+    # Un <select> con todos los usuarios del sistema sería enorme
+    raw_id_fields = ('user',)
     # Inlines permiten editar todo desde la misma ficha del usuario
     inlines = [
         ExperienciaInline, 
@@ -53,9 +169,118 @@ class DatosPersonalesAdmin(admin.ModelAdmin):
         ProductoAcademicoInline
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            num_experiencias=_contar(ExperienciaLaboral), num_cursos=_contar(Curso),
+        )
+
+    @admin.display(description='Experiencias', ordering='num_experiencias')
+    def experiencias(self, obj):
+        return obj.num_experiencias
+
+    @admin.display(description='Cursos', ordering='num_cursos')
+    def cursos(self, obj):
+        return obj.num_cursos
+
+    def get_search_results(self, request, queryset, search_term):
+        # Índice full-text (busqueda.py) en lugar de un icontains por campo sobre toda la tabla
+        if not search_term.strip():
+            return queryset, False
+        return busqueda.filtrar(queryset, search_term), False
+
+    def get_urls(self):
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='pagina_usuario_datospersonales_importar'),
+            path(
+                'exportaciones/<str:nombre>/', self.admin_site.admin_view(self.exportacion_view),
+                name='pagina_usuario_datospersonales_exportacion',
+            ),
+            *super().get_urls(),
+        ]
+
+    def importar_view(self, request):
+        # Con archivos grandes no entra en el timeout de gunicorn: se copia a un temporal y se
+        # importa en segundo plano. El avance (estado, filas) se ve en la lista de ImportacionCV
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportarCVsForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            encolar(
+                importar_en_segundo_plano, _copia_temporal(archivo), archivo.name,
+                form.cleaned_data['formato'] or None, settings.CV_IMPORT_TAMANO_LOTE,
+            )
+            messages.success(request, (
+                f"Se está importando {archivo.name}: el avance se ve en esta lista. "
+                "Si se interrumpe, sube el mismo archivo otra vez y sigue donde quedó."
+            ))
+            return redirect('admin:pagina_usuario_importacioncv_changelist')
+        return TemplateResponse(request, 'admin/pagina_usuario/datospersonales/importar.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta, 'title': "Importar CVs", 'form': form,
+        })
+
+    def exportacion_view(self, request, nombre):
+        # Enlace del mensaje de exportar_cvs_zip: el ZIP si ya está, o cómo va
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        estado = estado_exportacion(nombre)
+        if estado is None:
+            raise Http404("La exportación no existe o ya se borró")
+        estado, detalle = estado
+        if estado == 'lista':
+            return FileResponse(
+                open(ruta_exportacion(nombre), 'rb'), as_attachment=True, filename='cvs.zip', content_type='application/zip',
+            )
+        return TemplateResponse(request, 'admin/pagina_usuario/datospersonales/exportacion.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta, 'title': "Exportar CVs", 'estado': estado, 'detalle': detalle,
+        })
+
 # Registramos los modelos individuales para permitir edición por separado
-admin.site.register(ExperienciaLaboral)
-admin.site.register(Curso)
-admin.site.register(ProductoLaboral)
-admin.site.register(ProductoAcademico)
-admin.site.register(Recomendacion)
\ No newline at end of file
+class FilaCVAdmin(admin.ModelAdmin):
+    # El perfil de cada fila viene en la misma consulta (JOIN), no una consulta por fila
+    list_select_related = ('perfil',)
+    raw_id_fields = ('perfil',)
+    show_full_result_count = False
+    list_per_page = 50
+    exclude = ('version',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.version = F('version') + 1
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(ExperienciaLaboral)
+class ExperienciaLaboralAdmin(FilaCVAdmin):
+    list_display = ('nombre_empresa', 'cargo_desempenado', 'fecha_inicio', 'fecha_fin', 'perfil')
+
+@admin.register(Curso)
+class CursoAdmin(FilaCVAdmin):
+    list_display = ('nombre_curso', 'institucion', 'horas', 'perfil')
+
+@admin.register(ProductoLaboral)
+class ProductoLaboralAdmin(FilaCVAdmin):
+    list_display = ('nombre_producto', 'descripcion', 'perfil')
+
+@admin.register(ProductoAcademico)
+class ProductoAcademicoAdmin(FilaCVAdmin):
+    list_display = ('nombre_recurso', 'descripcion', 'perfil')
+
+@admin.register(Recomendacion)
+class RecomendacionAdmin(FilaCVAdmin):
+    list_display = ('nombre_persona', 'telefono', 'perfil')
+
+
+@admin.register(ImportacionCV)
+class ImportacionCVAdmin(admin.ModelAdmin):
+    # Solo para ver el avance: las crea y actualiza importacion.py
+    list_display = ('nombre_archivo', 'estado', 'filas', 'creados', 'rechazados', 'iniciada', 'actualizada')
+    readonly_fields = list_display + ('errores', 'huella')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
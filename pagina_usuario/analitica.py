@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import ResumenDiarioTareas, Task
+
+# Ventanas que se pueden pedir (y cachear); cada una lee a lo sumo 7 * semanas filas
+SEMANAS_PERMITIDAS = (4, 12, 26, 52)
+
+
+# --- Actualización incremental ---
+# create_task/complete_task (y la API) las encolan con segundo_plano.encolar:
+# la petición no espera a que se actualice el resumen.
+
+def _sumar(user_id, dia, **incrementos):
+    cambios = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if ResumenDiarioTareas.objects.filter(user_id=user_id, dia=dia).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiarioTareas.objects.create(user_id=user_id, dia=dia, **incrementos)
+    except IntegrityError:
+        # Otro hilo creó la fila del día entre nuestro UPDATE y el INSERT
+        ResumenDiarioTareas.objects.filter(user_id=user_id, dia=dia).update(**cambios)
+
+
+def registrar_creada(user_id, creada, importante):
+    _sumar(user_id, timezone.localdate(creada), creadas=1, importantes=int(importante))
+    _invalidar(user_id)
+
+
+def registrar_completadas(user_id, momento):
+    # Las tareas que se completaron juntas comparten exactamente el mismo datecompleted
+    totales = Task.objects.filter(user_id=user_id, datecompleted=momento).aggregate(
+        n=Count('pk'), duracion=Sum(F('datecompleted') - F('created'), output_field=DurationField()),
+    )
+    if not totales['n']:
+        return
+    _sumar(
+        user_id, timezone.localdate(momento),
+        completadas=totales['n'], segundos_para_completar=int(totales['duracion'].total_seconds()),
+    )
+    _invalidar(user_id)
+
+
+def resumenes_diarios(tareas, modelo=ResumenDiarioTareas):
+    """Filas de ResumenDiarioTareas (sin guardar) calculadas desde el queryset 'tareas'.
+
+    Agrupa en la base de datos por usuario y día: solo viajan los totales, no las tareas.
+    'modelo' es para la migración que llena la tabla, que usa el modelo histórico.
+    """
+    tareas = tareas.order_by()
+    filas = {}
+
+    def fila(user_id, dia):
+        if (user_id, dia) not in filas:
+            filas[user_id, dia] = modelo(user_id=user_id, dia=dia)
+        return filas[user_id, dia]
+
+    creadas = tareas.annotate(dia=TruncDate('created')).values('user_id', 'dia').annotate(
+        n=Count('pk'), importantes=Count('pk', filter=Q(important=True)),
+    )
+    for grupo in creadas.iterator():
+        resumen = fila(grupo['user_id'], grupo['dia'])
+        resumen.creadas, resumen.importantes = grupo['n'], grupo['importantes']
+
+    completadas = tareas.filter(datecompleted__isnull=False).annotate(dia=TruncDate('datecompleted')).values(
+        'user_id', 'dia'
+    ).annotate(n=Count('pk'), duracion=Sum(F('datecompleted') - F('created'), output_field=DurationField()))
+    for grupo in completadas.iterator():
+        resumen = fila(grupo['user_id'], grupo['dia'])
+        resumen.completadas = grupo['n']
+        resumen.segundos_para_completar = int(grupo['duracion'].total_seconds())
+    return list(filas.values())
+
+
+def reconstruir(usuarios=None):
+    """Recalcula los resúmenes desde Task (comando reconstruir_analitica)."""
+    tareas = Task.objects.all()
+    if usuarios is not None:
+        tareas = tareas.filter(user__in=usuarios)
+    filas = resumenes_diarios(tareas)
+
+    with transaction.atomic():
+        anteriores = ResumenDiarioTareas.objects.all()
+        if usuarios is not None:
+            anteriores = anteriores.filter(user__in=usuarios)
+        anteriores.delete()
+        ResumenDiarioTareas.objects.bulk_create(filas, batch_size=1000)
+    for user_id in {fila.user_id for fila in filas}:
+        _invalidar(user_id)
+    return len(filas)
+
+
+# --- Lectura ---
+
+def _clave(user_id, semanas, hoy):
+    # Con la fecha en la clave, la ventana avanza sola al cambiar el día
+    return f'analitica_tareas:{user_id}:{semanas}:{hoy.isoformat()}'
+
+
+def _invalidar(user_id):
+    hoy = timezone.localdate()
+    cache.delete_many([_clave(user_id, semanas, hoy) for semanas in SEMANAS_PERMITIDAS])
+
+
+def _porcentaje(parte, total):
+    return round(100 * parte / total, 1) if total else None
+
+
+def _calcular(user_id, semanas, hoy):
+    # Desde el lunes de hace (semanas - 1) semanas hasta hoy
+    desde = hoy - timedelta(days=hoy.weekday(), weeks=semanas - 1)
+    por_semana = {
+        fila['semana']: fila
+        for fila in ResumenDiarioTareas.objects.filter(user_id=user_id, dia__gte=desde)
+        .annotate(semana=TruncWeek('dia')).values('semana')
+        .annotate(
+            creadas=Sum('creadas'), importantes=Sum('importantes'),
+            completadas=Sum('completadas'), segundos=Sum('segundos_para_completar'),
+        ).order_by('semana')
+    }
+    vacia = {'creadas': 0, 'importantes': 0, 'completadas': 0, 'segundos': 0}
+    lista = []
+    for i in range(semanas):
+        semana = desde + timedelta(weeks=i)
+        fila = por_semana.get(semana, vacia)
+        lista.append({
+            'semana': semana.isoformat(), 'creadas': fila['creadas'],
+            'completadas': fila['completadas'], 'importantes': fila['importantes'], 'segundos': fila['segundos'],
+        })
+
+    creadas = sum(s['creadas'] for s in lista)
+    completadas = sum(s['completadas'] for s in lista)
+    segundos = sum(s.pop('segundos') for s in lista)
+    return {
+        'desde': desde.isoformat(),
+        'semanas': lista,
+        'creadas': creadas,
+        'completadas': completadas,
+        'completadas_por_semana': round(completadas / semanas, 1),
+        'horas_promedio_para_completar': round(segundos / completadas / 3600, 1) if completadas else None,
+        'porcentaje_importantes': _porcentaje(sum(s['importantes'] for s in lista), creadas),
+    }
+
+
+def resumen(user_id, semanas=12):
+    """Estadísticas de las últimas 'semanas' semanas, semana por semana y en total.
+
+    Lee solo ResumenDiarioTareas (a lo sumo 7 * semanas filas) y guarda el resultado en caché.
+    """
+    hoy = timezone.localdate()
+    clave = _clave(user_id, semanas, hoy)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _calcular(user_id, semanas, hoy)
+        cache.set(clave, datos, settings.TASKS_STATS_CACHE_TIMEOUT)
+    return datos
@@ -0,0 +1,243 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.http import Http404, JsonResponse, HttpResponseNotAllowed
+from django.utils import timezone
+from django.views.decorators.http import condition, require_http_methods, require_POST
+
+from . import analitica
+from .form import FORMULARIOS_SECCION
+from .models import Task, DatosPersonales
+from .paginacion import pagina_keyset
+from .segundo_plano import encolar
+from .signals import cv_modificado
+from .views import LISTAS_TAREAS
+
+# Máximo de ids que acepta una sola petición de completar
+MAX_IDS_POR_LOTE = 500
+# Máximo de filas que acepta un autoguardado (son cambios sueltos, no la sección entera)
+MAX_FILAS_AUTOGUARDADO = 100
+
+
+def api_login_required(vista):
+    # Como login_required, pero un cliente JSON recibe 401 en vez de una redirección
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def _leer_json(request):
+    try:
+        datos = json.loads(request.body or b'{}')
+    except ValueError:
+        raise BadRequest("JSON inválido")
+    if not isinstance(datos, dict):
+        raise BadRequest("Se esperaba un objeto JSON")
+    return datos
+
+
+def _tarea_json(task):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'description': task.description,
+        'important': task.important,
+        'created': task.created.isoformat(),
+        'datecompleted': task.datecompleted.isoformat() if task.datecompleted else None,
+        'archivo': task.archivo.url if task.archivo else None,
+        'estado_archivo': task.estado_archivo,
+    }
+
+
+def _etag_tareas(request):
+    # Resumen barato (usa el índice de user) que cambia con cualquier alta, baja, tarea
+    # completada o adjunto que termina de guardarse
+    resumen = Task.objects.filter(user=request.user).aggregate(
+        total=Count('pk'), ultima=Max('pk'), creada=Max('created'), completada=Max('datecompleted'),
+        subiendo=Count('pk', filter=Q(estado_archivo=Task.EstadoArchivo.PENDIENTE)),
+    )
+    clave = json.dumps([resumen, request.GET.get('lista'), request.GET.get('cursor')], default=str)
+    return hashlib.sha256(clave.encode()).hexdigest()
+
+
+@condition(etag_func=_etag_tareas)
+def _listar_tareas(request):
+    lista = request.GET.get('lista', 'pendientes')
+    if lista not in LISTAS_TAREAS:
+        raise BadRequest("Lista desconocida")
+    _, campo, filtro = LISTAS_TAREAS[lista]
+    tareas, siguiente = pagina_keyset(
+        Task.objects.filter(user=request.user, **filtro), campo, request.GET.get('cursor'), settings.TASKS_PAGE_SIZE
+    )
+    response = JsonResponse({'tareas': [_tarea_json(t) for t in tareas], 'siguiente': siguiente})
+    # Siempre revalidar: con el ETag la respuesta es un 304 vacío si nada cambió
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _crear_tarea(request):
+    datos = _leer_json(request)
+    title = str(datos.get('title') or '').strip()
+    if not title:
+        return JsonResponse({'error': 'El título es obligatorio'}, status=400)
+    task = Task.objects.create(
+        title=title[:Task._meta.get_field('title').max_length],
+        description=str(datos.get('description') or ''),
+        important=bool(datos.get('important')),
+        user=request.user,
+    )
+    encolar(analitica.registrar_creada, request.user.pk, task.created, task.important)
+    return JsonResponse(_tarea_json(task), status=201)
+
+
+@api_login_required
+def tareas(request):
+    if request.method == 'GET':
+        return _listar_tareas(request)
+    if request.method == 'POST':
+        return _crear_tarea(request)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+
+@api_login_required
+@require_POST
+def completar_tareas(request):
+    ids = _leer_json(request).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return JsonResponse({'error': "'ids' debe ser una lista de enteros"}, status=400)
+    if len(ids) > MAX_IDS_POR_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_IDS_POR_LOTE} tareas por petición'}, status=400)
+
+    # Un solo UPDATE ... WHERE user = ... AND id IN (...): sin leer ni guardar fila por fila
+    ahora = timezone.now()
+    completadas = Task.objects.filter(
+        user=request.user, pk__in=ids, datecompleted__isnull=True
+    ).update(datecompleted=ahora)
+    if completadas:
+        encolar(analitica.registrar_completadas, request.user.pk, ahora)
+    return JsonResponse({'completadas': completadas})
+
+
+@api_login_required
+def estadisticas_tareas(request):
+    try:
+        semanas = int(request.GET.get('semanas', 12))
+    except ValueError:
+        semanas = 0
+    if semanas not in analitica.SEMANAS_PERMITIDAS:
+        return JsonResponse({'error': f'semanas debe ser uno de {list(analitica.SEMANAS_PERMITIDAS)}'}, status=400)
+    response = JsonResponse(analitica.resumen(request.user.pk, semanas))
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+def _es_entero(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _validar_filas(Formulario, filas, existentes):
+    """Valida cada fila del autoguardado con el formulario de su sección.
+
+    Devuelve (actualizar, borrar, nuevas, errores). Una fila con 'id' trae solo los
+    campos que cambiaron; se completa con los valores actuales antes de validar.
+    """
+    campos = Formulario._meta.fields
+    actualizar, borrar, nuevas, errores = [], [], [], {}
+    for indice, fila in enumerate(filas):
+        if 'id' not in fila:
+            form = Formulario(fila)
+            if form.is_valid():
+                nuevas.append(form.save(commit=False))
+            else:
+                errores[indice] = form.errors.get_json_data()
+            continue
+
+        instancia = existentes.get(fila['id'])
+        if instancia is None:
+            errores[indice] = {'id': [{'message': 'La fila no existe', 'code': 'no_existe'}]}
+        elif not _es_entero(fila.get('version')):
+            errores[indice] = {'version': [{'message': 'Falta la versión de la fila', 'code': 'required'}]}
+        elif fila.get('borrar'):
+            borrar.append((instancia.pk, fila['version']))
+        else:
+            cambios = [campo for campo in campos if campo in fila]
+            datos = {campo: getattr(instancia, campo) for campo in campos}
+            datos.update({campo: fila[campo] for campo in cambios})
+            form = Formulario(datos, instance=instancia)
+            if form.is_valid():
+                actualizar.append((instancia.pk, fila['version'], {c: form.cleaned_data[c] for c in cambios}))
+            else:
+                errores[indice] = form.errors.get_json_data()
+    return actualizar, borrar, nuevas, errores
+
+
+@api_login_required
+@require_http_methods(['PATCH'])
+def autoguardar_seccion(request, seccion):
+    """Guarda solo las filas cambiadas de una sección del CV.
+
+    Cuerpo: {"filas": [{"id": 3, "version": 2, "horas": 40}, {"id": 4, "version": 1, "borrar": true},
+    {"nombre_curso": ..., ...}]}. Una fila sin 'id' es nueva. Si otra escritura cambió una fila
+    desde que el cliente leyó su versión, no se guarda nada y se responde 409 con las versiones actuales.
+    """
+    Formulario = FORMULARIOS_SECCION.get(seccion)
+    if Formulario is None:
+        raise Http404("Sección desconocida")
+    modelo = Formulario._meta.model
+
+    filas = _leer_json(request).get('filas')
+    if not isinstance(filas, list) or not filas or not all(isinstance(f, dict) for f in filas):
+        return JsonResponse({'error': "'filas' debe ser una lista de objetos"}, status=400)
+    if len(filas) > MAX_FILAS_AUTOGUARDADO:
+        return JsonResponse({'error': f'Máximo {MAX_FILAS_AUTOGUARDADO} filas por petición'}, status=400)
+    if not all(_es_entero(f['id']) for f in filas if 'id' in f):
+        return JsonResponse({'error': "'id' debe ser un entero"}, status=400)
+
+    perfil_id = DatosPersonales.objects.filter(user=request.user).values_list('pk', flat=True).first()
+    if perfil_id is None:
+        raise Http404("Perfil no encontrado")
+    # Una sola consulta para todas las filas existentes, siempre limitada al perfil del usuario
+    existentes = modelo.objects.filter(perfil_id=perfil_id).in_bulk([f['id'] for f in filas if 'id' in f])
+
+    actualizar, borrar, nuevas, errores = _validar_filas(Formulario, filas, existentes)
+    if errores:
+        return JsonResponse({'errores': errores}, status=400)
+
+    conflictos = []
+    with transaction.atomic():
+        # UPDATE ... WHERE id = ... AND version = ...: si no toca ninguna fila, alguien guardó antes
+        for pk, version, cambios in actualizar:
+            if not modelo.objects.filter(pk=pk, version=version).update(version=F('version') + 1, **cambios):
+                conflictos.append(pk)
+        for pk, version in borrar:
+            if not modelo.objects.filter(pk=pk, version=version).delete()[0]:
+                conflictos.append(pk)
+        if conflictos:
+            transaction.set_rollback(True)
+        else:
+            for fila in nuevas:
+                fila.perfil_id = perfil_id
+            modelo.objects.bulk_create(nuevas)
+            # update() y bulk_create() no disparan señales
+            transaction.on_commit(lambda: cv_modificado(perfil_id))
+
+    if conflictos:
+        actuales = dict(modelo.objects.filter(pk__in=conflictos).values_list('pk', 'version'))
+        return JsonResponse({
+            'error': 'Otra edición guardó estas filas antes',
+            'conflictos': [{'id': pk, 'version': actuales.get(pk)} for pk in conflictos],
+        }, status=409)
+    # Las filas creadas van en el mismo orden en que llegaron, para que el cliente les asigne su id
+    return JsonResponse({
+        'actualizadas': [{'id': pk, 'version': version + 1} for pk, version, _ in actualizar],
+        'creadas': [{'id': fila.pk, 'version': fila.version} for fila in nuevas],
+        'borradas': [pk for pk, _ in borrar],
+    })
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.core.exceptions import ImproperlyConfigured
 
 
 class PaginaUsuarioConfig(AppConfig):
     name = 'pagina_usuario'
+
+    def ready(self):
+        # Registra los receptores de señales que invalidan las cachés del CV
+        from . import signals  # noqa: F401
+        from . import checks
+
+        # gunicorn no corre los system checks: un middleware repetido tiene que impedir
+        # que el worker arranque, no solo aparecer en "manage.py check"
+        errores = checks.middleware_repetido(self)
+        if errores:
+            raise ImproperlyConfigured('; '.join(error.msg for error in errores))
@@ -0,0 +1,56 @@
+import logging
+import time
+from pathlib import Path
+
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def nombres_de_plantillas(engine):
+    # Todas las plantillas que encuentran los loaders del engine (DIRS y las de cada app)
+    nombres = set()
+    for cargador in engine.template_loaders:
+        # El loader con caché envuelve a los que buscan en disco
+        for cargador_real in getattr(cargador, 'loaders', [cargador]):
+            for carpeta in cargador_real.get_dirs():
+                carpeta = Path(carpeta)
+                nombres.update(ruta.relative_to(carpeta).as_posix() for ruta in carpeta.rglob('*.html'))
+    return sorted(nombres)
+
+
+def calentar(pdf=False):
+    """Hace por adelantado lo que, si no, haría la primera petición de cada worker.
+
+    Compila todas las plantillas en el loader con caché y arma los resolvers de
+    URLs. Con pdf=True también importa ReportLab y crea los estilos del CV: conviene
+    solo en el proceso maestro de gunicorn con preload_app, donde los workers lo
+    heredan al hacer fork. No abre conexiones a la base de datos.
+    """
+    inicio = time.perf_counter()
+    plantillas = 0
+    for engine in engines.all():
+        for nombre in nombres_de_plantillas(engine.engine):
+            try:
+                engine.get_template(nombre)
+            except Exception:
+                # Una plantilla rota no debe impedir el arranque: fallará al usarla, como siempre
+                logger.exception("No se pudo compilar la plantilla %s", nombre)
+            else:
+                plantillas += 1
+
+    # Importa las vistas, compila las expresiones de las rutas y arma los índices de reverse()
+    get_resolver().reverse_dict
+
+    if pdf:
+        from . import pdf as modulo_pdf
+
+        # Importa ReportLab y crea los estilos
+        modulo_pdf.construir_historia({'username': '', 'perfil': None})
+
+    # Por si algo consultó la base: una conexión abierta no debe heredarse al hacer fork
+    connections.close_all()
+    logger.info("Arranque: %d plantillas compiladas en %.0f ms", plantillas, (time.perf_counter() - inicio) * 1000)
+    return plantillas
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+
+# --- Usuario de la sesión desde la caché ---
+
+def _clave_usuario(user_id):
+    return f'usuario_auth:{user_id}'
+
+
+def olvidar_usuario(user_id):
+    # Lo llaman las señales al guardar o borrar un User
+    cache.delete(_clave_usuario(user_id))
+
+
+class BackendConCache(ModelBackend):
+    """ModelBackend que guarda en la caché el usuario de cada sesión (AUTH_USER_CACHE_TIMEOUT).
+
+    AuthenticationMiddleware ya lo carga una sola vez por petición; con esto,
+    tampoco se consulta en cada petición. Al guardar el usuario (cambio de
+    contraseña, last_login, is_active) las señales lo sacan de la caché.
+    """
+
+    def get_user(self, user_id):
+        if not settings.AUTH_USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        clave = _clave_usuario(user_id)
+        user = cache.get(clave)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(clave, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None and username is not None and password is not None:
+            # Corta la lista de backends: ModelBackend (que sigue ahí solo para las sesiones
+            # anteriores a este backend) volvería a hashear la misma contraseña
+            raise PermissionDenied
+        return user
+
+
+# --- Hash de contraseñas en un pool acotado ---
+
+_ejecutor_hash = None
+
+
+def _obtener_ejecutor_hash():
+    global _ejecutor_hash
+    if _ejecutor_hash is None:
+        _ejecutor_hash = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_HILOS, thread_name_prefix='hash')
+    return _ejecutor_hash
+
+
+class PBKDF2PasswordHasherAcotado(PBKDF2PasswordHasher):
+    """El PBKDF2 de Django, pero a lo sumo AUTH_HASH_HILOS hashes a la vez por proceso.
+
+    Cada hash ocupa un núcleo ~0.5 s: una ráfaga de logins espera su turno en vez de
+    dejar sin CPU al resto de las peticiones. Mismo algoritmo y formato que el original.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return _obtener_ejecutor_hash().submit(super().encode, password, salt, iterations).result()
+
+
+# --- Límite de intentos de signin ---
+
+class CubetaDeFichas:
+    """Token bucket por clave, en la memoria del proceso.
+
+    Cada clave empieza con 'capacidad' fichas y recupera 'por_minuto' por minuto;
+    cada intento gasta una. Se recuerdan a lo sumo 'max_claves' (las menos usadas
+    se olvidan), así una ráfaga de nombres distintos no agota la memoria.
+    """
+
+    def __init__(self, capacidad, por_minuto, max_claves=10000, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self.por_segundo = por_minuto / 60
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self._cubetas = OrderedDict()  # clave -> (fichas, momento)
+        self._lock = threading.Lock()
+
+    def tomar(self, clave):
+        """Gasta una ficha: 0 si se puede seguir, o cuántos segundos faltan para la próxima."""
+        ahora = self.reloj()
+        with self._lock:
+            fichas, momento = self._cubetas.pop(clave, (self.capacidad, ahora))
+            fichas = min(self.capacidad, fichas + (ahora - momento) * self.por_segundo)
+            espera = 0
+            if fichas >= 1:
+                fichas -= 1
+            else:
+                espera = (1 - fichas) / self.por_segundo
+            self._cubetas[clave] = (fichas, ahora)
+            while len(self._cubetas) > self.max_claves:
+                self._cubetas.popitem(last=False)
+        return espera
+
+    def limpiar(self):
+        with self._lock:
+            self._cubetas.clear()
+
+
+# Una por proceso, como cache_pdf
+intentos_por_ip = CubetaDeFichas(settings.SIGNIN_RAFAGA_IP, settings.SIGNIN_POR_MINUTO_IP)
+intentos_por_usuario = CubetaDeFichas(settings.SIGNIN_RAFAGA_USUARIO, settings.SIGNIN_POR_MINUTO_USUARIO)
+
+
+def ip_cliente(request):
+    """IP del cliente detrás de SIGNIN_PROXIES_CONFIABLES proxies (Railway, Render: 1).
+
+    Cada proxy agrega a X-Forwarded-For la IP de quien le habló, así que la del
+    cliente es la N-ésima desde la derecha; lo que está más a la izquierda lo
+    escribe el cliente y se puede falsificar. Sin proxies, REMOTE_ADDR.
+    """
+    proxies = settings.SIGNIN_PROXIES_CONFIABLES
+    reenviadas = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and reenviadas:
+        return reenviadas[-min(proxies, len(reenviadas))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def espera_signin(request):
+    """Segundos que el cliente debe esperar antes de otro intento (0 si puede intentar).
+
+    Se consulta antes de autenticar: los intentos rechazados no llegan a hashear nada.
+    El límite por usuario es por (usuario, IP): quien prueba contraseñas de otro no
+    puede dejarlo afuera desde su propia IP.
+    """
+    ip = ip_cliente(request)
+    username = request.POST.get('username', '').strip().lower()
+    return max(
+        intentos_por_ip.tomar(ip),
+        intentos_por_usuario.tomar((username, ip)) if username else 0,
+    )
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import statistics
+from collections import defaultdict
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import analitica, busqueda
+from .autenticacion import intentos_por_ip, intentos_por_usuario
+from .models import (
+    Task, DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
+)
+from .pdf_cache import cache_pdf
+
+# Todos los usuarios generados comparten esta contraseña (se hashea una sola vez)
+CLAVE = 'clave-benchmark-123'
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carla', 'Diego', 'Lucía', 'Andrés', 'Sofía', 'Jorge']
+APELLIDOS = ['Pérez', 'Mora', 'Ríos', 'Vera', 'Cedeño', 'Zambrano', 'López', 'Intriago', 'Macías', 'Loor']
+EMPRESAS = ['ACME Software', 'Globex', 'Banco del Pacífico', 'CNT', 'Pronaca', 'Kruger', 'Sofka', 'Claro']
+CARGOS = ['Desarrollador', 'Analista', 'Líder técnico', 'QA', 'DevOps', 'Soporte', 'Arquitecto']
+CURSOS = ['Python', 'Django', 'SQL', 'Docker', 'Scrum', 'Inglés B2', 'Redes', 'Seguridad']
+INSTITUCIONES = ['UTM', 'ESPE', 'EPN', 'Platzi', 'Coursera', 'SECAP']
+
+
+def generar_datos(usuarios=20, tareas_por_usuario=200, semilla=1):
+    """Crea usuarios con perfil completo e historial de tareas, siempre iguales para la misma semilla.
+
+    Todo va con bulk_create; al final se reconstruyen el índice de búsqueda y las
+    estadísticas, que normalmente mantienen las señales.
+    """
+    azar = random.Random(semilla)
+    clave = make_password(CLAVE)
+    users = User.objects.bulk_create([User(username=f'bench{i:05d}', password=clave) for i in range(usuarios)])
+    perfiles = DatosPersonales.objects.bulk_create([
+        DatosPersonales(
+            user=user, nombres=azar.choice(NOMBRES), apellidos=azar.choice(APELLIDOS), cedula=f'{i:010d}',
+            nacionalidad='Ecuatoriana', direccion_domiciliaria='Portoviejo',
+            perfil_profesional=' '.join(azar.choices(CARGOS + CURSOS, k=30)),
+        )
+        for i, user in enumerate(users)
+    ])
+
+    filas = defaultdict(list)
+    for perfil in perfiles:
+        for _ in range(azar.randint(1, 8)):
+            inicio = date(2010, 1, 1) + timedelta(days=azar.randint(0, 5000))
+            filas[ExperienciaLaboral].append(ExperienciaLaboral(
+                perfil=perfil, nombre_empresa=azar.choice(EMPRESAS), cargo_desempenado=azar.choice(CARGOS),
+                fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=azar.randint(90, 1500)),
+            ))
+        for _ in range(azar.randint(0, 10)):
+            filas[Curso].append(Curso(
+                perfil=perfil, nombre_curso=azar.choice(CURSOS), institucion=azar.choice(INSTITUCIONES),
+                horas=azar.choice([20, 40, 60, 120]),
+            ))
+        for _ in range(azar.randint(0, 5)):
+            filas[ProductoLaboral].append(ProductoLaboral(
+                perfil=perfil, nombre_producto=f'Sistema {azar.choice(CURSOS)}', descripcion='Proyecto interno'
+            ))
+        for _ in range(azar.randint(0, 5)):
+            filas[ProductoAcademico].append(ProductoAcademico(
+                perfil=perfil, nombre_recurso=f'Artículo {azar.choice(CURSOS)}', descripcion='Publicación'
+            ))
+        for _ in range(azar.randint(0, 3)):
+            filas[Recomendacion].append(Recomendacion(
+                perfil=perfil, nombre_persona=f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}', telefono='0991234567'
+            ))
+    for modelo, objetos in filas.items():
+        modelo.objects.bulk_create(objetos, batch_size=500)
+
+    _generar_tareas(azar, users, tareas_por_usuario)
+    analitica.reconstruir()
+    busqueda.reindexar()
+    return users
+
+
+def _generar_tareas(azar, users, tareas_por_usuario):
+    # created es auto_now_add: se crean con la fecha actual y después se mueven al pasado
+    # con un UPDATE por grupo (días atrás, horas hasta completarla)
+    grupos = defaultdict(list)
+    tareas = []
+    for user in users:
+        for i in range(tareas_por_usuario):
+            tareas.append(Task(title=f'Tarea {i}', important=azar.random() < 0.2, user=user))
+            completada = azar.random() < 0.7
+            grupos[azar.randint(0, 364), azar.choice([1, 4, 24, 72]) if completada else None].append(len(tareas) - 1)
+    tareas = Task.objects.bulk_create(tareas, batch_size=1000)
+    ahora = timezone.now()
+    for (dias, horas), indices in grupos.items():
+        creada = ahora - timedelta(days=dias, hours=100)
+        Task.objects.filter(pk__in=[tareas[i].pk for i in indices]).update(
+            created=creada, datecompleted=creada + timedelta(hours=horas) if horas else None,
+        )
+
+
+def datos_editar_perfil(perfil):
+    # Lo que envía el formulario de editar_perfil sin cambios, salvo el resumen y el primer curso
+    datos = {
+        'nombres': perfil.nombres, 'apellidos': perfil.apellidos, 'cedula': perfil.cedula,
+        'nacionalidad': perfil.nacionalidad, 'direccion_domiciliaria': perfil.direccion_domiciliaria,
+        'perfil_profesional': perfil.perfil_profesional[::-1],
+    }
+    secciones = {
+        'experiencias': ['nombre_empresa', 'cargo_desempenado', 'fecha_inicio', 'fecha_fin'],
+        'cursos': ['nombre_curso', 'institucion', 'horas'],
+        'productos_lab': ['nombre_producto', 'descripcion'],
+        'productos_acad': ['nombre_recurso', 'descripcion'],
+    }
+    for prefijo, campos in secciones.items():
+        filas = list(getattr(perfil, prefijo).order_by('pk'))
+        datos.update({f'{prefijo}-TOTAL_FORMS': len(filas), f'{prefijo}-INITIAL_FORMS': len(filas)})
+        for i, fila in enumerate(filas):
+            datos.update({f'{prefijo}-{i}-id': fila.pk, f'{prefijo}-{i}-perfil': perfil.pk})
+            datos.update({f'{prefijo}-{i}-{campo}': getattr(fila, campo) or '' for campo in campos})
+    if datos['cursos-TOTAL_FORMS']:
+        datos['cursos-0-nombre_curso'] = datos['cursos-0-nombre_curso'][::-1]
+    return datos
+
+
+# --- Escenarios ---
+# (preparar, pedir): preparar(user) corre fuera de la medición y su resultado se pasa a
+# pedir(client, user, datos), que hace la petición medida.
+
+def _get(nombre_url):
+    return None, lambda client, user, datos: client.get(reverse(nombre_url))
+
+
+def _preparar_editar_perfil(user):
+    return datos_editar_perfil(DatosPersonales.objects.get(user=user))
+
+
+def _preparar_descargar_cv(user):
+    # Sin la caché de PDFs: se mide generarlo con ReportLab
+    cache_pdf.limpiar()
+
+
+def _preparar_signin(user):
+    # Todas vienen de la misma IP: el límite de intentos no es lo que se mide
+    intentos_por_ip.limpiar()
+    intentos_por_usuario.limpiar()
+
+
+ESCENARIOS = {
+    'tasks': _get('tasks'),
+    'hoja_vida': _get('hoja_vida'),
+    'editar_perfil_get': _get('editar_perfil'),
+    'editar_perfil_post': (
+        _preparar_editar_perfil, lambda client, user, datos: client.post(reverse('editar_perfil'), datos),
+    ),
+    'descargar_cv_pdf': (_preparar_descargar_cv, lambda client, user, datos: client.get(reverse('descargar_cv'))),
+    'signin': (
+        _preparar_signin, lambda client, user, datos: Client().post(reverse('signin'), {'username': user.username, 'password': CLAVE}),
+    ),
+}
+
+
+def _medir(escenario, client, user):
+    preparar, pedir = escenario
+    datos = preparar(user) if preparar else None
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = perf_counter()
+        respuesta = pedir(client, user, datos)
+        if respuesta.streaming:
+            for _ in respuesta.streaming_content:
+                pass
+        segundos = perf_counter() - inicio
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f"{user.username}: respuesta {respuesta.status_code}")
+    return segundos, len(consultas)
+
+
+def _cliente(clase, user):
+    client = clase()
+    client.force_login(user)
+    return client
+
+
+def ejecutar(users, iteraciones=30, escenarios=None):
+    """Corre cada escenario 'iteraciones' veces, rotando entre los usuarios.
+
+    Devuelve {escenario: {rps, p50_ms, p99_ms, consultas}}; 'consultas' es el
+    máximo por petición. La primera petición de cada escenario no se cuenta
+    (compila plantillas, llena cachés de Django).
+    """
+    clientes = [_cliente(Client, user) for user in users]
+
+    resultados = {}
+    for nombre in escenarios or ESCENARIOS:
+        escenario = ESCENARIOS[nombre]
+        _medir(escenario, clientes[0], users[0])
+        tiempos, consultas = [], []
+        for i in range(iteraciones):
+            segundos, n = _medir(escenario, clientes[i % len(users)], users[i % len(users)])
+            tiempos.append(segundos)
+            consultas.append(n)
+        percentiles = statistics.quantiles(tiempos, n=100, method='inclusive')
+        resultados[nombre] = {
+            'rps': round(len(tiempos) / sum(tiempos), 1),
+            'p50_ms': round(percentiles[49] * 1000, 2),
+            'p99_ms': round(percentiles[98] * 1000, 2),
+            'consultas': max(consultas),
+        }
+    return resultados
+
+
+def _percentiles(tiempos, total):
+    percentiles = statistics.quantiles(tiempos, n=100, method='inclusive')
+    return {
+        'total_s': round(total, 3), 'p50_ms': round(percentiles[49] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+    }
+
+
+def _descargar_wsgi(client):
+    try:
+        inicio = perf_counter()
+        b''.join(client.get(reverse('descargar_cv')).streaming_content)
+        return perf_counter() - inicio
+    finally:
+        connections.close_all()
+
+
+async def _descargar_asgi(client):
+    inicio = perf_counter()
+    respuesta = await client.get(reverse('descargar_cv'))
+    async for _ in respuesta.streaming_content:
+        pass
+    return perf_counter() - inicio
+
+
+def concurrencia(users, concurrentes=16):
+    """'concurrentes' descargas simultáneas del PDF (sin caché), de dos formas:
+
+    - wsgi: vistas síncronas, un hilo por petición (como gunicorn con --threads)
+    - asgi: vistas async en un solo event loop (como un worker de uvicorn), con
+      los PDFs en el pool de CV_PDF_HILOS hilos
+
+    Devuelve {modo: {total_s, p50_ms, p99_ms}}; total_s es lo que tardan todas.
+    """
+    users = [users[i % len(users)] for i in range(concurrentes)]
+    resultados = {}
+
+    clientes = [_cliente(Client, user) for user in users]
+    cache_pdf.limpiar()
+    inicio = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrentes) as hilos:
+        tiempos = list(hilos.map(_descargar_wsgi, clientes))
+    resultados['wsgi'] = _percentiles(tiempos, perf_counter() - inicio)
+
+    async def todas(clientes):
+        return await asyncio.gather(*(_descargar_asgi(client) for client in clientes))
+
+    with override_settings(ROOT_URLCONF='mi_proyecto.urls_asgi'):
+        clientes = [_cliente(AsyncClient, user) for user in users]
+        cache_pdf.limpiar()
+        inicio = perf_counter()
+        tiempos = async_to_sync(todas)(clientes)
+        resultados['asgi'] = _percentiles(tiempos, perf_counter() - inicio)
+    return resultados
+
+
+def entorno():
+    return {
+        'python': platform.python_version(), 'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version, 'maquina': platform.machine(),
+    }
+
+
+# Margen mínimo (ms) antes de dar una mediana por más lenta: en las vistas de pocos ms el
+# ruido de una corrida a otra (GC, planificador) ya supera el 25 %
+HOLGURA_MS = 5
+
+
+def comparar(resultados, linea_base, tolerancia=0.25, holgura_ms=HOLGURA_MS):
+    """Regresiones contra la línea base: más consultas, o una mediana más de 'tolerancia' veces
+    (y al menos 'holgura_ms') más lenta.
+
+    Menos consultas también se informa: la línea base quedó vieja y hay que guardarla en el
+    mismo commit que cambió la vista, o la próxima regresión pasaría sin verse.
+    """
+    regresiones = []
+    for nombre, actual in resultados.items():
+        base = linea_base.get(nombre)
+        if base is None:
+            continue
+        if actual['consultas'] > base['consultas']:
+            regresiones.append(f"{nombre}: {actual['consultas']} consultas (antes {base['consultas']})")
+        elif actual['consultas'] < base['consultas']:
+            regresiones.append(
+                f"{nombre}: {actual['consultas']} consultas, la línea base dice {base['consultas']} (usa --guardar)"
+            )
+        if actual['p50_ms'] > base['p50_ms'] + max(base['p50_ms'] * tolerancia, holgura_ms):
+            regresiones.append(f"{nombre}: p50 {actual['p50_ms']} ms (antes {base['p50_ms']} ms)")
+    return regresiones
+
+
+def leer_linea_base(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def guardar_linea_base(ruta, resultados, parametros, concurrencia=None):
+    # La concurrencia queda como referencia; comparar() no la usa
+    datos = {'parametros': parametros, 'entorno': entorno(), 'resultados': resultados}
+    if concurrencia:
+        datos['concurrencia'] = concurrencia
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo, indent=2)
+        archivo.write('\n')
@@ -0,0 +1,141 @@
+import re
+from functools import lru_cache
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from .cv import perfiles_completos
+from .exportacion import lotes_de_perfiles
+from .models import DatosPersonales, IndiceCV
+
+# Tabla FTS5 que crea la migración 0006 en SQLite
+TABLA_FTS = 'pagina_usuario_indicecv_fts'
+# Más términos no mejoran el resultado y sí encarecen la consulta
+MAX_TERMINOS = 10
+# Secciones que entran en documento(): las recomendaciones no se indexan
+SECCIONES_INDEXADAS = ('experiencias', 'cursos', 'productos_lab', 'productos_acad')
+
+
+def documento(perfil):
+    """Texto que se indexa de un perfil cargado con perfiles_completos(..., SECCIONES_INDEXADAS)."""
+    partes = [
+        perfil.nombres, perfil.apellidos, perfil.cedula or '', perfil.nacionalidad,
+        perfil.direccion_domiciliaria, perfil.perfil_profesional,
+    ]
+    for exp in perfil.experiencias.all():
+        partes += [exp.nombre_empresa, exp.cargo_desempenado]
+    for curso in perfil.cursos.all():
+        partes += [curso.nombre_curso, curso.institucion]
+    for prod in perfil.productos_lab.all():
+        partes += [prod.nombre_producto, prod.descripcion]
+    for prod in perfil.productos_acad.all():
+        partes += [prod.nombre_recurso, prod.descripcion]
+    return '\n'.join(p for p in partes if p)
+
+
+def indexar_perfil(perfil_id):
+    # Se ejecuta en segundo plano (segundo_plano.encolar) desde signals.cv_modificado
+    perfil = perfiles_completos(DatosPersonales.objects.filter(pk=perfil_id), SECCIONES_INDEXADAS).first()
+    if perfil is None:
+        IndiceCV.objects.filter(pk=perfil_id).delete()
+        return
+    IndiceCV.objects.update_or_create(perfil=perfil, defaults={'documento': documento(perfil)})
+
+
+def reindexar(queryset=None, tamano_lote=500):
+    """Reconstruye el índice por lotes (un INSERT ... ON CONFLICT DO UPDATE por lote)."""
+    if queryset is None:
+        queryset = DatosPersonales.objects.all()
+    total = 0
+    for lote in lotes_de_perfiles(queryset, tamano_lote, SECCIONES_INDEXADAS):
+        IndiceCV.objects.bulk_create(
+            [IndiceCV(perfil=perfil, documento=documento(perfil)) for perfil in lote],
+            update_conflicts=True, unique_fields=['perfil'], update_fields=['documento', 'actualizado'],
+        )
+        total += len(lote)
+    return total
+
+
+@lru_cache
+def _motor(alias):
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and TABLA_FTS in connection.introspection.table_names():
+        return 'fts5'
+    return None
+
+
+def _terminos(texto):
+    # Solo caracteres de palabra: así la consulta nunca trae operadores del motor
+    return re.findall(r'\w+', texto.lower())[:MAX_TERMINOS]
+
+
+def _consulta(motor, terminos):
+    # Todos los términos (AND), cada uno como prefijo: "desarroll" encuentra "desarrolladora"
+    if motor == 'postgresql':
+        return ' & '.join(f'{t}:*' for t in terminos)
+    return ' '.join(f'"{t}"*' for t in terminos)
+
+
+def _sql_coincidencias(motor):
+    if motor == 'postgresql':
+        return (
+            f"SELECT perfil_id FROM {IndiceCV._meta.db_table} "
+            "WHERE busqueda @@ to_tsquery('spanish', %s)"
+        )
+    return f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s"
+
+
+def filtrar(queryset, texto):
+    """Restringe un queryset de DatosPersonales a los perfiles que coinciden (sin ordenar por relevancia)."""
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset
+    motor = _motor(router.db_for_read(IndiceCV))
+    if motor is None:
+        for termino in terminos:
+            queryset = queryset.filter(indice__documento__icontains=termino)
+        return queryset
+    return queryset.filter(pk__in=RawSQL(_sql_coincidencias(motor), [_consulta(motor, terminos)]))
+
+
+def _ids_por_relevancia(motor, consulta, desde, cantidad):
+    if motor == 'postgresql':
+        sql = (
+            f"SELECT perfil_id FROM {IndiceCV._meta.db_table} "
+            "WHERE busqueda @@ to_tsquery('spanish', %s) "
+            "ORDER BY ts_rank(busqueda, to_tsquery('spanish', %s)) DESC, perfil_id LIMIT %s OFFSET %s"
+        )
+        parametros = [consulta, consulta, cantidad, desde]
+    else:
+        # En FTS5 'rank' es bm25(): cuanto menor, más relevante
+        sql = f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY rank, rowid LIMIT %s OFFSET %s"
+        parametros = [consulta, cantidad, desde]
+    with connections[router.db_for_read(IndiceCV)].cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def buscar(texto, pagina=1, tamano=20):
+    """Perfiles que coinciden con 'texto', del más al menos relevante.
+
+    Devuelve (perfiles, hay_siguiente). Se pide una fila de más en vez de un
+    COUNT(*): contar todas las coincidencias cuesta tanto como la búsqueda.
+    """
+    terminos = _terminos(texto)
+    if not terminos:
+        return [], False
+    desde = (pagina - 1) * tamano
+    motor = _motor(router.db_for_read(IndiceCV))
+    if motor is None:
+        ids = list(
+            filtrar(DatosPersonales.objects.all(), texto).order_by('pk')
+            .values_list('pk', flat=True)[desde:desde + tamano + 1]
+        )
+    else:
+        ids = _ids_por_relevancia(motor, _consulta(motor, terminos), desde, tamano + 1)
+    hay_siguiente = len(ids) > tamano
+    ids = ids[:tamano]
+    perfiles = DatosPersonales.objects.select_related('user').in_bulk(ids)
+    return [perfiles[pk] for pk in ids if pk in perfiles], hay_siguiente
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.utils.module_loading import import_string
+
+
+@register(Tags.compatibility)
+def middleware_repetido(app_configs, **kwargs):
+    """Cada middleware una sola vez en MIDDLEWARE.
+
+    Repetido, procesa cada petición dos veces (WhiteNoise, por ejemplo, buscaba el
+    archivo dos veces). También cuenta como repetido una subclase junto a su clase
+    base, como WhiteNoiseMiddleware y estaticos.WhiteNoiseAsyncMiddleware.
+    """
+    clases = []
+    for ruta in settings.MIDDLEWARE:
+        try:
+            clases.append((ruta, import_string(ruta)))
+        except ImportError:
+            continue  # De eso ya avisa Django al cargar los middlewares
+    errores = []
+    for i, (ruta, clase) in enumerate(clases):
+        for anterior, clase_anterior in clases[:i]:
+            if issubclass(clase, clase_anterior) or issubclass(clase_anterior, clase):
+                errores.append(Error(
+                    f"'{ruta}' repite a '{anterior}' en MIDDLEWARE",
+                    hint="Dejar una sola entrada.",
+                    id='pagina_usuario.E001',
+                ))
+    return errores
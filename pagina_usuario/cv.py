@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import F, Prefetch, Value, aprefetch_related_objects, prefetch_related_objects
+from django.db.models.functions import Greatest
+
+from .models import DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
+
+# Nombres de los {% cache %} de hoja_vida.html
+FRAGMENTOS_CV = ('cv_sidebar', 'cv_main')
+
+
+def _secciones_cv(secciones=None):
+    prefetches = [
+        Prefetch('experiencias', queryset=ExperienciaLaboral.objects.order_by('-fecha_inicio', '-pk')),
+        Prefetch('cursos', queryset=Curso.objects.order_by('pk')),
+        Prefetch('productos_lab', queryset=ProductoLaboral.objects.order_by('pk')),
+        Prefetch('productos_acad', queryset=ProductoAcademico.objects.order_by('pk')),
+        Prefetch('recomendaciones', queryset=Recomendacion.objects.order_by('pk')),
+    ]
+    if secciones is None:
+        return prefetches
+    return [prefetch for prefetch in prefetches if prefetch.prefetch_to in secciones]
+
+
+def perfiles_completos(queryset=None, secciones=None):
+    """Perfiles con todas sus secciones del CV ya cargadas.
+
+    Es la única forma en que la página, el PDF y el admin leen un CV: una consulta
+    para los perfiles y una por sección, sin importar cuántas filas tenga cada uno.
+    'secciones' (related_name) limita lo que se carga a lo que se va a usar.
+    """
+    if queryset is None:
+        queryset = DatosPersonales.objects.all()
+    return queryset.select_related('user').prefetch_related(*_secciones_cv(secciones))
+
+
+def completar_cv(perfil):
+    # Carga las secciones de un perfil que ya se consultó sin ellas
+    prefetch_related_objects([perfil], *_secciones_cv())
+    return perfil
+
+
+def cargar_perfil(user):
+    perfil = DatosPersonales.objects.filter(user=user).first()
+    if perfil is not None:
+        # Lo dejamos guardado en el usuario: base.html pide user.datospersonales.foto
+        user.datospersonales = perfil
+    return perfil
+
+
+def cargar_cv(user):
+    perfil = cargar_perfil(user)
+    return completar_cv(perfil) if perfil is not None else None
+
+
+# Versiones async (vistas_async.py). En el event loop no se puede consultar la base
+# perezosamente, así que también se guarda en el usuario que no tiene perfil.
+
+async def acompletar_cv(perfil):
+    await aprefetch_related_objects([perfil], *_secciones_cv())
+    return perfil
+
+
+async def acargar_perfil(user):
+    perfil = await DatosPersonales.objects.filter(user=user).afirst()
+    DatosPersonales._meta.get_field('user').remote_field.set_cached_value(user, perfil)
+    return perfil
+
+
+async def acargar_cv(user):
+    perfil = await acargar_perfil(user)
+    return await acompletar_cv(perfil) if perfil is not None else None
+
+
+# --- Versión del CV para las cachés ---
+# Vive en DatosPersonales.version_cv: la página ya carga el perfil, así que leerla no
+# cuesta una consulta y todos los workers ven el mismo valor. Las señales la cambian cada
+# vez que se guarda o borra algo del CV, así las claves viejas dejan de usarse.
+
+def incrementar_version_cv(perfil_id):
+    # Greatest con time_ns(): si un save() con el perfil leído antes escribe de vuelta una
+    # versión vieja, la siguiente igual es nueva y nunca se repite una que ya estuvo en uso
+    DatosPersonales.objects.filter(pk=perfil_id).update(
+        version_cv=Greatest(F('version_cv') + 1, Value(time.time_ns()))
+    )
+
+
+def version_de_usuario(user):
+    # (perfil_id, version_cv) del CV del usuario; (None, None) si todavía no tiene perfil
+    return DatosPersonales.objects.filter(user=user).values_list('pk', 'version_cv').first() or (None, None)
+
+
+async def aversion_de_usuario(user):
+    return await DatosPersonales.objects.filter(user=user).values_list('pk', 'version_cv').afirst() or (None, None)
+
+
+def fragmentos_cv_en_cache(perfil_id, version):
+    claves = [make_template_fragment_key(nombre, [perfil_id, version]) for nombre in FRAGMENTOS_CV]
+    return len(cache.get_many(claves)) == len(claves)
+
+
+# --- Página pública del CV (/cv/<slug>/) ---
+# Se guarda entera junto con la versión del CV con que se dibujó: cuando las señales
+# cambian la versión deja de servirse, igual que los fragmentos de hoja_vida.html.
+
+def _clave_pagina_publica(slug):
+    return f'cv_publico:{slug}'
+
+
+def pagina_publica_en_cache(slug, version):
+    entrada = cache.get(_clave_pagina_publica(slug))
+    if entrada is not None and entrada[0] == version:
+        return entrada[1]
+    return None
+
+
+def guardar_pagina_publica(slug, version, html):
+    cache.set(_clave_pagina_publica(slug), (version, html), settings.CV_CACHE_TIMEOUT)
@@ -0,0 +1,56 @@
+import os
+
+from django.db import connections
+from django.http import Http404, JsonResponse
+
+from .metricas import autorizado
+
+
+def resumen_pool(estadisticas):
+    """Lo que importa para dimensionar, a partir de ConnectionPool.get_stats() de psycopg_pool.
+
+    get_stats() omite los contadores que están en cero. Los 'pedidos' y la espera
+    se acumulan desde que arrancó el proceso.
+    """
+    tamano = estadisticas.get('pool_size', 0)
+    libres = estadisticas.get('pool_available', 0)
+    pedidos = estadisticas.get('requests_num', 0)
+    espera_ms = estadisticas.get('requests_wait_ms', 0)
+    return {
+        'minimo': estadisticas.get('pool_min', 0),
+        'maximo': estadisticas.get('pool_max', 0),
+        'abiertas': tamano,
+        'en_uso': tamano - libres,
+        'libres': libres,
+        'esperando': estadisticas.get('requests_waiting', 0),
+        'pedidos': pedidos,
+        # Pedidos que tuvieron que esperar una conexión libre, y cuánto en total
+        'pedidos_en_espera': estadisticas.get('requests_queued', 0),
+        'espera_total_ms': espera_ms,
+        'espera_promedio_ms': round(espera_ms / pedidos, 2) if pedidos else 0,
+        # Sin conexión libre dentro de DB_POOL_TIMEOUT
+        'pedidos_fallidos': estadisticas.get('requests_errors', 0),
+        # Conexiones que no pasaron la verificación al salir del pool o al volver
+        'conexiones_perdidas': estadisticas.get('connections_lost', 0) + estadisticas.get('returns_bad', 0),
+    }
+
+
+def estado_bd(alias):
+    conexion = connections[alias]
+    pool = getattr(conexion, 'pool', None)
+    return {
+        'motor': conexion.vendor,
+        'conn_max_age': conexion.settings_dict['CONN_MAX_AGE'],
+        'conn_health_checks': conexion.settings_dict['CONN_HEALTH_CHECKS'],
+        'pool': resumen_pool(pool.get_stats()) if pool is not None else None,
+    }
+
+
+def diagnostico_bd(request):
+    # Conexiones de este proceso: cada worker de gunicorn tiene su propio pool
+    if not autorizado(request):
+        raise Http404("Diagnóstico no disponible")
+    return JsonResponse({
+        'proceso': os.getpid(),
+        'bases': {alias: estado_bd(alias) for alias in connections},
+    })
@@ -0,0 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class EstaticosComprimidos(CompressedManifestStaticFilesStorage):
+    # Sin manifiesto (no se corrió collectstatic: tests, desarrollo) los nombres van sin hash
+    # en lugar de dar error; con manifiesto, un archivo que no esté en él sí es un error
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware que también funciona en modo async.
+
+    El original es solo síncrono: bajo ASGI, Django tendría que pasar cada petición
+    a un hilo para atravesarlo y las vistas async no servirían de nada. Buscar el
+    archivo es una consulta a un diccionario en memoria, así que se puede hacer en
+    el event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def _archivo(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        static_file = self._archivo(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    async def _acall(self, request):
+        static_file = self._archivo(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import re
+import secrets
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import pdf
+from .cv import perfiles_completos
+
+
+@dataclass
+class ResumenExportacion:
+    perfiles: int
+    segundos: float
+
+    @property
+    def perfiles_por_segundo(self):
+        return self.perfiles / self.segundos if self.segundos else 0.0
+
+
+def lotes_de_perfiles(queryset, tamano_lote, secciones=None):
+    # Recorremos por pk (keyset) en vez de OFFSET: cada lote es una consulta acotada
+    # y solo un lote de perfiles con sus filas relacionadas vive en memoria a la vez.
+    queryset = perfiles_completos(queryset.order_by('pk'), secciones)
+    ultimo_pk = 0
+    while True:
+        lote = list(queryset.filter(pk__gt=ultimo_pk)[:tamano_lote])
+        if not lote:
+            return
+        yield lote
+        ultimo_pk = lote[-1].pk
+
+
+def exportar_zip(queryset, destino, procesos=1, tamano_lote=100):
+    """Escribe un PDF por perfil dentro de un ZIP en 'destino' (ruta o archivo binario)."""
+    inicio = time.perf_counter()
+    total = 0
+    # 'spawn': los procesos hijos solo importan reportlab, no heredan conexiones a la base de datos
+    ejecutor = (
+        ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn'))
+        if procesos > 1 else nullcontext()
+    )
+    with ejecutor, zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        mapear = ejecutor.map if procesos > 1 else map
+        pendiente = None
+        for lote in lotes_de_perfiles(queryset, tamano_lote):
+            datos = [pdf.extraer_datos(perfil, perfil.user.username) for perfil in lote]
+            nombres = [f"{perfil.pk:06d}_{pdf.nombre_archivo(d)}" for perfil, d in zip(lote, datos)]
+            # Mientras los procesos dibujan este lote, escribimos el anterior y consultamos el siguiente
+            resultados = mapear(pdf.renderizar_bytes, datos)
+            if pendiente:
+                total += _escribir(archivo_zip, *pendiente)
+            pendiente = (nombres, resultados)
+        if pendiente:
+            total += _escribir(archivo_zip, *pendiente)
+    return ResumenExportacion(perfiles=total, segundos=time.perf_counter() - inicio)
+
+
+def _escribir(archivo_zip, nombres, resultados):
+    for nombre, contenido in zip(nombres, resultados):
+        archivo_zip.writestr(nombre, contenido)
+    return len(nombres)
+
+
+# --- Exportación en segundo plano (acción del admin) ---
+# El ZIP se escribe como <nombre>.parcial y se renombra al terminar: si existe <nombre>
+# está completo. Si falla queda <nombre>.error con el motivo.
+
+PARCIAL = '.parcial'
+ERROR = '.error'
+# Un .parcial que no se escribe hace tanto quedó cortado (worker reiniciado, por ejemplo)
+SIN_AVANCE_SEGUNDOS = 15 * 60
+_NOMBRE = re.compile(r'cvs-[0-9]{8}-[0-9]{6}-[0-9a-f]{8}\.zip')
+
+
+def _carpeta():
+    return settings.CV_EXPORT_DIR or os.path.join(tempfile.gettempdir(), 'exportaciones_cv')
+
+
+def ruta_exportacion(nombre):
+    return os.path.join(_carpeta(), nombre)
+
+
+def nueva_exportacion():
+    """Nombre (difícil de adivinar) del ZIP de una exportación nueva, que queda 'en curso'."""
+    os.makedirs(_carpeta(), exist_ok=True)
+    _borrar_vencidas()
+    nombre = f"cvs-{timezone.localtime():%Y%m%d-%H%M%S}-{secrets.token_hex(4)}.zip"
+    open(ruta_exportacion(nombre) + PARCIAL, 'wb').close()
+    return nombre
+
+
+def exportar_en_segundo_plano(queryset, nombre, procesos=1, tamano_lote=100):
+    # Se ejecuta con segundo_plano.encolar: con muchos perfiles no entra en el timeout de gunicorn
+    ruta = ruta_exportacion(nombre)
+    try:
+        exportar_zip(queryset, ruta + PARCIAL, procesos=procesos, tamano_lote=tamano_lote)
+        os.replace(ruta + PARCIAL, ruta)
+    except Exception as error:
+        with open(ruta + ERROR, 'w', encoding='utf-8') as archivo:
+            archivo.write(str(error) or error.__class__.__name__)
+        os.unlink(ruta + PARCIAL)
+        raise
+
+
+def estado_exportacion(nombre):
+    """('lista' | 'en_curso' | 'error', detalle) o None si no existe (o ya se borró)."""
+    if not _NOMBRE.fullmatch(nombre):
+        return None
+    ruta = ruta_exportacion(nombre)
+    if os.path.exists(ruta):
+        return 'lista', None
+    if os.path.exists(ruta + ERROR):
+        with open(ruta + ERROR, encoding='utf-8') as archivo:
+            return 'error', archivo.read()
+    try:
+        sin_avance = time.time() - os.path.getmtime(ruta + PARCIAL)
+    except FileNotFoundError:
+        return None
+    if sin_avance > SIN_AVANCE_SEGUNDOS:
+        return 'error', "Se interrumpió antes de terminar"
+    return 'en_curso', None
+
+
+def _borrar_vencidas():
+    limite = time.time() - settings.CV_EXPORT_CONSERVAR_HORAS * 3600
+    with os.scandir(_carpeta()) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.unlink(entrada.path)
@@ -1,5 +1,8 @@
 from django import forms
-from .models import DatosPersonales
+from django.db import transaction
+from django.db.models import F
+from django.forms import inlineformset_factory, widgets
+from .models import DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
 
 class PerfilForm(forms.ModelForm):
     class Meta:
@@ -13,4 +16,105 @@ class PerfilForm(forms.ModelForm):
             'apellidos': forms.TextInput(attrs={'class': 'form-control'}),
             'perfil_profesional': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'direccion_domiciliaria': forms.TextInput(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+class _IdPrecargado(forms.ModelChoiceField):
+    # Valida el id oculto de cada fila contra las filas que el formset ya consultó,
+    # en lugar del queryset.get() por fila que hace ModelChoiceField
+    def __init__(self, existentes, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._existentes = existentes
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self._existentes()[str(value)]
+        except KeyError:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class BaseFormSetCV(forms.BaseInlineFormSet):
+    def _filas_existentes(self):
+        if not hasattr(self, '_filas_por_pk'):
+            self._filas_por_pk = {str(fila.pk): fila for fila in self.get_queryset()}
+        return self._filas_por_pk
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        campo = form.fields[self.model._meta.pk.name]
+        form.fields[self.model._meta.pk.name] = _IdPrecargado(
+            self._filas_existentes, campo.queryset, initial=campo.initial,
+            required=False, widget=campo.widget,
+        )
+
+
+# Formsets de editar_perfil: se crean una sola vez al importar el módulo
+ExperienciaFormSet = inlineformset_factory(
+    DatosPersonales, ExperienciaLaboral, 
+    fields=['nombre_empresa', 'cargo_desempenado', 'fecha_inicio', 'fecha_fin'], 
+    widgets={
+        'fecha_inicio': widgets.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+        'fecha_fin': widgets.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+    },
+    extra=1, can_delete=True, formset=BaseFormSetCV
+)
+CursoFormSet = inlineformset_factory(DatosPersonales, Curso, fields=['nombre_curso', 'institucion', 'horas'], extra=1, can_delete=True, formset=BaseFormSetCV)
+ProdLabFormSet = inlineformset_factory(DatosPersonales, ProductoLaboral, fields=['nombre_producto', 'descripcion'], extra=1, can_delete=True, formset=BaseFormSetCV)
+ProdAcadFormSet = inlineformset_factory(DatosPersonales, ProductoAcademico, fields=['nombre_recurso', 'descripcion'], extra=1, can_delete=True, formset=BaseFormSetCV)
+
+# Formulario de cada sección para el autoguardado (api.autoguardar_seccion).
+# La clave es el related_name, que también es el prefijo de su formset en editar_perfil
+FORMULARIOS_SECCION = {
+    'experiencias': ExperienciaFormSet.form,
+    'cursos': CursoFormSet.form,
+    'productos_lab': ProdLabFormSet.form,
+    'productos_acad': ProdAcadFormSet.form,
+    'recomendaciones': forms.modelform_factory(Recomendacion, fields=['nombre_persona', 'telefono']),
+}
+
+
+def guardar_formset_en_bloque(formset):
+    """Aplica los cambios de un formset ya validado con pocas consultas.
+
+    En lugar de un INSERT/UPDATE/DELETE por fila (formset.save()), hace un
+    bulk_create, un bulk_update y un delete por modelo. Llamar dentro de
+    transaction.atomic(). bulk_* no dispara señales: quien llama debe avisar
+    del cambio (signals.cv_modificado).
+    """
+    modelo = formset.model
+    a_borrar = set(formset.deleted_forms) if formset.can_delete else set()
+    nuevos, modificados = [], []
+
+    for form in formset.initial_forms:
+        if form in a_borrar or not form.has_changed():
+            continue
+        fila = form.save(commit=False)
+        # Así un autoguardado abierto con la versión anterior recibe 409 en vez de pisar este cambio
+        fila.version = F('version') + 1
+        modificados.append(fila)
+    for form in formset.extra_forms:
+        if form in a_borrar or not form.has_changed():
+            continue
+        fila = form.save(commit=False)
+        setattr(fila, formset.fk.name, formset.instance)
+        nuevos.append(fila)
+
+    pks_a_borrar = [form.instance.pk for form in a_borrar if form.instance.pk]
+    if pks_a_borrar:
+        modelo.objects.filter(**{formset.fk.name: formset.instance, 'pk__in': pks_a_borrar}).delete()
+    if modificados:
+        modelo.objects.bulk_update(modificados, [*formset.form._meta.fields, 'version'])
+    if nuevos:
+        modelo.objects.bulk_create(nuevos)
+
+
+def guardar_perfil_completo(form, formsets):
+    # Todo o nada: el perfil y sus secciones se guardan en una sola transacción
+    with transaction.atomic():
+        perfil = form.save()
+        for formset in formsets:
+            formset.instance = perfil
+            guardar_formset_en_bloque(formset)
+        # No hace falta avisar con cv_modificado: form.save() ya dispara post_save del perfil
+    return perfil
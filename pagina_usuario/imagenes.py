@@ -0,0 +1,49 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Anchos (px) de las versiones reducidas de la foto de perfil: navbar, círculo del CV y su 2x
+ANCHOS = (96, 180, 360)
+# (formato de Pillow, extensión, tipo MIME)
+FORMATOS = (('WEBP', 'webp', 'image/webp'), ('JPEG', 'jpg', 'image/jpeg'))
+CALIDAD = 82
+
+
+def ruta_derivado(nombre_foto, ancho, extension):
+    # perfil/foto.png -> perfil/derivados/foto.png-180.webp. Se conserva la extensión de
+    # la foto: el almacenamiento solo garantiza nombres únicos con ella (foto.png y foto.jpg)
+    carpeta, archivo = os.path.split(nombre_foto)
+    return f"{carpeta}/derivados/{archivo}-{ancho}.{extension}"
+
+
+def derivados_listos(nombre_foto):
+    # El último que se genera es el JPEG más grande: si existe, existen todos
+    return default_storage.exists(ruta_derivado(nombre_foto, ANCHOS[-1], FORMATOS[-1][1]))
+
+
+def generar_derivados(perfil_id, nombre_foto):
+    # Se ejecuta en segundo plano (segundo_plano.encolar) al guardar una foto nueva
+    from PIL import Image, ImageOps
+
+    if derivados_listos(nombre_foto):
+        return
+    with default_storage.open(nombre_foto, 'rb') as archivo:
+        original = ImageOps.exif_transpose(Image.open(archivo))
+        original = original.convert('RGB')
+
+    for ancho in ANCHOS:
+        # Recorte cuadrado centrado: en la página la foto se muestra en un círculo
+        reducida = ImageOps.fit(original, (ancho, ancho), method=Image.Resampling.LANCZOS)
+        for formato, extension, _ in FORMATOS:
+            buffer = BytesIO()
+            reducida.save(buffer, formato, quality=CALIDAD, optimize=True)
+            ruta = ruta_derivado(nombre_foto, ancho, extension)
+            if default_storage.exists(ruta):
+                default_storage.delete(ruta)
+            default_storage.save(ruta, ContentFile(buffer.getvalue()))
+
+    # Las páginas en caché se generaron sin las versiones reducidas
+    from .signals import cv_modificado
+    cv_modificado(perfil_id)
@@ -0,0 +1,376 @@
+# Importación masiva de CVs desde CSV o JSON (comando importar_cvs y subida en el admin).
+#
+# El archivo se lee de a una fila: nunca está entero en memoria. Cada fila se valida con
+# las mismas reglas que editar_perfil (PerfilForm y los formularios de cada sección) y se
+# guarda por lotes: usuarios, perfiles y secciones con bulk_create, en una transacción
+# por lote junto con el avance (ImportacionCV). Volver a importar el mismo archivo
+# retoma después del último lote confirmado.
+#
+# Formatos, un candidato por fila u objeto:
+#   CSV   columnas username, email, nombres, apellidos, cedula, nacionalidad,
+#         direccion_domiciliaria, perfil_profesional; las secciones (experiencias, cursos,
+#         productos_lab, productos_acad, recomendaciones) van como arreglos JSON en su celda.
+#   JSON  arreglo de objetos o JSON Lines, con esas mismas claves (secciones como listas)
+#         o en formato JSON Resume (https://jsonresume.org/schema).
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from . import busqueda
+from .form import FORMULARIOS_SECCION, PerfilForm
+from .models import DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, ImportacionCV
+
+FORMATOS = ('csv', 'json')
+SECCIONES = tuple(FORMULARIOS_SECCION)
+# Errores de filas que se devuelven en el resumen (el total está en 'rechazados')
+MAX_ERRORES = 100
+TAMANO_BLOQUE = 64 * 1024
+# Archivos que no se pueden leer: JSON mal formado, no UTF-8 (UnicodeDecodeError es un
+# ValueError) o un CSV roto, como una celda más grande que csv.field_size_limit()
+ERRORES_DE_LECTURA = (ValueError, csv.Error)
+
+
+class PerfilImportadoForm(PerfilForm):
+    def validate_unique(self):
+        # La cédula repetida se comprueba con una consulta por lote (_guardar_lote),
+        # no con una por fila
+        pass
+
+
+@dataclass
+class ResumenImportacion:
+    filas: int = 0          # leídas en esta ejecución
+    creados: int = 0
+    rechazados: int = 0
+    omitidas: int = 0       # ya resueltas en una ejecución anterior
+    segundos: float = 0.0
+    errores: list = field(default_factory=list)  # (número de fila, mensaje)
+
+    @property
+    def filas_por_segundo(self):
+        return self.filas / self.segundos if self.segundos else 0.0
+
+    def rechazar(self, numero, mensaje):
+        self.rechazados += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((numero, mensaje))
+
+
+# --- Lectura ---
+
+def formato_de(nombre):
+    return 'csv' if nombre.lower().endswith('.csv') else 'json'
+
+
+def leer_csv(texto):
+    yield from csv.DictReader(texto)
+
+
+def leer_json(texto, tamano_bloque=TAMANO_BLOQUE):
+    """Los objetos de un arreglo JSON o de un archivo JSON Lines, de a uno.
+
+    Solo guarda en memoria el bloque leído y el objeto que se está decodificando.
+    """
+    decodificador = json.JSONDecoder()
+    buffer, pos, terminado = '', 0, False
+    while True:
+        # Lo que separa un objeto del siguiente: espacios, comas y los corchetes del arreglo
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            pos += 1
+        if pos < len(buffer):
+            try:
+                objeto, pos = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if terminado:
+                    raise
+            else:
+                yield objeto
+                continue
+        elif terminado:
+            return
+        bloque = texto.read(tamano_bloque)
+        terminado = not bloque
+        buffer, pos = buffer[pos:] + bloque, 0
+
+
+def _recortar(texto, modelo, campo):
+    # Los textos libres de JSON Resume no tienen límite; los campos del CV sí
+    return (texto or '')[:modelo._meta.get_field(campo).max_length]
+
+
+def _fecha(valor):
+    # JSON Resume admite 2020, 2020-05 y 2020-05-17
+    if not valor:
+        return ''
+    return (valor + '-01-01')[:10] if len(valor) == 4 else (valor + '-01')[:10]
+
+
+def _separar_nombre(nombre):
+    # "Ana María Pérez Gómez" -> dos nombres y el resto apellidos; con menos palabras, un nombre
+    palabras = nombre.split()
+    corte = 2 if len(palabras) >= 4 else 1
+    return ' '.join(palabras[:corte]), ' '.join(palabras[corte:])
+
+
+def desde_json_resume(cv):
+    """Un CV en formato JSON Resume con las claves de este proyecto.
+
+    No tienen equivalente: la cédula y la nacionalidad (se aceptan basics.cedula y
+    basics.nationality) ni las horas de los cursos (0). Las referencias no traen teléfono.
+    """
+    basics = cv.get('basics') or {}
+    ubicacion = basics.get('location') or {}
+    nombres, apellidos = _separar_nombre(basics.get('name') or '')
+    return {
+        'username': basics.get('username') or basics.get('email') or '',
+        'email': basics.get('email') or '',
+        'nombres': nombres,
+        'apellidos': apellidos,
+        'cedula': basics.get('cedula') or '',
+        'nacionalidad': basics.get('nationality') or ubicacion.get('countryCode') or '',
+        'direccion_domiciliaria': _recortar(
+            ', '.join(p for p in (ubicacion.get('address'), ubicacion.get('city')) if p),
+            DatosPersonales, 'direccion_domiciliaria',
+        ),
+        'perfil_profesional': _recortar(basics.get('summary'), DatosPersonales, 'perfil_profesional'),
+        'experiencias': [{
+            'nombre_empresa': _recortar(w.get('name'), ExperienciaLaboral, 'nombre_empresa'),
+            'cargo_desempenado': _recortar(w.get('position'), ExperienciaLaboral, 'cargo_desempenado'),
+            'fecha_inicio': _fecha(w.get('startDate')),
+            'fecha_fin': _fecha(w.get('endDate')),
+        } for w in cv.get('work') or []],
+        'cursos': [{
+            'nombre_curso': _recortar(' '.join(filter(None, (e.get('studyType'), e.get('area')))), Curso, 'nombre_curso'),
+            'institucion': _recortar(e.get('institution'), Curso, 'institucion'),
+            'horas': 0,
+        } for e in cv.get('education') or []],
+        'productos_lab': [{
+            'nombre_producto': _recortar(p.get('name'), ProductoLaboral, 'nombre_producto'),
+            'descripcion': _recortar(p.get('description'), ProductoLaboral, 'descripcion'),
+        } for p in cv.get('projects') or []],
+        'productos_acad': [{
+            'nombre_recurso': _recortar(p.get('name'), ProductoAcademico, 'nombre_recurso'),
+            'descripcion': _recortar(p.get('summary') or p.get('publisher'), ProductoAcademico, 'descripcion'),
+        } for p in cv.get('publications') or []],
+    }
+
+
+# --- Validación ---
+
+@dataclass
+class Candidato:
+    numero: int
+    usuario: User
+    perfil: DatosPersonales
+    secciones: dict  # related_name -> filas sin guardar
+
+
+def _mensaje(errores):
+    return '; '.join(f'{campo}: {" ".join(mensajes)}' for campo, mensajes in errores.items())
+
+
+def validar(numero, registro):
+    """Un Candidato listo para guardar, o ValidationError con el motivo."""
+    if not isinstance(registro, dict):
+        raise ValidationError("no es un objeto")
+    if 'basics' in registro:
+        registro = desde_json_resume(registro)
+
+    email = (registro.get('email') or '').strip()
+    if email:
+        validate_email(email)
+    username = (registro.get('username') or '').strip() or email
+    User._meta.get_field('username').clean(username, None)
+
+    form = PerfilImportadoForm(data=registro)
+    if not form.is_valid():
+        raise ValidationError(_mensaje(form.errors))
+
+    secciones = {}
+    for seccion in SECCIONES:
+        filas = registro.get(seccion) or []
+        if isinstance(filas, str):  # celda de un CSV
+            try:
+                filas = json.loads(filas)
+            except ValueError:
+                raise ValidationError(f"{seccion}: no es JSON válido")
+        if not isinstance(filas, list):
+            raise ValidationError(f"{seccion}: se esperaba una lista")
+        secciones[seccion] = []
+        for i, fila in enumerate(filas, 1):
+            form_fila = FORMULARIOS_SECCION[seccion](data=fila if isinstance(fila, dict) else {})
+            if not form_fila.is_valid():
+                raise ValidationError(f"{seccion} {i}: {_mensaje(form_fila.errors)}")
+            secciones[seccion].append(form_fila.instance)
+
+    usuario = User(username=username, email=email)
+    # Sin contraseña hasta que el admin les asigne una
+    usuario.set_unusable_password()
+    return Candidato(numero, usuario, form.instance, secciones)
+
+
+# --- Guardado ---
+
+def _asignar_pks(modelo, objetos, campo):
+    # Sin RETURNING (MySQL, SQLite < 3.35) bulk_create no completa los pk: se leen por 'campo'
+    if objetos and objetos[0].pk is None:
+        pks = dict(modelo.objects.filter(
+            **{f'{campo}__in': [getattr(o, campo) for o in objetos]}
+        ).values_list(campo, 'pk'))
+        for objeto in objetos:
+            objeto.pk = pks[getattr(objeto, campo)]
+
+
+def _guardar_lote(lote, importacion, filas_leidas, resumen):
+    # lote: un Candidato por fila, None en las que no pasaron la validación.
+    # Todo dentro de la transacción, también las comprobaciones: así leen del primario
+    candidatos = [c for c in lote if c is not None]
+    with transaction.atomic():
+        usados = set(User.objects.filter(
+            username__in=[c.usuario.username for c in candidatos]
+        ).values_list('username', flat=True))
+        cedulas = set(DatosPersonales.objects.filter(
+            cedula__in=[c.perfil.cedula for c in candidatos if c.perfil.cedula]
+        ).values_list('cedula', flat=True))
+
+        validos = []
+        for candidato in candidatos:
+            cedula = candidato.perfil.cedula
+            if candidato.usuario.username in usados:
+                resumen.rechazar(candidato.numero, f"el usuario {candidato.usuario.username} ya existe")
+            elif cedula and cedula in cedulas:
+                resumen.rechazar(candidato.numero, f"la cédula {cedula} ya existe")
+            else:
+                usados.add(candidato.usuario.username)
+                if cedula:
+                    cedulas.add(cedula)
+                validos.append(candidato)
+
+        usuarios = User.objects.bulk_create([c.usuario for c in validos])
+        _asignar_pks(User, usuarios, 'username')
+        for candidato in validos:
+            candidato.perfil.user = candidato.usuario
+        perfiles = DatosPersonales.objects.bulk_create([c.perfil for c in validos])
+        _asignar_pks(DatosPersonales, perfiles, 'user_id')
+
+        for seccion in SECCIONES:
+            filas = []
+            for candidato in validos:
+                for fila in candidato.secciones[seccion]:
+                    fila.perfil = candidato.perfil
+                    filas.append(fila)
+            if filas:
+                filas[0]._meta.model.objects.bulk_create(filas, batch_size=1000)
+
+        # bulk_create no dispara señales: el índice de búsqueda se arma aquí
+        if perfiles:
+            busqueda.reindexar(DatosPersonales.objects.filter(pk__in=[p.pk for p in perfiles]))
+
+        resumen.creados += len(validos)
+        importacion.filas = filas_leidas
+        importacion.creados += len(validos)
+        importacion.rechazados += len(lote) - len(validos)
+        importacion.save(update_fields=['filas', 'creados', 'rechazados', 'actualizada'])
+
+
+def huella(archivo):
+    archivo.seek(0)
+    resultado = hashlib.file_digest(archivo, 'sha256').hexdigest()
+    archivo.seek(0)
+    return resultado
+
+
+def importar(archivo, nombre, formato=None, tamano_lote=500, reiniciar=False, progreso=None):
+    """Importa los CVs de 'archivo' (binario y con seek) y devuelve (ImportacionCV, ResumenImportacion).
+
+    Si este mismo archivo ya se importó en parte, sigue después de la última fila
+    confirmada (con reiniciar=True empieza de nuevo). progreso(importacion, resumen) se
+    llama después de cada lote.
+    """
+    inicio = time.perf_counter()
+    formato = formato or formato_de(nombre)
+    importacion, _ = ImportacionCV.objects.get_or_create(huella=huella(archivo), defaults={'nombre_archivo': nombre[:255]})
+    if reiniciar:
+        importacion.filas = importacion.creados = importacion.rechazados = 0
+        importacion.errores = ''
+        importacion.estado = ImportacionCV.Estado.EN_CURSO
+        importacion.save()
+
+    resumen = ResumenImportacion(omitidas=importacion.filas)
+    if importacion.estado == ImportacionCV.Estado.TERMINADA:
+        return importacion, resumen
+    if importacion.estado == ImportacionCV.Estado.ERROR:
+        importacion.estado = ImportacionCV.Estado.EN_CURSO
+        importacion.save(update_fields=['estado', 'actualizada'])
+
+    # utf-8-sig: los CSV que guarda Excel empiezan con BOM
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    numero = 0
+    try:
+        registros = leer_csv(texto) if formato == 'csv' else leer_json(texto)
+        lote = []
+        for numero, registro in enumerate(registros, 1):
+            if numero <= importacion.filas:
+                continue
+            resumen.filas += 1
+            try:
+                lote.append(validar(numero, registro))
+            except ValidationError as error:
+                resumen.rechazar(numero, ' '.join(error.messages))
+                # Las rechazadas también cuentan para el lote: así avanza el punto de retorno
+                lote.append(None)
+            if len(lote) >= tamano_lote:
+                _guardar_lote(lote, importacion, numero, resumen)
+                lote = []
+                if progreso:
+                    progreso(importacion, resumen)
+        if lote:
+            _guardar_lote(lote, importacion, numero, resumen)
+    except Exception as error:
+        # Pase lo que pase queda en ERROR con el motivo: si no, el admin la mostraría en
+        # curso para siempre. Volver a importar el archivo sigue después del último lote
+        if isinstance(error, UnicodeDecodeError):  # se decodifica por bloques: la fila no se sabe
+            motivo = f"El archivo no está en UTF-8: {error}"
+        elif isinstance(error, ERRORES_DE_LECTURA):
+            motivo = f"Fila {numero + 1}: {error}"
+        else:
+            motivo = f"Después de la fila {importacion.filas}: {type(error).__name__}: {error}"
+        importacion.estado = ImportacionCV.Estado.ERROR
+        importacion.errores += _errores(resumen) + motivo + "\n"
+        importacion.save(update_fields=['estado', 'errores', 'actualizada'])
+        raise
+    finally:
+        # El archivo es de quien llama: que el TextIOWrapper no lo cierre
+        texto.detach()
+
+    importacion.estado = ImportacionCV.Estado.TERMINADA
+    importacion.errores += _errores(resumen)
+    importacion.save(update_fields=['estado', 'errores', 'actualizada'])
+    resumen.segundos = time.perf_counter() - inicio
+    return importacion, resumen
+
+
+def _errores(resumen):
+    return ''.join(f"Fila {numero}: {mensaje}\n" for numero, mensaje in resumen.errores)
+
+
+def importar_en_segundo_plano(ruta, nombre, formato=None, tamano_lote=500):
+    # La encola la subida del admin (segundo_plano.encolar): 'ruta' es una copia temporal
+    # del archivo, que se borra al terminar. El avance y los errores quedan en ImportacionCV;
+    # los que no son del archivo se propagan para que segundo_plano los registre
+    try:
+        with open(ruta, 'rb') as archivo:
+            importar(archivo, nombre, formato=formato, tamano_lote=tamano_lote)
+    except ERRORES_DE_LECTURA:
+        pass  # ya quedó en ImportacionCV.errores
+    finally:
+        os.unlink(ruta)
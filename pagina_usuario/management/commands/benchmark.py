@@ -0,0 +1,87 @@
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from pagina_usuario import benchmark
+
+LINEA_BASE = settings.BASE_DIR / 'benchmarks' / 'linea_base.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide rps, p50/p99 y consultas de las vistas principales con datos generados, en una base "
+        "de datos temporal (la de tests: SQLite en memoria), y compara con la línea base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=20)
+        parser.add_argument('--tareas', type=int, default=200, help="Tareas por usuario")
+        parser.add_argument('--iteraciones', type=int, default=30, help="Peticiones medidas por escenario")
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--escenario', action='append', choices=list(benchmark.ESCENARIOS), dest='escenarios')
+        parser.add_argument(
+            '--concurrentes', type=int, default=16,
+            help="Descargas simultáneas del PDF para comparar WSGI con ASGI (0 = no medir)",
+        )
+        parser.add_argument('--linea-base', default=str(LINEA_BASE))
+        parser.add_argument('--guardar', action='store_true', help="Guarda el resultado como nueva línea base")
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25, help="Cuánto más lenta puede ser la mediana (0.25 = 25%%)"
+        )
+
+    def handle(self, *args, **options):
+        parametros = {
+            'usuarios': options['usuarios'], 'tareas': options['tareas'],
+            'iteraciones': options['iteraciones'], 'semilla': options['semilla'],
+        }
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Sin DEBUG (como en producción); el trabajo en segundo plano se hace en el mismo
+            # hilo porque la base en memoria no se comparte bien entre hilos
+            with override_settings(DEBUG=False, SEGUNDO_PLANO_ASINCRONO=False):
+                cache.clear()
+                inicio = time.perf_counter()
+                users = benchmark.generar_datos(options['usuarios'], options['tareas'], options['semilla'])
+                self.stdout.write(f"Datos generados en {time.perf_counter() - inicio:.1f}s")
+                resultados = benchmark.ejecutar(users, options['iteraciones'], options['escenarios'])
+                concurrencia = None
+                if options['concurrentes']:
+                    concurrencia = benchmark.concurrencia(users, options['concurrentes'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        self.stdout.write(f"{'escenario':<20}{'rps':>8}{'p50 ms':>10}{'p99 ms':>10}{'consultas':>11}")
+        for nombre, r in resultados.items():
+            self.stdout.write(f"{nombre:<20}{r['rps']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['consultas']:>11}")
+
+        if concurrencia:
+            self.stdout.write(f"\n{options['concurrentes']} descargas simultáneas del PDF:")
+            self.stdout.write(f"{'modo':<20}{'total s':>8}{'p50 ms':>10}{'p99 ms':>10}")
+            for modo, r in concurrencia.items():
+                self.stdout.write(f"{modo:<20}{r['total_s']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+        ruta = Path(options['linea_base'])
+        if options['guardar']:
+            benchmark.guardar_linea_base(ruta, resultados, parametros, concurrencia)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {ruta}"))
+            return
+        if not ruta.exists():
+            self.stdout.write(self.style.WARNING(f"No hay línea base en {ruta} (usa --guardar)"))
+            return
+
+        linea_base = benchmark.leer_linea_base(ruta)
+        if linea_base['parametros'] != parametros:
+            self.stdout.write(self.style.WARNING(
+                f"La línea base se midió con otros parámetros: {json.dumps(linea_base['parametros'])}"
+            ))
+        regresiones = benchmark.comparar(resultados, linea_base['resultados'], options['tolerancia'])
+        if regresiones:
+            raise CommandError("Regresiones respecto de la línea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la línea base"))
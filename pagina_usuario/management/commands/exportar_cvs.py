@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pagina_usuario.exportacion import exportar_zip
+from pagina_usuario.models import DatosPersonales
+
+
+class Command(BaseCommand):
+    help = "Exporta el CV en PDF de todos los perfiles a un archivo ZIP."
+
+    def add_arguments(self, parser):
+        parser.add_argument('destino', help="Ruta del archivo ZIP a generar")
+        parser.add_argument(
+            '--procesos', type=int, default=settings.CV_EXPORT_PROCESOS,
+            help="Procesos que dibujan PDFs en paralelo (1 = sin pool)",
+        )
+        parser.add_argument(
+            '--lote', type=int, default=settings.CV_EXPORT_TAMANO_LOTE,
+            help="Perfiles que se consultan por lote",
+        )
+
+    def handle(self, *args, **options):
+        resumen = exportar_zip(
+            DatosPersonales.objects.all(), options['destino'],
+            procesos=options['procesos'], tamano_lote=options['lote'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen.perfiles} perfiles exportados a {options['destino']} en {resumen.segundos:.2f}s "
+            f"({resumen.perfiles_por_segundo:.1f} perfiles/s)"
+        ))
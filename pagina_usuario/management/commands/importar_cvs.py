@@ -0,0 +1,52 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pagina_usuario.importacion import ERRORES_DE_LECTURA, FORMATOS, importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa CVs desde un CSV o JSON (arreglo, JSON Lines o JSON Resume) sin cargar el archivo "
+        "en memoria. Si se corta, volver a ejecutarlo con el mismo archivo sigue donde quedó."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo a importar")
+        parser.add_argument('--formato', choices=FORMATOS, help="Por defecto, según la extensión")
+        parser.add_argument(
+            '--lote', type=int, default=settings.CV_IMPORT_TAMANO_LOTE,
+            help="Candidatos que se guardan por transacción",
+        )
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help="Empezar desde la primera fila aunque el archivo ya se haya importado (en parte)",
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f"No existe el archivo {ruta}")
+
+        def progreso(importacion, resumen):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  fila {importacion.filas}: {resumen.creados} creados, {resumen.rechazados} rechazados")
+
+        with open(ruta, 'rb') as archivo:
+            try:
+                importacion, resumen = importar(
+                    archivo, os.path.basename(ruta), formato=options['formato'],
+                    tamano_lote=options['lote'], reiniciar=options['reiniciar'], progreso=progreso,
+                )
+            except ERRORES_DE_LECTURA as error:  # JSON mal formado, no UTF-8 o CSV roto
+                raise CommandError(f"No se pudo leer {ruta}: {error}")
+
+        for numero, mensaje in resumen.errores:
+            self.stderr.write(f"Fila {numero}: {mensaje}")
+        if resumen.omitidas:
+            self.stdout.write(f"Se omitieron {resumen.omitidas} filas ya importadas antes.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen.creados} perfiles creados y {resumen.rechazados} filas rechazadas en {resumen.segundos:.2f}s "
+            f"({resumen.filas_por_segundo:.1f} filas/s)"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pagina_usuario.analitica import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde las tareas los resúmenes diarios de las estadísticas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, action='append', dest='usuarios', help="Id de usuario (repetible)")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        filas = reconstruir(options['usuarios'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{filas} resúmenes diarios generados en {time.perf_counter() - inicio:.2f}s"
+        ))
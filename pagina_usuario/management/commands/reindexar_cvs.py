@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pagina_usuario.busqueda import reindexar
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de CVs (después de migrar o de cargas masivas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Perfiles que se indexan por lote")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = reindexar(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} perfiles indexados en {time.perf_counter() - inicio:.2f}s"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from pagina_usuario.adjuntos import reintentar_adjuntos
+
+
+class Command(BaseCommand):
+    help = (
+        "Retoma los adjuntos de tareas que quedaron en \"pendiente\" (p. ej. si el worker se recicló "
+        "antes de guardarlos) y borra los temporales de subida abandonados. Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos', type=int, default=15,
+            help="Antigüedad a partir de la cual un adjunto pendiente se da por atascado",
+        )
+
+    def handle(self, *args, **options):
+        reintentados, fallidos, borrados = reintentar_adjuntos(options['minutos'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{reintentados} adjuntos guardados, {fallidos} marcados con error y {borrados} temporales borrados"
+        ))
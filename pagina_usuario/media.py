@@ -0,0 +1,129 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Task
+
+# Carpetas cuyos archivos solo puede ver su dueño
+CARPETAS_PRIVADAS = ('tareas/',)
+# Nombres que contienen el SHA-256 del contenido (ver adjuntos.nombre_en_almacenamiento)
+RE_NOMBRE_CON_HASH = re.compile(r'(^|/)[0-9a-f]{64}(\.[\w]+)?$')
+UN_ANO = 60 * 60 * 24 * 365
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _puede_ver(request, ruta):
+    if not ruta.startswith(CARPETAS_PRIVADAS):
+        return True
+    # Varios usuarios pueden compartir el mismo archivo (mismo hash): basta con que sea de una tarea suya
+    return request.user.is_authenticated and Task.objects.filter(user=request.user, archivo=ruta).exists()
+
+
+def _cache_control(ruta):
+    alcance = 'private' if ruta.startswith(CARPETAS_PRIVADAS) else 'public'
+    if RE_NOMBRE_CON_HASH.search(ruta):
+        # El nombre cambia si cambia el contenido: se puede guardar para siempre
+        return f'{alcance}, max-age={UN_ANO}, immutable'
+    return f'{alcance}, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def _rango(cabecera, tamano):
+    """(inicio, fin) inclusivo del encabezado Range, None si no aplica, o ValueError si no se puede cumplir.
+
+    Solo se atiende un rango; con varios se responde el archivo completo.
+    """
+    unidad, _, rangos = cabecera.partition('=')
+    if unidad.strip() != 'bytes' or ',' in rangos:
+        return None
+    if tamano == 0:
+        raise ValueError
+    inicio, _, fin = rangos.strip().partition('-')
+    if not inicio:
+        # bytes=-N: los últimos N bytes
+        if not fin.isdigit() or int(fin) == 0:
+            raise ValueError
+        return max(tamano - int(fin), 0), tamano - 1
+    if not inicio.isdigit() or (fin and not fin.isdigit()):
+        return None
+    inicio, fin = int(inicio), int(fin) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise ValueError
+    return inicio, min(fin, tamano - 1)
+
+
+def _leer_rango(ruta_absoluta, inicio, fin):
+    with open(ruta_absoluta, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not bloque:
+                return
+            restante -= len(bloque)
+            yield bloque
+
+
+def servir_media(request, ruta):
+    try:
+        ruta_absoluta = safe_join(settings.MEDIA_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404("Archivo no encontrado")
+    if not _puede_ver(request, ruta) or not os.path.isfile(ruta_absoluta):
+        # 404 también cuando no tiene permiso: no revelamos qué archivos existen
+        raise Http404("Archivo no encontrado")
+
+    estado = os.stat(ruta_absoluta)
+    etag = f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+    modificado = int(estado.st_mtime)
+    tipo = mimetypes.guess_type(ruta_absoluta)[0] or 'application/octet-stream'
+
+    no_modificado = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if no_modificado is not None:
+        response = no_modificado
+    elif settings.MEDIA_SERVE_BACKEND == 'x-accel':
+        # nginx envía el archivo (sendfile, rangos); Django solo decide si se puede
+        response = HttpResponse(content_type=tipo)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(ruta)
+    elif settings.MEDIA_SERVE_BACKEND == 'x-sendfile':
+        response = HttpResponse(content_type=tipo)
+        response['X-Sendfile'] = ruta_absoluta
+    else:
+        response = _respuesta_django(request, ruta_absoluta, estado.st_size, tipo, etag, modificado)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    response['Cache-Control'] = _cache_control(ruta)
+    return response
+
+
+def _respuesta_django(request, ruta_absoluta, tamano, tipo, etag, modificado):
+    cabecera = request.headers.get('Range')
+    si_rango = request.headers.get('If-Range')
+    # If-Range: si el archivo cambió desde que el cliente pidió el rango, va completo
+    if cabecera and (not si_rango or si_rango in (etag, http_date(modificado))):
+        try:
+            rango = _rango(cabecera, tamano)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{tamano}'
+            return response
+        if rango is not None:
+            inicio, fin = rango
+            response = StreamingHttpResponse(_leer_rango(ruta_absoluta, inicio, fin), status=206, content_type=tipo)
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+            response['Content-Length'] = fin - inicio + 1
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    # FileResponse usa wsgi.file_wrapper (sendfile en gunicorn) para el archivo completo
+    response = FileResponse(open(ruta_absoluta, 'rb'), content_type=tipo)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,237 @@
+# Medición de cada petición: tiempo de la vista, SQL, plantillas y PDF.
+# Con METRICAS_ACTIVAS=False el middleware no se instala (MiddlewareNotUsed) y
+# medir() solo lee una ContextVar vacía. Los histogramas viven en la memoria de
+# cada proceso: con varios workers, cada uno expone los suyos en /metricas/.
+import contextvars
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# nombre -> (descripción, buckets)
+METRICAS = {
+    'vista_segundos': ("Tiempo total de la petición hasta tener la respuesta", BUCKETS_SEGUNDOS),
+    'sql_segundos': ("Tiempo en la base de datos por petición", BUCKETS_SEGUNDOS),
+    'sql_consultas': ("Consultas SQL por petición", BUCKETS_CONSULTAS),
+    'plantillas_segundos': ("Tiempo renderizando plantillas por petición (incluye su SQL)", BUCKETS_SEGUNDOS),
+    'pdf_segundos': ("Tiempo dibujando el PDF del CV por petición", BUCKETS_SEGUNDOS),
+}
+PREFIJO = 'pagina_usuario_'
+
+_medicion_actual = contextvars.ContextVar('medicion', default=None)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        acumulado = 0
+        for limite, conteo in zip((*self.buckets, '+Inf'), self.conteos):
+            acumulado += conteo
+            yield limite, acumulado
+
+
+class Registro:
+    # Histogramas por (métrica, vista) de este proceso
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+
+    def observar(self, vista, valores):
+        with self._lock:
+            for nombre, valor in valores.items():
+                clave = (nombre, vista)
+                if clave not in self._histogramas:
+                    self._histogramas[clave] = Histograma(METRICAS[nombre][1])
+                self._histogramas[clave].observar(valor)
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+
+    def texto_prometheus(self):
+        lineas = []
+        with self._lock:
+            for nombre, (ayuda, _) in METRICAS.items():
+                completo = PREFIJO + nombre
+                lineas += [f'# HELP {completo} {ayuda}', f'# TYPE {completo} histogram']
+                for (metrica, vista), histograma in sorted(self._histogramas.items()):
+                    if metrica != nombre:
+                        continue
+                    etiqueta = f'vista="{vista}"'
+                    for limite, acumulado in histograma.acumulados():
+                        lineas.append(f'{completo}_bucket{{{etiqueta},le="{limite}"}} {acumulado}')
+                    lineas.append(f'{completo}_sum{{{etiqueta}}} {histograma.suma}')
+                    lineas.append(f'{completo}_count{{{etiqueta}}} {histograma.total}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+
+class Medicion:
+    # Lo acumulado durante una petición: nombre -> [segundos, veces]
+    def __init__(self):
+        self.partes = {}
+
+    def sumar(self, nombre, segundos):
+        parte = self.partes.setdefault(nombre, [0.0, 0])
+        parte[0] += segundos
+        parte[1] += 1
+
+    def segundos(self, nombre):
+        return self.partes.get(nombre, (0.0, 0))[0]
+
+    def veces(self, nombre):
+        return self.partes.get(nombre, (0.0, 0))[1]
+
+    def server_timing(self, total):
+        valores = []
+        for nombre, (segundos, veces) in self.partes.items():
+            valor = f'{nombre};dur={segundos * 1000:.1f}'
+            if nombre == 'sql':
+                valor += f';desc="{veces} consultas"'
+            valores.append(valor)
+        valores.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(valores)
+
+
+class medir:
+    """Suma el tiempo del bloque a la medición de la petición actual, si la hay.
+
+        with medir('pdf'):
+            pdf.renderizar(datos, archivo)
+    """
+    __slots__ = ('nombre', 'medicion', 'inicio')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.medicion = _medicion_actual.get()
+        if self.medicion is not None:
+            self.inicio = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.medicion is not None:
+            self.medicion.sumar(self.nombre, perf_counter() - self.inicio)
+
+
+def _medir_sql(execute, sql, params, many, context):
+    with medir('sql'):
+        return execute(sql, params, many, context)
+
+
+def _instalar_medicion_sql(sender=None, connection=None, **kwargs):
+    # execute_wrapper es por conexión, y cada hilo tiene las suyas (las vistas async usan
+    # las del hilo de sync_to_async): queda instalado y solo mide si hay una petición en curso
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_sql)
+
+
+class MedicionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_ACTIVAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        connection_created.connect(_instalar_medicion_sql, dispatch_uid='metricas_medicion_sql')
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = perf_counter()
+        try:
+            # Las conexiones de este hilo que ya estaban abiertas antes del middleware
+            for alias in connections:
+                _instalar_medicion_sql(connection=connections[alias])
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, perf_counter() - inicio)
+
+    async def _acall(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, perf_counter() - inicio)
+
+    def _registrar(self, request, response, medicion, total):
+        # En respuestas en streaming no incluye el envío del cuerpo
+        vista = request.resolver_match.view_name if request.resolver_match else 'sin_ruta'
+        valores = {'vista_segundos': total, 'sql_segundos': medicion.segundos('sql'), 'sql_consultas': medicion.veces('sql')}
+        for nombre in ('plantillas', 'pdf'):
+            if nombre in medicion.partes:
+                valores[f'{nombre}_segundos'] = medicion.segundos(nombre)
+        registro.observar(vista, valores)
+        response['Server-Timing'] = medicion.server_timing(total)
+        return response
+
+
+class _PlantillaMedida:
+    def __init__(self, plantilla):
+        self._plantilla = plantilla
+
+    def render(self, context=None, request=None):
+        with medir('plantillas'):
+            return self._plantilla.render(context, request)
+
+    def __getattr__(self, nombre):
+        return getattr(self._plantilla, nombre)
+
+
+class PlantillasMedidas(DjangoTemplates):
+    # DjangoTemplates que mide cada render() de primer nivel (los {% include %} quedan dentro)
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name))
+
+
+def autorizado(request):
+    # Con METRICAS_TOKEN se pide "Authorization: Bearer <token>"; sin token, solo el staff
+    if settings.METRICAS_TOKEN:
+        return constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICAS_TOKEN}')
+    return request.user.is_staff
+
+
+def exportar(request):
+    # Formato de texto de Prometheus
+    if not settings.METRICAS_ACTIVAS:
+        raise Http404("Métricas desactivadas")
+    if not autorizado(request):
+        raise Http404("Métricas no disponibles")
+    return HttpResponse(registro.texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0002_alter_datospersonales_cedula'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'datecompleted', 'created'], name='task_user_completed_idx'),
+        ),
+    ]
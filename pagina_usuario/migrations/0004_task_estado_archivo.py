@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0003_task_user_completed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='archivo_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='estado_archivo',
+            field=models.CharField(blank=True, choices=[('pendiente', 'Subiendo'), ('listo', 'Listo'), ('error', 'Error')], default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0004_task_estado_archivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='experiencialaboral',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='productoacademico',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='productolaboral',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='recomendacion',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
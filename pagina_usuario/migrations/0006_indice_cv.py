@@ -0,0 +1,83 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# El índice full-text depende del motor, por eso va en SQL y no en el modelo.
+SQL_POSTGRES = [
+    """ALTER TABLE pagina_usuario_indicecv ADD COLUMN busqueda tsvector
+       GENERATED ALWAYS AS (to_tsvector('spanish', documento)) STORED""",
+    "CREATE INDEX indicecv_busqueda_gin ON pagina_usuario_indicecv USING GIN (busqueda)",
+]
+DESHACER_POSTGRES = [
+    "DROP INDEX IF EXISTS indicecv_busqueda_gin",
+    "ALTER TABLE pagina_usuario_indicecv DROP COLUMN IF EXISTS busqueda",
+]
+
+# Tabla FTS5 de contenido externo: guarda solo el índice y lee el texto de pagina_usuario_indicecv.
+# Los triggers la mantienen al día con cada INSERT/UPDATE/DELETE (también los bulk_create).
+SQL_SQLITE = [
+    """CREATE VIRTUAL TABLE pagina_usuario_indicecv_fts USING fts5(
+       documento, content='pagina_usuario_indicecv', content_rowid='perfil_id',
+       tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER indicecv_fts_ai AFTER INSERT ON pagina_usuario_indicecv BEGIN
+       INSERT INTO pagina_usuario_indicecv_fts(rowid, documento) VALUES (new.perfil_id, new.documento); END""",
+    """CREATE TRIGGER indicecv_fts_ad AFTER DELETE ON pagina_usuario_indicecv BEGIN
+       INSERT INTO pagina_usuario_indicecv_fts(pagina_usuario_indicecv_fts, rowid, documento)
+       VALUES ('delete', old.perfil_id, old.documento); END""",
+    """CREATE TRIGGER indicecv_fts_au AFTER UPDATE ON pagina_usuario_indicecv BEGIN
+       INSERT INTO pagina_usuario_indicecv_fts(pagina_usuario_indicecv_fts, rowid, documento)
+       VALUES ('delete', old.perfil_id, old.documento);
+       INSERT INTO pagina_usuario_indicecv_fts(rowid, documento) VALUES (new.perfil_id, new.documento); END""",
+]
+DESHACER_SQLITE = [
+    "DROP TRIGGER IF EXISTS indicecv_fts_ai",
+    "DROP TRIGGER IF EXISTS indicecv_fts_ad",
+    "DROP TRIGGER IF EXISTS indicecv_fts_au",
+    "DROP TABLE IF EXISTS pagina_usuario_indicecv_fts",
+]
+
+
+def _sqlite_con_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(opcion == 'ENABLE_FTS5' for opcion, in cursor.fetchall())
+
+
+def _sentencias(schema_editor, postgres, sqlite):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        return postgres
+    if connection.vendor == 'sqlite' and _sqlite_con_fts5(connection):
+        return sqlite
+    # Otros motores: busqueda.py usa icontains sobre documento
+    return []
+
+
+def crear_indice_full_text(apps, schema_editor):
+    for sql in _sentencias(schema_editor, SQL_POSTGRES, SQL_SQLITE):
+        schema_editor.execute(sql)
+
+
+def borrar_indice_full_text(apps, schema_editor):
+    for sql in _sentencias(schema_editor, DESHACER_POSTGRES, DESHACER_SQLITE):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0005_version_filas_cv'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceCV',
+            fields=[
+                ('perfil', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indice', serialize=False, to='pagina_usuario.datospersonales')),
+                ('documento', models.TextField()),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(crear_indice_full_text, borrar_indice_full_text),
+    ]
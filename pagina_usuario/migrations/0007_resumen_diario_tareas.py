@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0006_indice_cv'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioTareas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('creadas', models.PositiveIntegerField(default=0)),
+                ('importantes', models.PositiveIntegerField(default=0)),
+                ('completadas', models.PositiveIntegerField(default=0)),
+                ('segundos_para_completar', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'dia'), name='resumen_tareas_user_dia_uniq')],
+            },
+        ),
+    ]
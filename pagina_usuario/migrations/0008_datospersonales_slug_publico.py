@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0007_resumen_diario_tareas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datospersonales',
+            name='slug_publico',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0008_datospersonales_slug_publico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionCV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=64, unique=True)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('terminada', 'Terminada')], default='en_curso', max_length=10)),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('rechazados', models.PositiveIntegerField(default=0)),
+                ('iniciada', models.DateTimeField(auto_now_add=True)),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from pagina_usuario.busqueda import SECCIONES_INDEXADAS, documento
+
+TAMANO_LOTE = 500
+
+
+def llenar_indice(apps, schema_editor):
+    # 0006 creó el índice vacío: sin esto, los perfiles que ya existían no aparecen en la
+    # búsqueda hasta que alguien los edita. Mismo recorrido por lotes que busqueda.reindexar()
+    DatosPersonales = apps.get_model('pagina_usuario', 'DatosPersonales')
+    IndiceCV = apps.get_model('pagina_usuario', 'IndiceCV')
+    alias = schema_editor.connection.alias
+    perfiles = DatosPersonales.objects.using(alias).order_by('pk').prefetch_related(*SECCIONES_INDEXADAS)
+    ultimo_pk = 0
+    while lote := list(perfiles.filter(pk__gt=ultimo_pk)[:TAMANO_LOTE]):
+        IndiceCV.objects.using(alias).bulk_create(
+            [IndiceCV(perfil=perfil, documento=documento(perfil)) for perfil in lote],
+            update_conflicts=True, unique_fields=['perfil'], update_fields=['documento', 'actualizado'],
+        )
+        ultimo_pk = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0009_importacion_cv'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_indice, migrations.RunPython.noop),
+    ]
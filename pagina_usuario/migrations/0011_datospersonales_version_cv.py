@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:22
+
+import time
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0010_llenar_indice_cv'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datospersonales',
+            name='version_cv',
+            field=models.BigIntegerField(default=time.time_ns, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from pagina_usuario.analitica import resumenes_diarios
+
+
+def llenar_resumenes(apps, schema_editor):
+    # 0007 creó la tabla vacía y las vistas de estadísticas solo leen de ella: sin esto, las
+    # tareas anteriores no cuentan. Lo mismo que el comando reconstruir_analitica
+    Task = apps.get_model('pagina_usuario', 'Task')
+    ResumenDiarioTareas = apps.get_model('pagina_usuario', 'ResumenDiarioTareas')
+    alias = schema_editor.connection.alias
+    ResumenDiarioTareas.objects.using(alias).all().delete()
+    ResumenDiarioTareas.objects.using(alias).bulk_create(
+        resumenes_diarios(Task.objects.using(alias), ResumenDiarioTareas), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0011_datospersonales_version_cv'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_resumenes, migrations.RunPython.noop),
+    ]
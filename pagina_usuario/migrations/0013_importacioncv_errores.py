@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagina_usuario', '0012_llenar_resumen_diario_tareas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacioncv',
+            name='errores',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='importacioncv',
+            name='estado',
+            field=models.CharField(choices=[('en_curso', 'En curso'), ('terminada', 'Terminada'), ('error', 'Con error')], default='en_curso', max_length=10),
+        ),
+    ]
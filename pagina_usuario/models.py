@@ -1,17 +1,52 @@
+import time
+
 from django.db import models
 from django.contrib.auth.models import User
 
 class Task(models.Model):
+    class EstadoArchivo(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Subiendo'
+        LISTO = 'listo', 'Listo'
+        ERROR = 'error', 'Error'
+
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     created = models.DateTimeField(auto_now_add=True)
     datecompleted = models.DateTimeField(null=True, blank=True)
     important = models.BooleanField(default=False)
     archivo = models.FileField(upload_to='tareas/', null=True, blank=True)
+    # Vacío si la tarea no tiene adjunto; el adjunto se guarda en segundo plano
+    estado_archivo = models.CharField(max_length=10, choices=EstadoArchivo.choices, blank=True, default='')
+    archivo_sha256 = models.CharField(max_length=64, blank=True, default='')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Sirve a las dos listas del panel: pendientes (datecompleted IS NULL, por created)
+            # y finalizadas (por datecompleted), siempre filtradas por usuario
+            models.Index(fields=['user', 'datecompleted', 'created'], name='task_user_completed_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+
+class ResumenDiarioTareas(models.Model):
+    # Totales de tareas por usuario y día (fecha local). Los mantiene analitica.py;
+    # las estadísticas se leen de aquí y no de Task, así no dependen del tamaño del historial
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    dia = models.DateField()
+    creadas = models.PositiveIntegerField(default=0)
+    importantes = models.PositiveIntegerField(default=0)
+    completadas = models.PositiveIntegerField(default=0)
+    # Suma de (datecompleted - created) de las completadas ese día
+    segundos_para_completar = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # También es el índice de las consultas por usuario y rango de días
+            models.UniqueConstraint(fields=['user', 'dia'], name='resumen_tareas_user_dia_uniq'),
+        ]
     
 foto = models.ImageField(upload_to='perfil/', null=True, blank=True)
 
@@ -25,6 +60,11 @@ class DatosPersonales(models.Model):
     fecha_nacimiento = models.DateField(null=True, blank=True)
     direccion_domiciliaria = models.CharField(max_length=100)
     perfil_profesional = models.TextField(max_length=500)
+    # Versión del CV para las cachés (fragmentos de hoja_vida.html, página pública, PDF).
+    # La cambia signals.cv_modificado; al estar en la base la ven todos los workers
+    version_cv = models.BigIntegerField(default=time.time_ns, editable=False)
+    # Enlace público de solo lectura (/cv/<slug>/); None mientras el dueño no lo comparta
+    slug_publico = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos}"
@@ -35,24 +75,63 @@ class ExperienciaLaboral(models.Model):
     cargo_desempenado = models.CharField(max_length=100)
     fecha_inicio = models.DateField()
     fecha_fin = models.DateField(null=True, blank=True)
+    # Concurrencia optimista del autoguardado: cada escritura la incrementa
+    version = models.PositiveIntegerField(default=1)
 
 class Curso(models.Model):
     perfil = models.ForeignKey(DatosPersonales, on_delete=models.CASCADE, related_name='cursos')
     nombre_curso = models.CharField(max_length=100)
     institucion = models.CharField(max_length=100)
     horas = models.IntegerField()
+    version = models.PositiveIntegerField(default=1)
 
 class ProductoLaboral(models.Model):
     perfil = models.ForeignKey(DatosPersonales, on_delete=models.CASCADE, related_name='productos_lab')
     nombre_producto = models.CharField(max_length=100)
     descripcion = models.CharField(max_length=200)
+    version = models.PositiveIntegerField(default=1)
 
 class ProductoAcademico(models.Model):
     perfil = models.ForeignKey(DatosPersonales, on_delete=models.CASCADE, related_name='productos_acad')
     nombre_recurso = models.CharField(max_length=100)
     descripcion = models.CharField(max_length=200)
+    version = models.PositiveIntegerField(default=1)
 
 class Recomendacion(models.Model):
     perfil = models.ForeignKey(DatosPersonales, on_delete=models.CASCADE, related_name='recomendaciones')
     nombre_persona = models.CharField(max_length=100)
-    telefono = models.CharField(max_length=15)
\ No newline at end of file
+    telefono = models.CharField(max_length=15)
+    version = models.PositiveIntegerField(default=1)
+
+class IndiceCV(models.Model):
+    # Texto buscable de cada CV (perfil, experiencias, cursos y productos); lo mantiene busqueda.py.
+    # La migración 0006 le agrega el índice full-text del motor: tsvector + GIN en PostgreSQL, FTS5 en SQLite
+    perfil = models.OneToOneField(DatosPersonales, on_delete=models.CASCADE, primary_key=True, related_name='indice')
+    documento = models.TextField()
+    actualizado = models.DateTimeField(auto_now=True)
+
+
+class ImportacionCV(models.Model):
+    # Avance de una importación masiva de CVs (importacion.py). Se guarda en la misma
+    # transacción que cada lote: si se corta, se retoma después del último lote confirmado
+    class Estado(models.TextChoices):
+        EN_CURSO = 'en_curso', 'En curso'
+        TERMINADA = 'terminada', 'Terminada'
+        ERROR = 'error', 'Con error'
+
+    # SHA-256 del archivo: volver a subir el mismo archivo retoma esta importación
+    huella = models.CharField(max_length=64, unique=True)
+    nombre_archivo = models.CharField(max_length=255)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.EN_CURSO)
+    # Filas del archivo ya resueltas (creadas o rechazadas)
+    filas = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    rechazados = models.PositiveIntegerField(default=0)
+    # Filas rechazadas (las primeras) o por qué se cortó: la subida del admin corre en
+    # segundo plano y no tiene otra forma de mostrarlos
+    errores = models.TextField(blank=True)
+    iniciada = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.nombre_archivo
@@ -0,0 +1,51 @@
+import base64
+from datetime import datetime
+
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+
+
+def codificar_cursor(valor, pk):
+    texto = f"{valor.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        valor, pk = texto.split('|')
+        return datetime.fromisoformat(valor), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise BadRequest("Cursor de paginación inválido")
+
+
+def _ordenar_desde(queryset, campo, cursor):
+    queryset = queryset.order_by(f'-{campo}', '-pk')
+    if cursor:
+        valor, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'pk__lt': pk}))
+    return queryset
+
+
+def _recortar(filas, campo, tamano):
+    # Pedimos una fila de más solo para saber si hay otra página
+    if len(filas) <= tamano:
+        return filas, None
+    ultima = filas[tamano - 1]
+    return filas[:tamano], codificar_cursor(getattr(ultima, campo), ultima.pk)
+
+
+def pagina_keyset(queryset, campo, cursor=None, tamano=20):
+    """Una página ordenada por (campo, pk) descendente, empezando después de 'cursor'.
+
+    A diferencia de OFFSET, cada página es un rango del índice: pedir la página
+    100 cuesta lo mismo que pedir la primera. Devuelve (filas, cursor_siguiente).
+    """
+    queryset = _ordenar_desde(queryset, campo, cursor)
+    return _recortar(list(queryset[:tamano + 1]), campo, tamano)
+
+
+async def apagina_keyset(queryset, campo, cursor=None, tamano=20):
+    # Igual que pagina_keyset, para las vistas async
+    queryset = _ordenar_desde(queryset, campo, cursor)
+    return _recortar([fila async for fila in queryset[:tamano + 1]], campo, tamano)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# ReportLab se importa dentro de las funciones que dibujan: tarda ~150 ms y solo lo
+# necesitan la descarga y la exportación del PDF, no cada worker al arrancar.
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+def extraer_datos(perfil, username):
+    # Copiamos a valores simples todo lo que sale en el PDF.
+    # Con esto calculamos la huella del CV y dibujamos sin volver a la base de datos
+    # (y se puede enviar tal cual a otro proceso).
+    if perfil is None:
+        return {'username': username, 'perfil': None}
+    return {
+        'username': username,
+        'perfil': {
+            'nombres': perfil.nombres,
+            'apellidos': perfil.apellidos,
+            'cedula': perfil.cedula,
+            'nacionalidad': perfil.nacionalidad,
+            'direccion_domiciliaria': perfil.direccion_domiciliaria,
+            'perfil_profesional': perfil.perfil_profesional,
+        },
+        'experiencias': [
+            [exp.cargo_desempenado, exp.nombre_empresa, str(exp.fecha_inicio), str(exp.fecha_fin or 'Actualidad')]
+            for exp in perfil.experiencias.all()
+        ],
+        'cursos': [
+            [c.nombre_curso, c.institucion, c.horas]
+            for c in perfil.cursos.all()
+        ],
+        'productos_lab': [
+            [prod.nombre_producto, prod.descripcion]
+            for prod in perfil.productos_lab.all()
+        ],
+        'productos_acad': [
+            [prod.nombre_recurso, prod.descripcion]
+            for prod in perfil.productos_acad.all()
+        ],
+        'recomendaciones': [
+            [rec.nombre_persona, rec.telefono]
+            for rec in perfil.recomendaciones.all()
+        ],
+    }
+
+
+def huella(datos):
+    # Mismo contenido => misma huella, sin importar cuándo se generó
+    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def nombre_archivo(datos):
+    perfil = datos['perfil']
+    if perfil and perfil['nombres'] and perfil['apellidos']:
+        # Reemplazamos espacios por guiones bajos para que el nombre del archivo sea limpio
+        nombre_limpio = f"{perfil['nombres']}_{perfil['apellidos']}".replace(" ", "_")
+        return f"CV_{nombre_limpio}.pdf"
+    # Si no tiene perfil, usamos su nombre de usuario de Django
+    return f"CV_{datos['username']}.pdf"
+
+
+# --- Estilos: se crean una sola vez por proceso y se reutilizan en cada CV ---
+
+@lru_cache(maxsize=None)
+def estilos():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+
+    oscuro = colors.HexColor('#2c3e50')
+    primario = colors.HexColor('#0dcaf0')
+    return {
+        'titulo': ParagraphStyle('titulo', fontName='Helvetica-Bold', fontSize=20, leading=24, textColor=oscuro),
+        'nombre': ParagraphStyle('nombre', fontName='Helvetica-Bold', fontSize=14, leading=18, spaceBefore=4),
+        'seccion': ParagraphStyle(
+            'seccion', fontName='Helvetica-Bold', fontSize=13, leading=16, textColor=oscuro,
+            spaceBefore=14, spaceAfter=6, keepWithNext=1,
+        ),
+        'texto': ParagraphStyle('texto', fontName='Helvetica', fontSize=11, leading=14),
+        'item': ParagraphStyle('item', fontName='Helvetica', fontSize=11, leading=14, leftIndent=10, bulletIndent=0),
+        'detalle': ParagraphStyle('detalle', fontName='Helvetica-Oblique', fontSize=9, leading=12, leftIndent=25),
+        'linea': primario,
+    }
+
+
+def _pie_de_pagina(canvas, doc):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib.units import cm
+
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawCentredString(LETTER[0] / 2, 1.2 * cm, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+def _item(texto, detalle=None):
+    from reportlab.platypus import KeepTogether, Paragraph, Spacer
+
+    est = estilos()
+    partes = [Paragraph(texto, est['item'], bulletText='•')]
+    if detalle:
+        partes.append(Paragraph(detalle, est['detalle']))
+    partes.append(Spacer(1, 6))
+    # Cada elemento se mantiene entero: nunca queda el cargo en una hoja y la fecha en otra
+    return KeepTogether(partes)
+
+
+def _seccion(titulo, elementos):
+    # Devuelve [] si la sección no tiene filas, así no quedan títulos vacíos
+    if not elementos:
+        return []
+    from reportlab.platypus import Paragraph
+
+    return [Paragraph(titulo, estilos()['seccion']), *elementos]
+
+
+def construir_historia(datos):
+    from reportlab.platypus import HRFlowable, Paragraph
+
+    est = estilos()
+    perfil = datos['perfil']
+    nombre_completo = f"{perfil['nombres']} {perfil['apellidos']}" if perfil else datos['username']
+
+    historia = [
+        Paragraph("CURRÍCULUM VITAE", est['titulo']),
+        Paragraph(escape(nombre_completo.upper()), est['nombre']),
+        HRFlowable(width='100%', thickness=1, color=est['linea'], spaceBefore=4, spaceAfter=12),
+    ]
+    if not perfil:
+        return historia
+
+    historia += [
+        Paragraph(f"Cédula: {escape(str(perfil['cedula'] or ''))}", est['texto']),
+        Paragraph(f"Ubicación: {escape(perfil['direccion_domiciliaria'])}", est['texto']),
+        Paragraph(f"Nacionalidad: {escape(perfil['nacionalidad'])}", est['texto']),
+    ]
+    if perfil['perfil_profesional']:
+        historia += _seccion("PERFIL PROFESIONAL", [Paragraph(escape(perfil['perfil_profesional']), est['texto'])])
+
+    historia += _seccion("EXPERIENCIA LABORAL", [
+        _item(f"{escape(cargo)} en {escape(empresa)}", f"({escape(inicio)} a {escape(fin)})")
+        for cargo, empresa, inicio, fin in datos['experiencias']
+    ])
+    historia += _seccion("CURSOS Y FORMACIÓN", [
+        _item(f"{escape(nombre)} ({escape(institucion)}) - {horas}h")
+        for nombre, institucion, horas in datos['cursos']
+    ])
+    historia += _seccion("PRODUCTOS LABORALES", [
+        _item(f"<b>{escape(nombre)}</b>", escape(descripcion))
+        for nombre, descripcion in datos['productos_lab']
+    ])
+    historia += _seccion("PRODUCTOS ACADÉMICOS", [
+        _item(f"<b>{escape(nombre)}</b>", escape(descripcion))
+        for nombre, descripcion in datos['productos_acad']
+    ])
+    historia += _seccion("RECOMENDACIONES", [
+        _item(f"{escape(nombre)} - Tel. {escape(telefono)}")
+        for nombre, telefono in datos['recomendaciones']
+    ])
+    return historia
+
+
+def renderizar(datos, destino):
+    # Escribe el PDF en 'destino' (cualquier archivo binario); la paginación la resuelve platypus
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(
+        destino, pagesize=LETTER,
+        leftMargin=2.5 * cm, rightMargin=2.5 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title=nombre_archivo(datos), author=datos['username'],
+    )
+    doc.build(construir_historia(datos), onFirstPage=_pie_de_pagina, onLaterPages=_pie_de_pagina)
+    return destino
+
+
+def renderizar_bytes(datos):
+    # Versión para los procesos de exportación: recibe y devuelve valores simples
+    return renderizar(datos, BytesIO()).getvalue()
+
+
+def iterar_bytes(contenido, tamano=TAMANO_BLOQUE):
+    vista = memoryview(contenido)
+    for inicio in range(0, len(vista), tamano):
+        yield bytes(vista[inicio:inicio + tamano])
+
+
+def iterar_archivo(archivo, tamano=TAMANO_BLOQUE):
+    try:
+        while bloque := archivo.read(tamano):
+            yield bloque
+    finally:
+        archivo.close()
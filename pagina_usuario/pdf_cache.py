@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+@dataclass
+class EntradaPDF:
+    huella: str
+    nombre_archivo: str
+    # None cuando el PDF supera CV_PDF_CACHE_MAX_BYTES_ENTRADA: solo recordamos su ETag
+    contenido: bytes | None = None
+    generado: int = field(default_factory=lambda: int(time.time()))
+
+    @property
+    def etag(self):
+        return f'"{self.huella}"'
+
+
+class CachePDF:
+    """Caché LRU en memoria de PDFs ya generados, direccionada por la huella del CV.
+
+    Además de las entradas guardamos qué huella le corresponde a cada usuario y
+    con qué versión de su CV (perfil_id, DatosPersonales.version_cv), así una
+    descarga repetida puede responder 304 leyendo solo la versión. Como la
+    versión está en la base, un cambio hecho en otro worker también la invalida,
+    y crear el perfil también: la versión pasa de (None, None) a la del perfil.
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()     # huella -> EntradaPDF
+        self._por_usuario = OrderedDict()  # user_id -> (version, huella)
+        self._lock = threading.Lock()
+
+    def vigente(self, user_id, version):
+        with self._lock:
+            asociacion = self._por_usuario.get(user_id)
+            if asociacion is None or asociacion[0] != version:
+                return None
+            self._por_usuario.move_to_end(user_id)
+            return self._tocar(asociacion[1])
+
+    def obtener(self, huella):
+        with self._lock:
+            return self._tocar(huella)
+
+    def guardar(self, user_id, version, entrada):
+        with self._lock:
+            self._entradas[entrada.huella] = entrada
+            self._entradas.move_to_end(entrada.huella)
+            self._por_usuario[user_id] = (version, entrada.huella)
+            self._por_usuario.move_to_end(user_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            while len(self._por_usuario) > self.max_entradas:
+                self._por_usuario.popitem(last=False)
+        return entrada
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+
+    def _tocar(self, huella):
+        entrada = self._entradas.get(huella)
+        if entrada is not None:
+            self._entradas.move_to_end(huella)
+        return entrada
+
+
+# Una instancia por proceso (cada worker de gunicorn tiene la suya)
+cache_pdf = CachePDF(getattr(settings, 'CV_PDF_CACHE_MAX_ENTRADAS', 128))
@@ -0,0 +1,117 @@
+# Lecturas a la réplica (REPLICA_DATABASE_URL), escrituras al primario.
+#
+# Solo se lee de la réplica dentro de una petición: los comandos y el trabajo en segundo
+# plano (que suele leer lo que se acaba de escribir) van siempre al primario. Dentro de
+# la petición se vuelve al primario en cuanto se escribe algo o se abre una transacción,
+# y la cookie COOKIE mantiene al usuario en el primario REPLICA_PIN_SEGUNDOS después de
+# escribir: así ve sus propios cambios aunque la réplica vaya atrasada.
+import contextvars
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PRIMARIO = 'default'
+REPLICA = 'replica'
+COOKIE = 'leer_primario'
+
+
+class EstadoPeticion:
+    __slots__ = ('fijado', 'escribio')
+
+    def __init__(self, fijado=False):
+        self.fijado = fijado      # la cookie sigue vigente: todo al primario
+        self.escribio = False     # esta petición ya escribió algo
+
+    def usar_primario(self):
+        return self.fijado or self.escribio or connections[PRIMARIO].in_atomic_block
+
+
+_estado = contextvars.ContextVar('estado_replica', default=None)
+
+
+@contextmanager
+def primario():
+    # Lecturas del bloque al primario: para lo que se va a cachear, que no puede salir atrasado
+    estado = _estado.get()
+    if estado is None:  # fuera de una petición ya se lee del primario
+        yield
+        return
+    anterior, estado.fijado = estado.fijado, True
+    try:
+        yield
+    finally:
+        estado.fijado = anterior
+
+
+class RouterReplica:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or estado.usar_primario():
+            return PRIMARIO
+        # Lo relacionado a un objeto se lee de la misma base que el objeto
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db:
+            return instancia._state.db
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escribio = True
+        return PRIMARIO
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son los mismos datos
+        return {obj1._state.db, obj2._state.db} <= {PRIMARIO, REPLICA}
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self._acall(request)
+        estado = EstadoPeticion(fijado=_fijado(request))
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return _fijar(estado, response)
+
+    async def _acall(self, request):
+        estado = EstadoPeticion(fijado=_fijado(request))
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return _fijar(estado, response)
+
+
+def _fijado(request):
+    # La cookie guarda hasta cuándo (epoch). Falsificarla solo sirve para leer del primario
+    try:
+        return float(request.COOKIES.get(COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _fijar(estado, response):
+    if estado.escribio:
+        segundos = settings.REPLICA_PIN_SEGUNDOS
+        response.set_cookie(COOKIE, str(int(time.time()) + segundos), max_age=segundos, httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,70 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(
+            max_workers=settings.SEGUNDO_PLANO_HILOS, thread_name_prefix='segundo-plano'
+        )
+    return _ejecutor
+
+
+def _ejecutar(funcion, args):
+    close_old_connections()
+    try:
+        funcion(*args)
+    except Exception:
+        logger.exception("Falló la tarea en segundo plano %s", funcion.__name__)
+    finally:
+        # Cada hilo abre su propia conexión: la cerramos para no dejarla colgada
+        connections.close_all()
+
+
+def encolar(funcion, *args):
+    """Ejecuta funcion(*args) fuera de la petición, cuando se confirme la transacción actual.
+
+    Con SEGUNDO_PLANO_ASINCRONO=False (tests, comandos) se ejecuta en el mismo hilo.
+    """
+    transaction.on_commit(lambda: _despachar(funcion, args))
+
+
+def encolar_una_vez(funcion, *args):
+    """Como encolar(), pero funcion(*args) corre una sola vez por transacción.
+
+    Para lo que se avisa por cada fila guardada: cien filas de un perfil en la
+    misma transacción terminan en una sola tarea.
+    """
+    al_confirmar_una_vez(_despachar, funcion, args)
+
+
+def al_confirmar_una_vez(funcion, *args):
+    # on_commit que se registra una vez por fila pero corre una sola vez: la primera
+    # de las llamadas repetidas que llega al commit la ejecuta y las demás no hacen nada
+    connection = transaction.get_connection()
+    if not hasattr(connection, 'pendientes_al_confirmar'):
+        connection.pendientes_al_confirmar = set()
+    pendientes = connection.pendientes_al_confirmar
+    clave = (funcion, args)
+    pendientes.add(clave)
+
+    def ejecutar():
+        if clave in pendientes:
+            pendientes.discard(clave)
+            funcion(*args)
+    transaction.on_commit(ejecutar)
+
+
+def _despachar(funcion, args):
+    if settings.SEGUNDO_PLANO_ASINCRONO:
+        _obtener_ejecutor().submit(_ejecutar, funcion, args)
+    else:
+        funcion(*args)
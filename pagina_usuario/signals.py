@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
+from .autenticacion import olvidar_usuario
+from .busqueda import indexar_perfil
+from .cv import incrementar_version_cv
+from .imagenes import generar_derivados
+from .segundo_plano import al_confirmar_una_vez, encolar, encolar_una_vez
+
+MODELOS_CV = (ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion)
+
+
+def cv_modificado(perfil_id):
+    # Punto único de invalidación: todo lo que se cachea de un CV se limpia aquí
+    # Fragmentos de hoja_vida.html y página pública. Al confirmar y no por fila: borrar 5 filas
+    # son 5 post_delete, y un save() del perfil puede haber escrito de vuelta una versión vieja
+    al_confirmar_una_vez(incrementar_version_cv, perfil_id)
+    encolar_una_vez(indexar_perfil, perfil_id)  # una vez por transacción, no por fila
+
+
+@receiver([post_save, post_delete], sender=DatosPersonales)
+def perfil_modificado(sender, instance, **kwargs):
+    cv_modificado(instance.pk)
+
+
+@receiver(post_save, sender=DatosPersonales)
+def foto_guardada(sender, instance, **kwargs):
+    # Las versiones reducidas se generan fuera de la petición (si ya existen, no hace nada)
+    if instance.foto:
+        encolar(generar_derivados, instance.pk, instance.foto.name)
+
+
+def fila_cv_modificada(sender, instance, **kwargs):
+    cv_modificado(instance.perfil_id)
+
+
+for modelo in MODELOS_CV:
+    post_save.connect(fila_cv_modificada, sender=modelo)
+    post_delete.connect(fila_cv_modificada, sender=modelo)
+
+
+@receiver([post_save, post_delete], sender=User)
+def usuario_modificado(sender, instance, **kwargs):
+    # BackendConCache: la próxima petición lo vuelve a leer (contraseña, is_active, ...)
+    olvidar_usuario(instance.pk)
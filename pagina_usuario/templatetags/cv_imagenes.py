@@ -0,0 +1,38 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..imagenes import ANCHOS, FORMATOS, ruta_derivado, derivados_listos
+
+register = template.Library()
+
+
+@register.simple_tag
+def foto_perfil(perfil, ancho, clase=''):
+    """<picture> con las versiones reducidas (WebP y JPEG) de la foto del perfil.
+
+    Devuelve '' si no hay foto o sus versiones aún no se generaron, para que la
+    plantilla muestre su avatar: la foto original nunca se envía desde aquí.
+    Uso: {% foto_perfil perfil 180 'clase-css' as foto %}
+    """
+    foto = perfil.foto if perfil else None
+    if not foto or not derivados_listos(foto.name):
+        return ''
+
+    fuentes = {}
+    for _, extension, tipo in FORMATOS:
+        fuentes[tipo] = ', '.join(
+            f"{default_storage.url(ruta_derivado(foto.name, a, extension))} {a}w" for a in ANCHOS
+        )
+    # El navegador elige según 'sizes' y la densidad de pantalla
+    pequena = next((a for a in ANCHOS if a >= ancho), ANCHOS[-1])
+    tipo_img = FORMATOS[-1][2]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}px" class="{}" width="{}" height="{}" '
+        'decoding="async" alt="{}"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}px">', (
+            (tipo, srcset, ancho) for tipo, srcset in fuentes.items() if tipo != tipo_img
+        )),
+        default_storage.url(ruta_derivado(foto.name, pequena, FORMATOS[-1][1])),
+        fuentes[tipo_img], ancho, clase, ancho, ancho, str(perfil),
+    )
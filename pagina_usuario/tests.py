@@ -1,3 +1,1610 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Task, DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
+from .cv import aversion_de_usuario, version_de_usuario
+from .pdf_cache import cache_pdf, CachePDF, EntradaPDF
+from .signals import cv_modificado
+
+
+def crear_perfil(username='ana', **extra):
+    user = User.objects.create_user(username, password='clave-segura-123')
+    datos = {
+        'nombres': 'Ana', 'apellidos': 'Pérez', 'cedula': extra.pop('cedula', '0102030405'),
+        'nacionalidad': 'Ecuatoriana', 'direccion_domiciliaria': 'Quito',
+        'perfil_profesional': 'Desarrolladora',
+    }
+    datos.update(extra)
+    return user, DatosPersonales.objects.create(user=user, **datos)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class DescargarCVPDFTests(TestCase):
+    def setUp(self):
+        cache_pdf.limpiar()
+        self.user, self.perfil = crear_perfil()
+        ExperienciaLaboral.objects.create(
+            perfil=self.perfil, nombre_empresa='ACME', cargo_desempenado='Dev', fecha_inicio=date(2020, 1, 1)
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('descargar_cv')
+
+    def test_descarga_repetida_responde_304(self):
+        primera = self.client.get(self.url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera['Content-Type'], 'application/pdf')
+        self.assertIn('CV_Ana_Pérez.pdf', primera['Content-Disposition'])
+
+        # La sesión, el usuario y la versión del CV: ni el perfil ni sus filas se consultan
+        with self.assertNumQueries(3):
+            segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+    def test_cambio_en_el_cv_invalida_el_pdf(self):
+        primera = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Curso.objects.create(perfil=self.perfil, nombre_curso='Django', institucion='UTM', horas=40)
+
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Curso.objects.all().delete()
+        tercera = self.client.get(self.url)
+        # Mismo contenido que al principio => misma huella
+        self.assertEqual(tercera['ETag'], primera['ETag'])
+
+    def test_lista_larga_de_cursos_ocupa_varias_paginas(self):
+        Curso.objects.bulk_create([
+            Curso(perfil=self.perfil, nombre_curso=f'Curso {i} <avanzado>', institucion='UTM', horas=i)
+            for i in range(150)
+        ])
+        respuesta = self.client.get(self.url)
+        contenido = b''.join(respuesta.streaming_content)
+
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(int(respuesta['Content-Length']), len(contenido))
+        self.assertGreater(contenido.count(b'/Type /Page\n'), 2)
+
+    @override_settings(CV_PDF_CACHE_MAX_BYTES_ENTRADA=0, CV_PDF_SPOOL_MAX_BYTES=0)
+    def test_pdf_grande_se_transmite_desde_archivo_y_conserva_el_etag(self):
+        primera = self.client.get(self.url)
+        contenido = b''.join(primera.streaming_content)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertIsNone(cache_pdf.vigente(self.user.pk, version_de_usuario(self.user)).contenido)
+
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+
+
+class CachePDFTests(TestCase):
+    def test_descarta_la_entrada_menos_usada(self):
+        cache = CachePDF(max_entradas=2)
+        for i in range(2):
+            cache.guardar(i, (i, 1), EntradaPDF(huella=f'h{i}', contenido=b'%PDF', nombre_archivo='cv.pdf'))
+        cache.obtener('h0')
+        cache.guardar(2, (2, 1), EntradaPDF(huella='h2', contenido=b'%PDF', nombre_archivo='cv.pdf'))
+
+        self.assertIsNotNone(cache.obtener('h0'))
+        self.assertIsNone(cache.obtener('h1'))
+        # Los usuarios también están acotados: el menos usado se olvida
+        self.assertIsNone(cache.vigente(0, (0, 1)))
+        self.assertIsNotNone(cache.vigente(2, (2, 1)))
+
+    def test_la_version_de_la_base_invalida_en_todos_los_workers(self):
+        from .cv import incrementar_version_cv
+
+        user = User.objects.create_user('sin_perfil')
+        cache = CachePDF(max_entradas=2)
+        cache.guardar(user.pk, version_de_usuario(user), EntradaPDF(huella='h', nombre_archivo='cv.pdf'))
+        self.assertIsNotNone(cache.vigente(user.pk, version_de_usuario(user)))
+
+        # Crear el perfil cambia la versión aunque la señal corra en otro proceso
+        _, perfil = crear_perfil('con_perfil')
+        DatosPersonales.objects.filter(pk=perfil.pk).update(user=user)
+        self.assertIsNone(cache.vigente(user.pk, version_de_usuario(user)))
+
+        cache.guardar(user.pk, version_de_usuario(user), EntradaPDF(huella='h', nombre_archivo='cv.pdf'))
+        incrementar_version_cv(perfil.pk)
+        self.assertIsNone(cache.vigente(user.pk, version_de_usuario(user)))
+
+
+class ExportarCVsTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            _, perfil = crear_perfil(f'user{i}', cedula=f'{i:010d}')
+            Curso.objects.create(perfil=perfil, nombre_curso='Django', institucion='UTM', horas=10)
+
+    def exportar(self, *args):
+        salida = io.StringIO()
+        with tempfile.TemporaryDirectory() as carpeta:
+            destino = os.path.join(carpeta, 'cvs.zip')
+            call_command('exportar_cvs', destino, *args, stdout=salida)
+            with zipfile.ZipFile(destino) as archivo_zip:
+                contenidos = [archivo_zip.read(nombre) for nombre in archivo_zip.namelist()]
+        return contenidos, salida.getvalue()
+
+    def test_exporta_un_pdf_por_perfil_en_lotes(self):
+        contenidos, salida = self.exportar('--procesos', '1', '--lote', '2')
+        self.assertEqual(len(contenidos), 5)
+        self.assertTrue(all(c.startswith(b'%PDF') for c in contenidos))
+        self.assertIn('perfiles/s', salida)
+
+    def test_exporta_con_pool_de_procesos(self):
+        contenidos, _ = self.exportar('--procesos', '2', '--lote', '2')
+        self.assertEqual(len(contenidos), 5)
+
+    def test_accion_del_admin_genera_el_zip_en_segundo_plano(self):
+        from .exportacion import nueva_exportacion
+
+        admin_user = User.objects.create_superuser('root', password='clave-segura-123')
+        self.client.force_login(admin_user)
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        with self.settings(CV_EXPORT_PROCESOS=1, CV_EXPORT_DIR=carpeta.name, SEGUNDO_PLANO_ASINCRONO=False):
+            with self.captureOnCommitCallbacks() as tareas:
+                respuesta = self.client.post(reverse('admin:pagina_usuario_datospersonales_changelist'), {
+                    'action': 'exportar_cvs_zip',
+                    '_selected_action': list(DatosPersonales.objects.values_list('pk', flat=True)[:3]),
+                }, follow=True)
+            enlace = next(m.message for m in respuesta.context['messages'])
+            url = enlace.split('href="')[1].split('"')[0]
+            self.assertContains(self.client.get(url), 'se está generando')
+
+            for tarea in tareas:
+                tarea()
+            descarga = self.client.get(url)
+            contenido = b''.join(descarga.streaming_content)
+            with zipfile.ZipFile(io.BytesIO(contenido)) as archivo_zip:
+                self.assertEqual(len(archivo_zip.namelist()), 3)
+
+            # Un nombre distinto del generado da 404, y las exportaciones vencidas se borran
+            self.assertEqual(self.client.get(url.replace('.zip', '0.zip')).status_code, 404)
+            with self.settings(CV_EXPORT_CONSERVAR_HORAS=-1):
+                nueva_exportacion()
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class HojaVidaConsultasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.perfil = crear_perfil()
+        self.client.force_login(self.user)
+
+    def agregar_filas(self, n):
+        ExperienciaLaboral.objects.bulk_create([
+            ExperienciaLaboral(perfil=self.perfil, nombre_empresa=f'E{i}', cargo_desempenado='Dev',
+                               fecha_inicio=date(2000 + i, 1, 1))
+            for i in range(n)
+        ])
+        Curso.objects.bulk_create([Curso(perfil=self.perfil, nombre_curso=f'C{i}', institucion='UTM', horas=i) for i in range(n)])
+        ProductoLaboral.objects.bulk_create([ProductoLaboral(perfil=self.perfil, nombre_producto=f'P{i}', descripcion='-') for i in range(n)])
+        ProductoAcademico.objects.bulk_create([ProductoAcademico(perfil=self.perfil, nombre_recurso=f'R{i}', descripcion='-') for i in range(n)])
+        Recomendacion.objects.bulk_create([Recomendacion(perfil=self.perfil, nombre_persona=f'N{i}', telefono='099') for i in range(n)])
+        # bulk_create no dispara señales
+        with self.captureOnCommitCallbacks(execute=True):
+            cv_modificado(self.perfil.pk)
+
+    def test_cantidad_de_consultas_no_depende_de_las_filas(self):
+        # sesión + usuario + perfil + una consulta por cada una de las 5 secciones
+        with self.assertNumQueries(8):
+            self.client.get(reverse('hoja_vida'))
+
+        self.agregar_filas(20)
+        with self.assertNumQueries(8):
+            respuesta = self.client.get(reverse('hoja_vida'))
+        self.assertContains(respuesta, 'class="timeline-item"', count=20)
+        # Experiencias de la más reciente a la más antigua
+        contenido = respuesta.content.decode()
+        self.assertLess(contenido.index('E19'), contenido.index('E0<'))
+
+    def test_fragmentos_en_cache_evitan_consultar_las_secciones(self):
+        self.agregar_filas(3)
+        self.client.get(reverse('hoja_vida'))
+
+        # sesión + usuario + perfil: las secciones salen de la caché
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(reverse('hoja_vida'))
+        self.assertContains(respuesta, 'C2')
+
+    def test_guardar_una_fila_invalida_los_fragmentos(self):
+        self.client.get(reverse('hoja_vida'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Curso.objects.create(perfil=self.perfil, nombre_curso='Kubernetes', institucion='UTM', horas=8)
+        self.assertContains(self.client.get(reverse('hoja_vida')), 'Kubernetes')
+
+        self.perfil.nombres = 'Beatriz'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.save()
+        self.assertContains(self.client.get(reverse('hoja_vida')), 'Beatriz')
+
+    def test_version_en_la_base_y_sin_repetir(self):
+        from .cv import incrementar_version_cv
+
+        self.client.get(reverse('hoja_vida'))
+        # Lo que hace otro worker: cambia la base y la versión, sin tocar la caché de este proceso
+        DatosPersonales.objects.filter(pk=self.perfil.pk).update(nombres='Zoe')
+        incrementar_version_cv(self.perfil.pk)
+        self.assertContains(self.client.get(reverse('hoja_vida')), 'Zoe')
+
+        # Un save() con el perfil leído antes vuelve a escribir una versión vieja: la siguiente es nueva igual
+        usadas = {self.perfil.version_cv, DatosPersonales.objects.get(pk=self.perfil.pk).version_cv}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.save()
+        self.perfil.refresh_from_db()
+        self.assertNotIn(self.perfil.version_cv, usadas)
+
+
+@override_settings(TASKS_PAGE_SIZE=20)
+class TasksPaginacionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='clave-segura-123')
+        self.client.force_login(self.user)
+        ahora = timezone.now()
+        # Varias tareas con la misma fecha para probar el desempate por id
+        Task.objects.bulk_create([
+            Task(title=f'Pendiente {i}', user=self.user) for i in range(45)
+        ])
+        Task.objects.bulk_create([
+            Task(title=f'Hecha {i}', user=self.user, datecompleted=ahora - timezone.timedelta(minutes=i // 3))
+            for i in range(30)
+        ])
+
+    def recorrer(self, lista, cursor):
+        vistas = []
+        while cursor:
+            respuesta = self.client.get(reverse('tasks'), {'lista': lista, 'cursor': cursor})
+            vistas += list(respuesta.context['tareas'])
+            cursor = respuesta.context['siguiente']
+        return vistas
+
+    def test_primera_pagina_y_cargar_mas_recorren_todas_sin_repetir(self):
+        respuesta = self.client.get(reverse('tasks'))
+        pendientes = respuesta.context['pendientes']
+        completadas = respuesta.context['completadas']
+        self.assertEqual(len(pendientes['tareas']), 20)
+        self.assertContains(respuesta, 'data-url=', count=2)
+
+        todas = pendientes['tareas'] + self.recorrer('pendientes', pendientes['siguiente'])
+        self.assertEqual(len({t.pk for t in todas}), 45)
+        self.assertEqual([t.pk for t in todas], sorted((t.pk for t in todas), reverse=True))
+
+        hechas = completadas['tareas'] + self.recorrer('completadas', completadas['siguiente'])
+        self.assertEqual(len({t.pk for t in hechas}), 30)
+        fechas = [t.datecompleted for t in hechas]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_cursor_invalido_responde_400(self):
+        respuesta = self.client.get(reverse('tasks'), {'lista': 'pendientes', 'cursor': 'basura'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class TasksAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='clave-segura-123')
+        self.client.force_login(self.user)
+        self.url = reverse('api_tasks')
+
+    def crear(self, **datos):
+        return self.client.post(self.url, datos, content_type='application/json')
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_crear_y_listar_con_etag(self):
+        self.assertEqual(self.crear(title='Informe', important=True).status_code, 201)
+        self.assertEqual(self.crear(title='').status_code, 400)
+
+        primera = self.client.get(self.url)
+        self.assertEqual([t['title'] for t in primera.json()['tareas']], ['Informe'])
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+
+        self.crear(title='Otra')
+        tercera = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(tercera.status_code, 200)
+        self.assertEqual(len(tercera.json()['tareas']), 2)
+
+    def test_completar_en_lote_con_un_solo_update(self):
+        propias = [self.crear(title=f'T{i}').json()['id'] for i in range(3)]
+        ajena = Task.objects.create(title='Ajena', user=User.objects.create_user('otro'))
+
+        # sesión + usuario + UPDATE
+        with self.assertNumQueries(3):
+            respuesta = self.client.post(
+                reverse('api_complete_tasks'), {'ids': propias[:2] + [ajena.pk]}, content_type='application/json'
+            )
+        self.assertEqual(respuesta.json(), {'completadas': 2})
+        self.assertIsNone(Task.objects.get(pk=ajena.pk).datecompleted)
+        pendientes = self.client.get(self.url).json()['tareas']
+        self.assertEqual([t['id'] for t in pendientes], propias[2:])
+
+    def test_completar_valida_los_ids(self):
+        respuesta = self.client.post(reverse('api_complete_tasks'), {'ids': 'todos'}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False, TASK_UPLOAD_MAX_BYTES=1024)
+class AdjuntosTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(self.settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.temporales = tempfile.TemporaryDirectory()
+        self.enterContext(self.settings(FILE_UPLOAD_TEMP_DIR=self.temporales.name))
+        self.addCleanup(self.temporales.cleanup)
+        self.user = User.objects.create_user('ana', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+    def subir(self, nombre, contenido, title='Con adjunto'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('create_task'), {
+                'title': title, 'archivo': SimpleUploadedFile(nombre, contenido),
+            })
+
+    def test_guarda_el_adjunto_por_hash_y_sin_duplicar(self):
+        self.subir('informe.pdf', b'%PDF contenido')
+        self.subir('copia.PDF', b'%PDF contenido', title='Otra')
+
+        primera, segunda = Task.objects.order_by('pk')
+        self.assertEqual(primera.estado_archivo, Task.EstadoArchivo.LISTO)
+        self.assertEqual(primera.archivo.name, segunda.archivo.name)
+        self.assertEqual(primera.archivo.name, f"tareas/{primera.archivo_sha256[:2]}/{primera.archivo_sha256}.pdf")
+        carpeta = os.path.join(self.media.name, 'tareas', primera.archivo_sha256[:2])
+        self.assertEqual(os.listdir(carpeta), [f'{primera.archivo_sha256}.pdf'])
+        self.assertEqual(os.listdir(self.temporales.name), [])
+
+    def test_rechaza_tipo_y_tamano(self):
+        respuesta = self.subir('script.exe', b'MZ')
+        self.assertContains(respuesta, 'Tipo de archivo no permitido')
+        respuesta = self.subir('grande.pdf', b'x' * 2048)
+        self.assertContains(respuesta, 'supera el máximo')
+        self.assertFalse(Task.objects.exists())
+
+    def test_no_deja_temporales_si_la_tarea_no_se_crea(self):
+        respuesta = self.subir('informe.pdf', b'%PDF contenido', title='')
+        self.assertContains(respuesta, 'El título es obligatorio')
+        self.assertEqual(os.listdir(self.temporales.name), [])
+
+    def test_sube_con_verificacion_csrf(self):
+        # El cliente de tests no verifica CSRF por defecto; el navegador sí
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        client.get(reverse('create_task'))
+        datos = {'title': 'Con adjunto', 'archivo': SimpleUploadedFile('informe.pdf', b'%PDF contenido')}
+
+        self.assertEqual(client.post(reverse('create_task'), datos).status_code, 403)
+        self.assertEqual(os.listdir(self.temporales.name), [])
+
+        datos['archivo'].seek(0)
+        datos['csrfmiddlewaretoken'] = client.cookies['csrftoken'].value
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = client.post(reverse('create_task'), datos)
+        self.assertRedirects(respuesta, reverse('tasks'), fetch_redirect_response=False)
+        self.assertEqual(Task.objects.get().estado_archivo, Task.EstadoArchivo.LISTO)
+
+    def test_reintenta_los_adjuntos_atascados_en_pendiente(self):
+        hace_una_hora = timezone.now() - timezone.timedelta(hours=1)
+        con_temporal, sin_temporal, reciente = (
+            Task.objects.create(title=titulo, user=self.user, estado_archivo=Task.EstadoArchivo.PENDIENTE,
+                                archivo_sha256='ab' * 32)
+            for titulo in ('Con temporal', 'Sin temporal', 'Reciente')
+        )
+        Task.objects.exclude(pk=reciente.pk).update(created=hace_una_hora)
+        # Temporales que dejó un worker reciclado con guardar_adjunto en cola, más uno abandonado
+        for nombre in (f'tarea-{con_temporal.pk}.pdf.subida', f'tarea-{reciente.pk}.pdf.subida', 'tmpabc.subida'):
+            ruta = os.path.join(self.temporales.name, nombre)
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'%PDF contenido')
+            os.utime(ruta, (hace_una_hora.timestamp(), hace_una_hora.timestamp()))
+
+        salida = io.StringIO()
+        call_command('reintentar_adjuntos', stdout=salida)
+
+        self.assertIn('1 adjuntos guardados, 1 marcados con error y 1 temporales borrados', salida.getvalue())
+        con_temporal.refresh_from_db()
+        self.assertEqual(con_temporal.estado_archivo, Task.EstadoArchivo.LISTO)
+        self.assertEqual(con_temporal.archivo.name, f"tareas/ab/{'ab' * 32}.pdf")
+        self.assertEqual(Task.objects.get(pk=sin_temporal.pk).estado_archivo, Task.EstadoArchivo.ERROR)
+        self.assertEqual(Task.objects.get(pk=reciente.pk).estado_archivo, Task.EstadoArchivo.PENDIENTE)
+        self.assertEqual(os.listdir(self.temporales.name), [f'tarea-{reciente.pk}.pdf.subida'])
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class FotoPerfilTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(self.settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.user, self.perfil = crear_perfil()
+        self.client.force_login(self.user)
+
+    def test_genera_versiones_reducidas_y_la_pagina_usa_srcset(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 900), 'teal').save(buffer, 'PNG')
+        self.client.get(reverse('hoja_vida'))  # se cachea sin foto
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.foto = SimpleUploadedFile('yo.png', buffer.getvalue())
+            self.perfil.save()
+
+        derivados = sorted(os.listdir(os.path.join(self.media.name, 'perfil', 'derivados')))
+        self.assertEqual(derivados, sorted(f'yo.png-{a}.{e}' for a in (96, 180, 360) for e in ('jpg', 'webp')))
+        with Image.open(os.path.join(self.media.name, 'perfil', 'derivados', 'yo.png-180.webp')) as reducida:
+            self.assertEqual(reducida.size, (180, 180))
+
+        respuesta = self.client.get(reverse('hoja_vida'))
+        self.assertContains(respuesta, 'type="image/webp" srcset="/media/perfil/derivados/yo.png-96.webp 96w')
+        self.assertContains(respuesta, 'src="/media/perfil/derivados/yo.png-180.jpg"')
+        # La original solo aparece como enlace explícito
+        self.assertNotContains(respuesta, 'src="/media/perfil/yo.png"')
+
+    def test_fotos_que_solo_difieren_en_la_extension_no_comparten_derivados(self):
+        from PIL import Image
+
+        _, otro = crear_perfil('beto', cedula='0911111111')
+        for perfil, color, formato, nombre in ((self.perfil, 'red', 'PNG', 'foto.png'), (otro, 'blue', 'JPEG', 'foto.jpg')):
+            buffer = io.BytesIO()
+            Image.new('RGB', (400, 400), color).save(buffer, formato)
+            with self.captureOnCommitCallbacks(execute=True):
+                perfil.foto = SimpleUploadedFile(nombre, buffer.getvalue())
+                perfil.save()
+
+        with Image.open(os.path.join(self.media.name, 'perfil', 'derivados', 'foto.jpg-360.jpg')) as reducida:
+            rojo, _, azul = reducida.getpixel((180, 180))
+        self.assertGreater(azul, rojo)
+
+
+class ServirMediaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(self.settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+        self.dueno = User.objects.create_user('ana', password='clave-segura-123')
+        self.nombre = f"tareas/ab/{'ab' * 32}.txt"
+        os.makedirs(os.path.join(self.media.name, 'tareas', 'ab'))
+        with open(os.path.join(self.media.name, self.nombre), 'wb') as archivo:
+            archivo.write(b'0123456789')
+        Task.objects.create(title='Con adjunto', user=self.dueno, archivo=self.nombre)
+        self.url = f'/media/{self.nombre}'
+
+    def test_adjunto_solo_para_su_dueno(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(User.objects.create_user('otro'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(self.dueno)
+        respuesta = self.client.get(self.url)
+        self.assertEqual(b''.join(respuesta.streaming_content), b'0123456789')
+        self.assertEqual(respuesta['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    def test_range(self):
+        self.client.force_login(self.dueno)
+        parcial = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), b'2345')
+        self.assertEqual(parcial['Content-Range'], 'bytes 2-5/10')
+
+        final = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(final.streaming_content), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+    def test_x_accel_redirect_y_rutas_fuera_de_media(self):
+        self.client.force_login(self.dueno)
+        with self.settings(MEDIA_SERVE_BACKEND='x-accel'):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['X-Accel-Redirect'], f'/protected-media/{self.nombre}')
+        self.assertEqual(respuesta.content, b'')
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class EditarPerfilGuardadoTests(TestCase):
+    FILAS = 30
+
+    def preparar(self, username, cedula):
+        user, perfil = crear_perfil(username, cedula=cedula)
+        Curso.objects.bulk_create([
+            Curso(perfil=perfil, nombre_curso=f'Curso {i}', institucion='UTM', horas=i) for i in range(self.FILAS)
+        ])
+        return user, perfil
+
+    def datos_post(self, perfil):
+        # Se renombran todas las filas, se borran 5 y se agrega 1
+        datos = {
+            'nombres': 'Ana', 'apellidos': 'Pérez', 'cedula': perfil.cedula, 'nacionalidad': 'Ecuatoriana',
+            'direccion_domiciliaria': 'Quito', 'perfil_profesional': 'Desarrolladora',
+        }
+        for prefijo in ('experiencias', 'productos_lab', 'productos_acad'):
+            datos.update({f'{prefijo}-TOTAL_FORMS': 0, f'{prefijo}-INITIAL_FORMS': 0})
+        cursos = list(perfil.cursos.order_by('pk'))
+        datos.update({'cursos-TOTAL_FORMS': len(cursos) + 1, 'cursos-INITIAL_FORMS': len(cursos)})
+        for i, curso in enumerate(cursos):
+            datos.update({
+                f'cursos-{i}-id': curso.pk, f'cursos-{i}-perfil': perfil.pk,
+                f'cursos-{i}-nombre_curso': f'Editado {i}', f'cursos-{i}-institucion': 'UTM', f'cursos-{i}-horas': i,
+            })
+            if i < 5:
+                datos[f'cursos-{i}-DELETE'] = 'on'
+        n = len(cursos)
+        datos.update({f'cursos-{n}-nombre_curso': 'Nuevo', f'cursos-{n}-institucion': 'ESPE', f'cursos-{n}-horas': 3})
+        return datos
+
+    def test_guardado_en_bloque_y_consultas_antes_y_despues(self):
+        from django.forms import inlineformset_factory
+        from .form import PerfilForm
+
+        # Antes: formsets de Django tal cual, validados y guardados fila por fila sin transacción
+        _, antes = self.preparar('antes', '1111111111')
+        datos = self.datos_post(antes)
+        with CaptureQueriesContext(connection) as fila_por_fila:
+            form = PerfilForm(datos, instance=antes)
+            formsets = [
+                inlineformset_factory(DatosPersonales, modelo, fields=campos, extra=1, can_delete=True)(datos, instance=antes)
+                for modelo, campos in (
+                    (ExperienciaLaboral, ['nombre_empresa', 'cargo_desempenado', 'fecha_inicio', 'fecha_fin']),
+                    (Curso, ['nombre_curso', 'institucion', 'horas']),
+                    (ProductoLaboral, ['nombre_producto', 'descripcion']),
+                    (ProductoAcademico, ['nombre_recurso', 'descripcion']),
+                )
+            ]
+            self.assertTrue(form.is_valid() and all(f.is_valid() for f in formsets))
+            form.save()
+            for formset in formsets:
+                formset.save()
+
+        # Después: la vista completa, con guardado en bloque
+        user, perfil = self.preparar('despues', '2222222222')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as en_bloque:
+                respuesta = self.client.post(reverse('editar_perfil'), self.datos_post(perfil))
+        self.assertRedirects(respuesta, reverse('hoja_vida'), fetch_redirect_response=False)
+
+        nombres = sorted(perfil.cursos.values_list('nombre_curso', flat=True))
+        self.assertEqual(nombres, sorted(antes.cursos.values_list('nombre_curso', flat=True)))
+        self.assertEqual(len(nombres), self.FILAS - 5 + 1)
+        self.assertIn('Nuevo', nombres)
+        # 30 filas: antes ~2 consultas por fila; ahora una cantidad fija que no depende de las filas
+        self.assertGreater(len(fila_por_fila), 2 * self.FILAS)
+        self.assertLessEqual(len(en_bloque), 15)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class AutoguardadoCVTests(TestCase):
+    def setUp(self):
+        self.user, self.perfil = crear_perfil()
+        self.client.force_login(self.user)
+        self.cursos = Curso.objects.bulk_create([
+            Curso(perfil=self.perfil, nombre_curso=f'Curso {i}', institucion='UTM', horas=10) for i in range(3)
+        ])
+        self.url = reverse('api_autoguardar_cv', args=['cursos'])
+
+    def patch(self, *filas, url=None):
+        return self.client.patch(url or self.url, {'filas': list(filas)}, content_type='application/json')
+
+    def test_guarda_solo_el_campo_enviado_e_incrementa_la_version(self):
+        curso = self.cursos[0]
+        respuesta = self.patch({'id': curso.pk, 'version': 1, 'horas': 40})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['actualizadas'], [{'id': curso.pk, 'version': 2}])
+        curso.refresh_from_db()
+        self.assertEqual((curso.nombre_curso, curso.horas, curso.version), ('Curso 0', 40, 2))
+
+    def test_version_vieja_responde_409_y_no_guarda_nada(self):
+        self.patch({'id': self.cursos[0].pk, 'version': 1, 'horas': 40})
+        respuesta = self.patch(
+            {'id': self.cursos[1].pk, 'version': 1, 'horas': 5},
+            {'id': self.cursos[0].pk, 'version': 1, 'horas': 1},
+        )
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['conflictos'], [{'id': self.cursos[0].pk, 'version': 2}])
+        # La fila sin conflicto tampoco se guardó
+        self.assertEqual(Curso.objects.get(pk=self.cursos[1].pk).horas, 10)
+
+    def test_crear_borrar_y_errores_por_fila(self):
+        ajeno = crear_perfil('otro', cedula='0999999999')[1].cursos.create(nombre_curso='X', institucion='Y', horas=1)
+        respuesta = self.patch({'id': ajeno.pk, 'version': 1, 'horas': 2}, {'nombre_curso': 'Sin horas'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(set(respuesta.json()['errores']), {'0', '1'})
+
+        respuesta = self.patch(
+            {'nombre_curso': 'Docker', 'institucion': 'ESPE', 'horas': 8},
+            {'id': self.cursos[2].pk, 'version': 1, 'borrar': True},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        creada = respuesta.json()['creadas'][0]
+        self.assertEqual(Curso.objects.get(pk=creada['id']).perfil, self.perfil)
+        self.assertFalse(Curso.objects.filter(pk=self.cursos[2].pk).exists())
+        self.assertEqual(self.patch({'x': 1}, url=reverse('api_autoguardar_cv', args=['otra'])).status_code, 404)
+
+    def test_invalida_cache_del_cv(self):
+        cache.clear()
+        self.client.get(reverse('hoja_vida'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patch({'id': self.cursos[0].pk, 'version': 1, 'nombre_curso': 'Renombrado'})
+        self.assertContains(self.client.get(reverse('hoja_vida')), 'Renombrado')
+
+    def test_guardado_completo_incrementa_la_version(self):
+        from .form import CursoFormSet, PerfilForm, guardar_perfil_completo
+
+        datos = {
+            'nombres': 'Ana', 'apellidos': 'Pérez', 'cedula': self.perfil.cedula, 'nacionalidad': 'Ecuatoriana',
+            'direccion_domiciliaria': 'Quito', 'perfil_profesional': 'Desarrolladora',
+            'cursos-TOTAL_FORMS': 1, 'cursos-INITIAL_FORMS': 1, 'cursos-0-id': self.cursos[0].pk,
+            'cursos-0-nombre_curso': 'Desde el formulario', 'cursos-0-institucion': 'UTM', 'cursos-0-horas': 10,
+        }
+        form, formset = PerfilForm(datos, instance=self.perfil), CursoFormSet(datos, instance=self.perfil)
+        self.assertTrue(form.is_valid() and formset.is_valid())
+        guardar_perfil_completo(form, [formset])
+        self.assertEqual(Curso.objects.get(pk=self.cursos[0].pk).version, 2)
+        # Un autoguardado abierto antes de ese envío ya no puede pisarlo
+        self.assertEqual(self.patch({'id': self.cursos[0].pk, 'version': 1, 'horas': 1}).status_code, 409)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class BusquedaCVTests(TestCase):
+    def setUp(self):
+        _, self.ana = crear_perfil('ana', perfil_profesional='Desarrolladora backend')
+        _, self.luis = crear_perfil('luis', cedula='1111111111', nombres='Luis', apellidos='Mora')
+        _, self.eva = crear_perfil('eva', cedula='2222222222', nombres='Eva', apellidos='Ríos')
+        ExperienciaLaboral.objects.create(
+            perfil=self.ana, nombre_empresa='ACME Software', cargo_desempenado='Programadora', fecha_inicio=date(2020, 1, 1)
+        )
+        Curso.objects.create(perfil=self.ana, nombre_curso='Python avanzado', institucion='ACME Academy', horas=40)
+        Curso.objects.create(perfil=self.luis, nombre_curso='Redes', institucion='ACME Academy', horas=20)
+        call_command('reindexar_cvs', stdout=io.StringIO())
+        self.admin = User.objects.create_superuser('admin', password='clave-segura-123')
+
+    def test_ordena_por_relevancia_sin_acentos_y_por_prefijo(self):
+        from .busqueda import buscar
+
+        # ana menciona ACME dos veces, luis una, eva ninguna
+        perfiles, hay_siguiente = buscar('acme')
+        self.assertEqual(perfiles, [self.ana, self.luis])
+        self.assertFalse(hay_siguiente)
+        self.assertEqual(buscar('rios')[0], [self.eva])
+        self.assertEqual(buscar('progra acme')[0], [self.ana])
+        self.assertEqual(buscar('"); DROP TABLE --')[0], [])
+
+    def test_paginacion(self):
+        from .busqueda import buscar
+
+        self.assertEqual(buscar('acme', pagina=1, tamano=1), ([self.ana], True))
+        self.assertEqual(buscar('acme', pagina=2, tamano=1), ([self.luis], False))
+
+    def test_se_actualiza_con_las_senales(self):
+        from .busqueda import buscar
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExperienciaLaboral.objects.create(
+                perfil=self.eva, nombre_empresa='Globex', cargo_desempenado='Analista', fecha_inicio=date(2021, 1, 1)
+            )
+        self.assertEqual(buscar('globex')[0], [self.eva])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eva.experiencias.all().delete()
+        self.assertEqual(buscar('globex')[0], [])
+
+    def test_un_reindexado_por_perfil_y_transaccion(self):
+        from django.db import transaction
+        from .busqueda import buscar
+
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for i in range(5):
+                        Curso.objects.create(perfil=self.eva, nombre_curso=f'Globex {i}', institucion='UTM', horas=i)
+        escrituras_indice = [
+            q['sql'] for q in consultas.captured_queries
+            if 'pagina_usuario_indicecv' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(escrituras_indice), 1)
+        self.assertEqual(buscar('globex')[0], [self.eva])
+
+    def test_vista_solo_para_staff_y_admin(self):
+        url = reverse('buscar_cvs')
+        self.client.force_login(self.ana.user)
+        self.assertEqual(self.client.get(url, {'q': 'acme'}).status_code, 302)
+
+        self.client.force_login(self.admin)
+        respuesta = self.client.get(url, {'q': 'acme'})
+        self.assertEqual(list(respuesta.context['perfiles']), [self.ana, self.luis])
+
+        changelist = self.client.get(reverse('admin:pagina_usuario_datospersonales_changelist'), {'q': 'redes'})
+        self.assertEqual(list(changelist.context['cl'].result_list), [self.luis])
+
+
+class AdminEscalaTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='clave-segura-123'))
+
+    def con_filas(self, username, cedula, n):
+        _, perfil = crear_perfil(username, cedula=cedula)
+        ExperienciaLaboral.objects.bulk_create([
+            ExperienciaLaboral(perfil=perfil, nombre_empresa=f'E{i}', cargo_desempenado='Dev', fecha_inicio=date(2020, 1, 1))
+            for i in range(n)
+        ])
+        for modelo, campos in (
+            (Curso, {'nombre_curso': 'C', 'institucion': 'I', 'horas': 1}),
+            (Recomendacion, {'nombre_persona': 'R', 'telefono': '099'}),
+            (ProductoLaboral, {'nombre_producto': 'P', 'descripcion': 'D'}),
+            (ProductoAcademico, {'nombre_recurso': 'A', 'descripcion': 'D'}),
+        ):
+            modelo.objects.bulk_create([modelo(perfil=perfil, **campos) for _ in range(n)])
+        return perfil
+
+    def consultas_ficha(self, perfil, **params):
+        url = reverse('admin:pagina_usuario_datospersonales_change', args=[perfil.pk])
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(consultas)
+
+    def test_ficha_con_muchas_filas_cuesta_lo_mismo_que_con_pocas(self):
+        perfil = self.con_filas('ana', '0102030405', 3)
+        self.consultas_ficha(perfil)  # la primera visita llena la caché de ContentType
+        _, pocas = self.consultas_ficha(perfil)
+        respuesta, muchas = self.consultas_ficha(self.con_filas('luis', '1111111111', 150))
+        self.assertEqual(pocas, muchas)
+        self.assertLess(muchas, 30)
+        formset = respuesta.context['inline_admin_formsets'][0].formset
+        self.assertEqual((len(formset.initial_forms), formset.paginas), (20, 8))
+        self.assertContains(respuesta, 'pagina_experiencias=2')
+
+    def test_guardar_una_pagina_valida_solo_sus_filas(self):
+        from django.test import RequestFactory
+        from .admin import ExperienciaInline
+        from django.contrib import admin as django_admin
+
+        perfil = self.con_filas('ana', '0102030405', 45)
+        inline = ExperienciaInline(DatosPersonales, django_admin.site)
+        request = RequestFactory().get('/', {'pagina_experiencias': 3})
+        request.user = User.objects.get(username='admin')
+        FormSet = inline.get_formset(request, perfil)
+        filas = list(perfil.experiencias.order_by('pk')[40:])
+
+        def datos(filas_enviadas):
+            datos = {'experiencias-TOTAL_FORMS': len(filas_enviadas), 'experiencias-INITIAL_FORMS': len(filas_enviadas)}
+            for i, fila in enumerate(filas_enviadas):
+                datos.update({
+                    f'experiencias-{i}-id': fila.pk, f'experiencias-{i}-perfil': perfil.pk,
+                    f'experiencias-{i}-nombre_empresa': 'Editada', f'experiencias-{i}-cargo_desempenado': 'Dev',
+                    f'experiencias-{i}-fecha_inicio': '2020-01-01',
+                })
+            return datos
+
+        formset = FormSet(datos(filas), instance=perfil)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(perfil.experiencias.filter(nombre_empresa='Editada', version=2).count(), 5)
+        # Una fila de la página 1 no pertenece a esta página
+        self.assertFalse(FormSet(datos(list(perfil.experiencias.order_by('pk')[:1])), instance=perfil).is_valid())
+
+    def test_listados_con_perfil_y_conteos_sin_consulta_por_fila(self):
+        for i in range(25):
+            self.con_filas(f'u{i}', f'{i:010d}', 2)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('admin:pagina_usuario_curso_changelist'))
+        self.assertEqual(len(respuesta.context['cl'].result_list), 50)
+        self.assertLess(len(consultas), 10)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('admin:pagina_usuario_datospersonales_changelist'))
+        self.assertLess(len(consultas), 10)
+        self.assertEqual(respuesta.context['cl'].result_list[0].num_cursos, 2)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class AnaliticaTareasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+    def test_resumen_incremental_igual_al_reconstruido(self):
+        from .analitica import reconstruir
+        from .models import ResumenDiarioTareas
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(4):
+                self.client.post(reverse('api_tasks'), {'title': f'T{i}', 'important': i == 0}, content_type='application/json')
+            self.client.post(reverse('create_task'), {'title': 'Desde el formulario'})
+        ids = list(Task.objects.values_list('pk', flat=True))
+        # Las tareas se crearon "hace 2 horas"
+        Task.objects.update(created=timezone.now() - timezone.timedelta(hours=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api_complete_tasks'), {'ids': ids[:2]}, content_type='application/json')
+            self.client.get(reverse('complete_task', args=[ids[2]]))
+            self.client.get(reverse('complete_task', args=[ids[2]]))  # ya completada: no cuenta dos veces
+
+        incremental = list(ResumenDiarioTareas.objects.values('dia', 'creadas', 'importantes', 'completadas'))
+        self.assertEqual(incremental[0] | {'dia': None}, {'dia': None, 'creadas': 5, 'importantes': 1, 'completadas': 3})
+        reconstruir()
+        self.assertEqual(list(ResumenDiarioTareas.objects.values('dia', 'creadas', 'importantes', 'completadas')), incremental)
+
+        datos = self.client.get(reverse('api_tasks_stats'), {'semanas': 4}).json()
+        self.assertEqual(len(datos['semanas']), 4)
+        self.assertEqual(datos['completadas'], 3)
+        self.assertEqual(datos['horas_promedio_para_completar'], 2.0)
+        self.assertEqual(datos['porcentaje_importantes'], 20.0)
+        self.assertEqual(self.client.get(reverse('api_tasks_stats'), {'semanas': 5}).status_code, 400)
+
+    def test_consultas_constantes_sin_importar_el_historial(self):
+        from .analitica import reconstruir
+
+        Task.objects.bulk_create([Task(title=f'T{i}', user=self.user) for i in range(300)])
+        # Un año de historial: una tarea creada y completada por día
+        ahora = timezone.now()
+        for i, task in enumerate(Task.objects.order_by('pk')):
+            Task.objects.filter(pk=task.pk).update(
+                created=ahora - timezone.timedelta(days=i, hours=3), datecompleted=ahora - timezone.timedelta(days=i)
+            )
+        reconstruir()
+
+        # sesión + usuario + una consulta agregada sobre a lo sumo 7 * 52 resúmenes
+        with self.assertNumQueries(3):
+            datos = self.client.get(reverse('api_tasks_stats'), {'semanas': 52}).json()
+        self.assertEqual(datos['horas_promedio_para_completar'], 3.0)
+        # Segunda vez desde la caché
+        with self.assertNumQueries(2):
+            self.client.get(reverse('api_tasks_stats'), {'semanas': 52})
+        self.assertContains(self.client.get(reverse('tasks_stats')), 'horas en promedio para completar')
+
+        # Completar una tarea invalida la caché
+        nueva = Task.objects.create(title='Nueva', user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('complete_task', args=[nueva.pk]))
+        self.assertEqual(
+            self.client.get(reverse('api_tasks_stats'), {'semanas': 52}).json()['completadas'], datos['completadas'] + 1
+        )
+
+
+@override_settings(METRICAS_ACTIVAS=True, METRICAS_TOKEN='')
+class MetricasTests(TestCase):
+    def setUp(self):
+        from .metricas import registro
+
+        registro.limpiar()
+        cache_pdf.limpiar()
+        self.user, _ = crear_perfil()
+        self.client.force_login(self.user)
+
+    def test_server_timing_por_partes(self):
+        cabecera = self.client.get(reverse('hoja_vida'))['Server-Timing']
+        self.assertRegex(cabecera, r'sql;dur=[\d.]+;desc="\d+ consultas"')
+        self.assertIn('plantillas;dur=', cabecera)
+        self.assertIn('total;dur=', cabecera)
+        self.assertIn('pdf;dur=', self.client.get(reverse('descargar_cv'))['Server-Timing'])
+
+    def test_exportar_en_formato_prometheus(self):
+        self.client.get(reverse('hoja_vida'))
+        self.client.get(reverse('hoja_vida'))
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 404)  # no es staff
+
+        self.user.is_staff = True
+        self.user.save()
+        texto = self.client.get(reverse('metricas')).content.decode()
+        self.assertIn('# TYPE pagina_usuario_vista_segundos histogram', texto)
+        self.assertIn('pagina_usuario_vista_segundos_count{vista="hoja_vida"} 2', texto)
+        self.assertIn('pagina_usuario_sql_consultas_bucket{vista="hoja_vida",le="+Inf"} 2', texto)
+
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.client.logout()
+            self.assertEqual(self.client.get(reverse('metricas')).status_code, 404)
+            self.assertEqual(self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+    @override_settings(METRICAS_ACTIVAS=False)
+    def test_desactivado_no_agrega_nada(self):
+        from django.test import Client
+
+        respuesta = Client().get(reverse('home'))
+        self.assertNotIn('Server-Timing', respuesta)
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class BenchmarkTests(TestCase):
+    def test_escenarios_y_comparacion(self):
+        from . import benchmark
+
+        users = benchmark.generar_datos(usuarios=3, tareas_por_usuario=20)
+        self.assertEqual(Task.objects.filter(user__in=users).count(), 60)
+        self.assertTrue(self.client.login(username=users[0].username, password=benchmark.CLAVE))
+
+        # El POST tiene que ser válido: si no, se mediría el formulario con errores
+        self.client.force_login(users[1])
+        datos = benchmark.datos_editar_perfil(DatosPersonales.objects.get(user=users[1]))
+        self.assertRedirects(self.client.post(reverse('editar_perfil'), datos), reverse('hoja_vida'))
+
+        resultados = benchmark.ejecutar(users, iteraciones=2)
+        self.assertEqual(set(resultados), set(benchmark.ESCENARIOS))
+        self.assertEqual(set(resultados['tasks']), {'rps', 'p50_ms', 'p99_ms', 'consultas'})
+
+        linea_base = {nombre: dict(r) for nombre, r in resultados.items()}
+        self.assertEqual(benchmark.comparar(resultados, linea_base), [])
+        linea_base['hoja_vida']['consultas'] -= 1
+        linea_base['tasks']['p50_ms'] = resultados['tasks']['p50_ms'] / 2
+        regresiones = benchmark.comparar(resultados, linea_base, holgura_ms=0)
+        self.assertEqual(len(regresiones), 2)
+        self.assertTrue(regresiones[0].startswith('tasks: p50'))
+        # Con la holgura, unos pocos ms de ruido no cuentan
+        linea_base['tasks']['p50_ms'] = resultados['tasks']['p50_ms'] - benchmark.HOLGURA_MS / 2
+        self.assertEqual(len(benchmark.comparar(resultados, linea_base)), 1)
+
+        # Una línea base con más consultas que las actuales quedó vieja: también falla
+        linea_base['tasks']['p50_ms'] = resultados['tasks']['p50_ms']
+        linea_base['hoja_vida']['consultas'] += 2
+        self.assertEqual(len(benchmark.comparar(resultados, linea_base)), 1)
+
+@override_settings(ROOT_URLCONF='mi_proyecto.urls_asgi')
+class VistasAsyncTests(TestCase):
+    # Las vistas de vistas_async.py, atravesando los middlewares en modo async como bajo ASGI
+    def setUp(self):
+        cache_pdf.limpiar()
+        cache.clear()
+        self.user, self.perfil = crear_perfil()
+        ExperienciaLaboral.objects.create(
+            perfil=self.perfil, nombre_empresa='ACME', cargo_desempenado='Dev', fecha_inicio=date(2020, 1, 1)
+        )
+        Task.objects.bulk_create([Task(title=f'Tarea {i}', user=self.user) for i in range(25)])
+        self.async_client.force_login(self.user)
+
+    def test_rutas_async(self):
+        from asgiref.sync import iscoroutinefunction
+        from django.urls import resolve
+
+        for nombre in ('tasks', 'hoja_vida', 'descargar_cv'):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(nombre)).func), nombre)
+
+    async def test_tasks_y_cargar_mas(self):
+        respuesta = await self.async_client.get(reverse('tasks'))
+        self.assertContains(respuesta, 'Tarea 24')
+        self.assertNotContains(respuesta, 'Tarea 4<')
+        cursor = respuesta.context['pendientes']['siguiente']
+
+        mas = await self.async_client.get(reverse('tasks'), {'lista': 'pendientes', 'cursor': cursor})
+        self.assertContains(mas, 'Tarea 4')
+        self.assertIsNone(mas.context['siguiente'])
+
+    async def test_hoja_vida_con_y_sin_perfil(self):
+        respuesta = await self.async_client.get(reverse('hoja_vida'))
+        self.assertContains(respuesta, 'ACME')
+
+        otro = await User.objects.acreate_user('luis', password='clave-segura-123')
+        await self.async_client.aforce_login(otro)
+        self.assertEqual((await self.async_client.get(reverse('hoja_vida'))).status_code, 200)
+        self.assertEqual((await self.async_client.get(reverse('tasks'))).status_code, 200)
+
+    async def test_descarga_pdf_igual_que_la_sincronica(self):
+        respuesta = await self.async_client.get(reverse('descargar_cv'))
+        contenido = b''.join([bloque async for bloque in respuesta.streaming_content])
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(int(respuesta['Content-Length']), len(contenido))
+        self.assertIn('CV_Ana_Pérez.pdf', respuesta['Content-Disposition'])
+
+        segunda = await self.async_client.get(reverse('descargar_cv'), headers={'If-None-Match': respuesta['ETag']})
+        self.assertEqual(segunda.status_code, 304)
+
+        # Mismo CV => misma huella que con la vista síncrona
+        cache_pdf.limpiar()
+        with override_settings(ROOT_URLCONF='mi_proyecto.urls'):
+            await self.client.aforce_login(self.user)
+            sincronica = await sync_to_async(self.client.get)(reverse('descargar_cv'))
+        self.assertEqual(sincronica['ETag'], respuesta['ETag'])
+
+    @override_settings(CV_PDF_CACHE_MAX_BYTES_ENTRADA=0, CV_PDF_SPOOL_MAX_BYTES=0)
+    async def test_pdf_grande_se_transmite_desde_archivo(self):
+        respuesta = await self.async_client.get(reverse('descargar_cv'))
+        contenido = b''.join([bloque async for bloque in respuesta.streaming_content])
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertIsNone(cache_pdf.vigente(self.user.pk, await aversion_de_usuario(self.user)).contenido)
+
+    @override_settings(METRICAS_ACTIVAS=True)
+    async def test_medicion_en_modo_async(self):
+        respuesta = await self.async_client.get(reverse('descargar_cv'))
+        cabecera = respuesta['Server-Timing']
+        self.assertIn('pdf;dur=', cabecera)
+        self.assertIn('plantillas;dur=', (await self.async_client.get(reverse('hoja_vida')))['Server-Timing'])
+
+
+class AutenticacionTests(TestCase):
+    def setUp(self):
+        from .autenticacion import intentos_por_ip, intentos_por_usuario
+
+        cache.clear()
+        intentos_por_ip.limpiar()
+        intentos_por_usuario.limpiar()
+        self.user, _ = crear_perfil()
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(consultas)
+
+    def test_sesion_y_usuario_desde_la_cache(self):
+        self.client.force_login(self.user)
+        url = reverse('hoja_vida')
+        self.client.get(url)
+        sin_cache = self._consultas(url)
+
+        with override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=300
+        ):
+            # SessionMiddleware elige el motor al crearse: hace falta otro cliente
+            self.client = self.client_class()
+            self.client.force_login(self.user)
+            self.client.get(url)
+            self.assertEqual(self._consultas(url), sin_cache - 2)
+
+            # Cambiar la contraseña saca al usuario de la caché: la sesión vieja deja de valer
+            self.user.set_password('otra-clave-456')
+            self.user.save()
+            self.assertRedirects(self.client.get(url), f"{reverse('signin')}?next={url}", fetch_redirect_response=False)
+
+    def test_hash_compatible_con_pbkdf2(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+        from .autenticacion import PBKDF2PasswordHasherAcotado
+
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password('clave-segura-123'))
+        # Un hash hecho por el hasher original de Django se sigue verificando
+        original = PBKDF2PasswordHasher().encode('clave-vieja', 'sal1234567890')
+        self.assertTrue(check_password('clave-vieja', original))
+        self.assertEqual(PBKDF2PasswordHasherAcotado().encode('clave-vieja', 'sal1234567890'), original)
+
+    def test_cubeta_de_fichas(self):
+        from .autenticacion import CubetaDeFichas
+
+        ahora = [0.0]
+        cubeta = CubetaDeFichas(capacidad=3, por_minuto=6, max_claves=2, reloj=lambda: ahora[0])
+        self.assertEqual([cubeta.tomar('a') for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(cubeta.tomar('a'), 10)  # una ficha cada 10 s
+        ahora[0] = 10.0
+        self.assertEqual(cubeta.tomar('a'), 0)
+        self.assertGreater(cubeta.tomar('a'), 0)
+
+        cubeta.tomar('b')
+        cubeta.tomar('c')  # 'a' es la menos usada: se olvida y vuelve a empezar llena
+        self.assertEqual(cubeta.tomar('a'), 0)
+
+    def test_signin_limita_intentos_por_usuario(self):
+        url = reverse('signin')
+        for _ in range(settings.SIGNIN_RAFAGA_USUARIO):
+            respuesta = self.client.post(url, {'username': 'ana', 'password': 'incorrecta'})
+            self.assertEqual(respuesta.status_code, 200)
+
+        # Ni siquiera con la contraseña correcta, y sin importar mayúsculas
+        respuesta = self.client.post(url, {'username': 'ANA', 'password': 'clave-segura-123'})
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertGreater(int(respuesta['Retry-After']), 0)
+        self.assertContains(respuesta, 'Demasiados intentos', status_code=429)
+
+        # Otro usuario desde la misma IP sí puede
+        User.objects.create_user('luis', password='clave-segura-123')
+        self.assertRedirects(
+            self.client.post(url, {'username': 'luis', 'password': 'clave-segura-123'}),
+            reverse('tasks'), fetch_redirect_response=False,
+        )
+        # Y el mismo usuario desde otra IP también: nadie puede dejar afuera a otro
+        self.assertRedirects(
+            self.client_class(REMOTE_ADDR='10.0.0.2').post(url, {'username': 'ana', 'password': 'clave-segura-123'}),
+            reverse('tasks'), fetch_redirect_response=False,
+        )
+
+    def test_ip_del_cliente_detras_del_proxy(self):
+        from django.test import RequestFactory
+        from .autenticacion import ip_cliente
+
+        # El cliente escribe lo que quiera a la izquierda; el proxy agrega la IP real
+        peticion = RequestFactory().post(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.7',
+        )
+        self.assertEqual(ip_cliente(peticion), '10.0.0.1')
+        with override_settings(SIGNIN_PROXIES_CONFIABLES=1):
+            self.assertEqual(ip_cliente(peticion), '203.0.113.7')
+        with override_settings(SIGNIN_PROXIES_CONFIABLES=2):
+            self.assertEqual(ip_cliente(peticion), '1.2.3.4')
+        with override_settings(SIGNIN_PROXIES_CONFIABLES=1):
+            self.assertEqual(ip_cliente(RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')), '10.0.0.1')
+
+
+@override_settings(METRICAS_TOKEN='')
+class DiagnosticoBDTests(TestCase):
+    def test_solo_staff_o_token(self):
+        user, _ = crear_perfil()
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('diagnostico_bd')).status_code, 404)
+
+        user.is_staff = True
+        user.save()
+        datos = self.client.get(reverse('diagnostico_bd')).json()
+        # Los tests corren en SQLite: sin pool
+        self.assertEqual(datos['bases']['default']['motor'], connection.vendor)
+        self.assertTrue(datos['bases']['default']['conn_health_checks'])
+        self.assertIsNone(datos['bases']['default']['pool'])
+
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.client.logout()
+            respuesta = self.client.get(reverse('diagnostico_bd'), HTTP_AUTHORIZATION='Bearer secreto')
+            self.assertEqual(respuesta.status_code, 200)
+
+    def test_resumen_pool(self):
+        from .diagnostico import resumen_pool
+
+        resumen = resumen_pool({
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 1, 'requests_waiting': 3,
+            'requests_num': 200, 'requests_queued': 20, 'requests_wait_ms': 500, 'connections_lost': 1,
+        })
+        self.assertEqual(resumen['en_uso'], 5)
+        self.assertEqual(resumen['libres'], 1)
+        self.assertEqual(resumen['esperando'], 3)
+        self.assertEqual(resumen['espera_promedio_ms'], 2.5)
+        self.assertEqual(resumen['conexiones_perdidas'], 1)
+        self.assertEqual(resumen['pedidos_fallidos'], 0)
+        self.assertEqual(resumen_pool({})['espera_promedio_ms'], 0)
+
+
+
+@override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+class CVPublicoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.perfil = crear_perfil()
+        Curso.objects.create(perfil=self.perfil, nombre_curso='Django avanzado', institucion='UTE', horas=40)
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('compartir_cv'))
+        self.perfil.refresh_from_db()
+        self.url = reverse('cv_publico', args=[self.perfil.slug_publico])
+        self.anonimo = self.client_class()
+
+    def test_compartir_y_revocar(self):
+        self.assertEqual(len(self.perfil.slug_publico), 22)
+        self.assertContains(self.client.get(reverse('hoja_vida')), self.url)
+        self.assertEqual(self.client.get(reverse('compartir_cv')).status_code, 405)
+
+        self.assertEqual(self.anonimo.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('compartir_cv'), {'revocar': ''})
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.slug_publico)
+        self.assertEqual(self.anonimo.get(self.url).status_code, 404)
+
+    def test_pagina_cacheada_y_publica(self):
+        respuesta = self.anonimo.get(self.url)
+        self.assertContains(respuesta, 'Django avanzado')
+        self.assertNotContains(respuesta, reverse('editar_perfil'))
+        # Ni la cédula ni la dirección salen en el enlace público
+        self.assertNotContains(respuesta, self.perfil.cedula)
+        self.assertNotContains(respuesta, self.perfil.direccion_domiciliaria)
+        self.assertContains(self.client.get(reverse('hoja_vida')), self.perfil.cedula)
+        self.assertIn('public', respuesta['Cache-Control'])
+        self.assertNotIn('Cookie', respuesta.get('Vary', ''))
+        self.assertFalse(respuesta.cookies)
+        etag = respuesta['ETag']
+
+        # Sin plantillas y sin leer el CV: sale de la caché, solo se consulta la versión
+        with self.assertNumQueries(1):
+            segunda = self.anonimo.get(self.url)
+        self.assertEqual(segunda.content, respuesta.content)
+        with self.assertNumQueries(1):
+            no_modificado = self.anonimo.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado['ETag'], etag)
+
+    def test_se_purga_al_cambiar_el_cv(self):
+        etag = self.anonimo.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Curso.objects.filter(perfil=self.perfil).get().delete()
+            ExperienciaLaboral.objects.create(
+                perfil=self.perfil, nombre_empresa='ACME', cargo_desempenado='Dev', fecha_inicio=date(2020, 1, 1)
+            )
+        respuesta = self.anonimo.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertNotContains(respuesta, 'Django avanzado')
+        self.assertContains(respuesta, 'ACME')
+
+    def test_version_de_la_base_purga_en_todos_los_workers(self):
+        from .cv import incrementar_version_cv
+
+        etag = self.anonimo.get(self.url)['ETag']
+        # Lo que hace otro worker: cambia la base y la versión, sin tocar la caché de este proceso
+        DatosPersonales.objects.filter(pk=self.perfil.pk).update(nombres='Zoe')
+        incrementar_version_cv(self.perfil.pk)
+        respuesta = self.anonimo.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Zoe')
+
+    def test_slug_desconocido(self):
+        self.assertEqual(self.anonimo.get(reverse('cv_publico', args=['no-existe'])).status_code, 404)
+
+class EstaticosTests(TestCase):
+    def test_collectstatic_con_hash_y_comprimidos(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        with tempfile.TemporaryDirectory() as destino, override_settings(STATIC_ROOT=destino):
+            call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+            nombre = staticfiles_storage.stored_name('css/hoja_vida.css')
+            self.assertRegex(nombre, r'^css/hoja_vida\.[0-9a-f]{12}\.css$')
+            for extension in ('', '.gz', '.br'):
+                self.assertTrue(os.path.exists(os.path.join(destino, nombre + extension)), extension)
+
+            user, _ = crear_perfil()
+            self.client = self.client_class()
+            self.client.force_login(user)
+            self.assertContains(self.client.get(reverse('hoja_vida')), f'/static/{nombre}')
+
+            respuesta = self.client.get(f'/static/{nombre}', HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(respuesta['Content-Encoding'], 'br')
+            self.assertIn('immutable', respuesta['Cache-Control'])
+            respuesta.close()
+
+    def test_sin_manifiesto_usa_el_nombre_original(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        with tempfile.TemporaryDirectory() as destino, override_settings(STATIC_ROOT=destino):
+            self.assertEqual(staticfiles_storage.url('css/base.css'), '/static/css/base.css')
+
+    def test_middleware_repetido(self):
+        from django.apps import apps
+        from django.core.exceptions import ImproperlyConfigured
+        from .checks import middleware_repetido
+
+        self.assertEqual(middleware_repetido(None), [])
+        with override_settings(MIDDLEWARE=[
+            'django.middleware.security.SecurityMiddleware',
+            'whitenoise.middleware.WhiteNoiseMiddleware',
+            'pagina_usuario.estaticos.WhiteNoiseAsyncMiddleware',
+            'django.middleware.security.SecurityMiddleware',
+        ]):
+            errores = middleware_repetido(None)
+            # Y el worker no arranca
+            with self.assertRaisesMessage(ImproperlyConfigured, 'repite a'):
+                apps.get_app_config('pagina_usuario').ready()
+        self.assertEqual([e.id for e in errores], ['pagina_usuario.E001'] * 2)
+
+
+class ArranqueTests(SimpleTestCase):
+    # Techo para lo que importa un worker al arrancar, relativo a solo django.setup() medido
+    # en la misma corrida para no depender de la máquina: hoy es ~1.05 veces y volver a
+    # cargar ReportLab y Pillow al arrancar (~150 ms) lo lleva a ~1.4
+    LIMITE_RELATIVO = 1.25
+
+    def _importar(self, modulos):
+        # (ms del mejor de 3 intentos, módulos importados) según -X importtime
+        import subprocess
+        import sys
+
+        codigo = f"import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_proyecto.settings'); {modulos}"
+        mejor_us, importados = None, set()
+        for _ in range(3):
+            salida = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', codigo],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stderr
+            total_us = 0
+            for linea in salida.splitlines():
+                if not linea.startswith('import time:') or 'cumulative' in linea:
+                    continue
+                _, acumulado, nombre = linea.split('|')
+                importados.add(nombre.strip())
+                if not nombre.startswith('  '):  # solo los de primer nivel: ya incluyen a los demás
+                    total_us += int(acumulado)
+            mejor_us = total_us if mejor_us is None else min(mejor_us, total_us)
+        return mejor_us / 1000, importados
+
+    def test_arranque_sin_reportlab_ni_pillow(self):
+        # ReportLab y Pillow se cargan con el primer PDF o la primera imagen, no al arrancar
+        arranque_ms, modulos = self._importar("import mi_proyecto.wsgi, mi_proyecto.urls")
+        django_ms, _ = self._importar("import django; django.setup()")
+
+        self.assertIn('pagina_usuario.views', modulos)
+        self.assertFalse({m for m in modulos if m.split('.')[0] in ('reportlab', 'PIL')})
+        self.assertLess(arranque_ms, django_ms * self.LIMITE_RELATIVO)
+
+    def test_calentar_compila_plantillas_y_rutas(self):
+        from django.template import engines
+        from .arranque import calentar
+
+        self.assertGreater(calentar(), 0)
+        cargador = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('hoja_vida.html', cargador.get_template_cache)
+        self.assertIn('admin/base.html', cargador.get_template_cache)
+
+
+class ReplicasTests(SimpleTestCase):
+    def test_router(self):
+        from .replicas import EstadoPeticion, RouterReplica, _estado
+
+        router = RouterReplica()
+        # Fuera de una petición (comandos, segundo plano) siempre el primario
+        self.assertEqual(router.db_for_read(Task), 'default')
+
+        estado = EstadoPeticion()
+        token = _estado.set(estado)
+        try:
+            self.assertEqual(router.db_for_read(Task), 'replica')
+            self.assertEqual(router.db_for_write(Task), 'default')
+            # Después de escribir, la misma petición ya no lee de la réplica
+            self.assertEqual(router.db_for_read(Task), 'default')
+        finally:
+            _estado.reset(token)
+
+        token = _estado.set(EstadoPeticion(fijado=True))
+        try:
+            self.assertEqual(router.db_for_read(Task), 'default')
+        finally:
+            _estado.reset(token)
+
+    def test_cookie_de_fijado(self):
+        import time
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .replicas import COOKIE, EstadoPeticion, _fijado, _fijar
+
+        factory = RequestFactory()
+        estado = EstadoPeticion()
+        self.assertNotIn(COOKIE, _fijar(estado, HttpResponse()).cookies)
+        estado.escribio = True
+        cookie = _fijar(estado, HttpResponse()).cookies[COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SEGUNDOS)
+
+        peticion = factory.get('/')
+        peticion.COOKIES[COOKIE] = cookie.value
+        self.assertTrue(_fijado(peticion))
+        peticion.COOKIES[COOKIE] = str(int(time.time()) - 1)
+        self.assertFalse(_fijado(peticion))
+        peticion.COOKIES[COOKIE] = 'x'
+        self.assertFalse(_fijado(peticion))
+
+    def test_dos_sqlite(self):
+        # Primario y réplica en dos archivos; "replicar" es copiar uno sobre el otro
+        import subprocess
+        import sys
+
+        codigo = '''
+import os, shutil, sys
+d = sys.argv[1]
+os.environ.update(
+    DJANGO_SETTINGS_MODULE='mi_proyecto.settings',
+    DATABASE_URL=f'sqlite:///{d}/primario.sqlite3', REPLICA_DATABASE_URL=f'sqlite:///{d}/replica.sqlite3',
+)
+import django; django.setup()
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+setup_test_environment()
+call_command('migrate', verbosity=0)
+c = Client()
+c.force_login(User.objects.create_user('ana'))
+shutil.copy(f'{d}/primario.sqlite3', f'{d}/replica.sqlite3')
+with override_settings(SEGUNDO_PLANO_ASINCRONO=False):
+    r = c.post('/tasks/create/', {'title': 'Recien escrita'})
+assert r.status_code == 302 and 'leer_primario' in r.cookies, r
+assert 'Recien escrita' in c.get('/tasks/').content.decode()
+c.cookies.pop('leer_primario')
+assert 'Recien escrita' not in c.get('/tasks/').content.decode()
+
+# Los fragmentos de la hoja de vida se llenan desde el primario aunque el perfil salga de la réplica
+from pagina_usuario.cv import incrementar_version_cv
+from pagina_usuario.models import DatosPersonales
+perfil = DatosPersonales.objects.create(user=User.objects.get(username='ana'), nombres='Viejo', cedula='0102030405')
+shutil.copy(f'{d}/primario.sqlite3', f'{d}/replica.sqlite3')
+DatosPersonales.objects.filter(pk=perfil.pk).update(nombres='Nuevo')
+incrementar_version_cv(perfil.pk)
+assert 'Nuevo' in c.get('/hojavida/').content.decode()
+'''
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = subprocess.run(
+                [sys.executable, '-c', codigo, directorio], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+        self.assertEqual(salida.returncode, 0, salida.stderr)
+
+
+class ImportacionCVsTests(TestCase):
+    COLUMNAS = ['username', 'email', 'nombres', 'apellidos', 'cedula', 'nacionalidad',
+                'direccion_domiciliaria', 'perfil_profesional', 'experiencias', 'cursos']
+
+    def _csv(self, filas):
+        import csv
+
+        archivo = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False)
+        self.addCleanup(os.unlink, archivo.name)
+        with archivo:
+            escritor = csv.DictWriter(archivo, self.COLUMNAS)
+            escritor.writeheader()
+            escritor.writerows(filas)
+        return archivo.name
+
+    def _fila(self, i, **extra):
+        import json
+
+        fila = {
+            'username': f'candidato{i}', 'email': f'candidato{i}@example.com', 'nombres': 'Luis',
+            'apellidos': f'Mora {i}', 'cedula': f'{i:010d}', 'nacionalidad': 'Ecuatoriana',
+            'direccion_domiciliaria': 'Cuenca', 'perfil_profesional': 'Analista',
+            'experiencias': json.dumps([{'nombre_empresa': f'Empresa{i}', 'cargo_desempenado': 'Dev', 'fecha_inicio': '2021-03-01'}]),
+            'cursos': json.dumps([{'nombre_curso': 'SQL', 'institucion': 'UTE', 'horas': 20}]),
+        }
+        fila.update(extra)
+        return fila
+
+    def test_csv_valida_y_crea_por_lotes(self):
+        from . import busqueda
+        from .models import ImportacionCV
+
+        crear_perfil(cedula='0000000003')
+        ruta = self._csv([
+            self._fila(1), self._fila(2, apellidos=''), self._fila(3), self._fila(4, username='candidato1'),
+            self._fila(5, experiencias='[{"nombre_empresa": "X"}]'), self._fila(6),
+        ])
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('importar_cvs', ruta, '--lote', '2', stdout=salida, stderr=errores)
+
+        self.assertIn('2 perfiles creados y 4 filas rechazadas', salida.getvalue())
+        self.assertIn('filas/s', salida.getvalue())
+        for fila in ('Fila 2: apellidos', 'Fila 3: la cédula', 'Fila 4: el usuario', 'Fila 5: experiencias 1'):
+            self.assertIn(fila, errores.getvalue())
+
+        perfil = DatosPersonales.objects.get(user__username='candidato6')
+        self.assertFalse(perfil.user.has_usable_password())
+        self.assertEqual(perfil.experiencias.get().nombre_empresa, 'Empresa6')
+        self.assertEqual(perfil.cursos.get().horas, 20)
+        # bulk_create no dispara señales: el índice se arma en la importación
+        self.assertEqual(busqueda.filtrar(DatosPersonales.objects.all(), 'Empresa1').get().user.username, 'candidato1')
+
+        importacion = ImportacionCV.objects.get()
+        self.assertEqual((importacion.filas, importacion.creados, importacion.rechazados), (6, 2, 4))
+        self.assertEqual(importacion.estado, ImportacionCV.Estado.TERMINADA)
+
+    def test_consultas_por_lote_y_no_por_fila(self):
+        from .importacion import importar
+
+        def consultas(desde, cantidad):
+            ruta = self._csv([self._fila(i) for i in range(desde, desde + cantidad)])
+            with open(ruta, 'rb') as archivo, CaptureQueriesContext(connection) as capturadas:
+                _, resumen = importar(archivo, 'cvs.csv', tamano_lote=100)
+            self.assertEqual(resumen.creados, cantidad)
+            return len(capturadas)
+
+        self.assertEqual(consultas(1, 5), consultas(100, 40))
+
+    def test_retoma_despues_del_ultimo_lote(self):
+        from .importacion import importar
+
+        class Corte(Exception):
+            pass
+
+        def cortar(importacion, resumen):
+            raise Corte
+
+        ruta = self._csv([self._fila(i) for i in range(1, 6)])
+        with open(ruta, 'rb') as archivo, self.assertRaises(Corte):
+            importar(archivo, 'cvs.csv', tamano_lote=2, progreso=cortar)
+        self.assertEqual(DatosPersonales.objects.count(), 2)
+
+        with open(ruta, 'rb') as archivo:
+            importacion, resumen = importar(archivo, 'cvs.csv', tamano_lote=2)
+        self.assertEqual((resumen.omitidas, resumen.filas, resumen.creados, resumen.rechazados), (2, 3, 3, 0))
+        self.assertEqual(importacion.creados, 5)
+        self.assertEqual(DatosPersonales.objects.count(), 5)
+
+        # Terminada: el mismo archivo ya no hace nada
+        with open(ruta, 'rb') as archivo:
+            self.assertEqual(importar(archivo, 'cvs.csv')[1].filas, 0)
+
+    def test_json_resume_en_streaming(self):
+        import json
+        from .cv import perfiles_completos
+        from .importacion import importar, leer_json
+
+        cvs = [{
+            'basics': {
+                'name': 'María José Vera Loor', 'email': f'maria{i}@example.com', 'summary': 'x' * 900,
+                'location': {'address': 'Av. Amazonas', 'city': 'Quito', 'countryCode': 'EC'},
+            },
+            'work': [{'name': 'ACME', 'position': 'QA', 'startDate': '2019-04'}],
+            'education': [{'institution': 'EPN', 'studyType': 'Ingeniería', 'area': 'Sistemas'}],
+            'projects': [{'name': 'Portal', 'description': 'Web'}],
+        } for i in range(3)]
+        contenido = json.dumps(cvs, indent=2)
+        # Bloques más chicos que un objeto: cada uno se arma de varias lecturas
+        self.assertEqual(list(leer_json(io.StringIO(contenido), tamano_bloque=7)), cvs)
+        jsonl = '\n'.join(json.dumps(cv) for cv in cvs)
+        self.assertEqual(list(leer_json(io.StringIO(jsonl), tamano_bloque=7)), cvs)
+
+        _, resumen = importar(io.BytesIO(contenido.encode()), 'cvs.json')
+        self.assertEqual(resumen.creados, 3)
+        perfil = perfiles_completos(DatosPersonales.objects.filter(user__email='maria0@example.com')).get()
+        self.assertEqual((perfil.nombres, perfil.apellidos), ('María José', 'Vera Loor'))
+        self.assertEqual(perfil.direccion_domiciliaria, 'Av. Amazonas, Quito')
+        self.assertEqual(len(perfil.perfil_profesional), 500)
+        self.assertEqual(perfil.experiencias.get().fecha_inicio, date(2019, 4, 1))
+        self.assertEqual(perfil.cursos.get().nombre_curso, 'Ingeniería Sistemas')
+
+        with self.assertRaises(ValueError):
+            importar(io.BytesIO(b'[{"basics": '), 'roto.json')
+
+    @override_settings(SEGUNDO_PLANO_ASINCRONO=False)
+    def test_subida_en_el_admin_en_segundo_plano(self):
+        from .models import ImportacionCV
+
+        admin = User.objects.create_superuser('admin', password='clave-segura-123')
+        self.client.force_login(admin)
+        url = reverse('admin:pagina_usuario_datospersonales_importar')
+        self.assertContains(self.client.get(reverse('admin:pagina_usuario_datospersonales_changelist')), url)
+
+        with open(self._csv([self._fila(1), self._fila(1, cedula='0000000099')]), 'rb') as archivo:
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = self.client.post(url, {'archivo': archivo})
+        self.assertRedirects(respuesta, reverse('admin:pagina_usuario_importacioncv_changelist'))
+        importacion = ImportacionCV.objects.get()
+        self.assertEqual(
+            (importacion.estado, importacion.filas, importacion.creados, importacion.rechazados),
+            (ImportacionCV.Estado.TERMINADA, 2, 1, 1),
+        )
+        self.assertIn('Fila 2:', importacion.errores)
+        self.assertContains(self.client.get(respuesta.url), 'Terminada')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'archivo': SimpleUploadedFile('roto.json', b'{"a": ')})
+        roto = ImportacionCV.objects.get(nombre_archivo='roto.json')
+        self.assertEqual(roto.estado, ImportacionCV.Estado.ERROR)
+        self.assertIn('Fila 1:', roto.errores)
+
+    def test_cualquier_error_deja_la_importacion_en_error(self):
+        import csv
+        from .importacion import importar, importar_en_segundo_plano
+        from .models import ImportacionCV
+
+        with open(self._csv([self._fila(1), self._fila(2, nombres='Iñaki')]), 'rb') as archivo:
+            bueno = archivo.read()
+        enorme = self._csv([self._fila(3), self._fila(4, perfil_profesional='x' * (csv.field_size_limit() + 1))])
+        with open(enorme, 'rb') as archivo:
+            enorme = archivo.read()
+        # Una celda más grande que csv.field_size_limit() y un archivo que no es UTF-8
+        for nombre, contenido, motivo in (
+            ('enorme.csv', enorme, 'Fila 2: field larger than field limit'),
+            ('latin1.csv', bueno.decode().encode('latin-1'), 'El archivo no está en UTF-8'),
+        ):
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as archivo:
+                archivo.write(contenido)
+            importar_en_segundo_plano(archivo.name, nombre)
+            importacion = ImportacionCV.objects.get(nombre_archivo=nombre)
+            self.assertEqual(importacion.estado, ImportacionCV.Estado.ERROR)
+            self.assertIn(motivo, importacion.errores)
+            self.assertFalse(os.path.exists(archivo.name))
+
+        # Un error que no es del archivo también la deja en ERROR, y se propaga
+        def fallar(importacion, resumen):
+            raise RuntimeError('sin disco')
+
+        with open(self._csv([self._fila(5)]), 'rb') as archivo, self.assertRaises(RuntimeError):
+            importar(archivo, 'cvs.csv', tamano_lote=1, progreso=fallar)
+        importacion = ImportacionCV.objects.get(nombre_archivo='cvs.csv')
+        self.assertEqual(importacion.estado, ImportacionCV.Estado.ERROR)
+        self.assertIn('Después de la fila 1: RuntimeError: sin disco', importacion.errores)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api, metricas, diagnostico
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -9,7 +9,17 @@ urlpatterns = [
     path('tasks/', views.tasks, name='tasks'),
     path('tasks/create/', views.create_task, name='create_task'),
     path('tasks/<int:task_id>/complete/', views.complete_task, name='complete_task'),
+    path('tasks/estadisticas/', views.estadisticas_tareas, name='tasks_stats'),
     path('hojavida/', views.hoja_vida, name='hoja_vida'),
+    path('hojavida/compartir/', views.compartir_cv, name='compartir_cv'),
+    path('cv/<slug:slug>/', views.cv_publico, name='cv_publico'),
     path('perfil/editar/', views.editar_perfil, name='editar_perfil'),
     path('descargar-cv/', views.descargar_cv_pdf, name='descargar_cv'),
+    path('candidatos/buscar/', views.buscar_cvs, name='buscar_cvs'),
+    path('api/tasks/', api.tareas, name='api_tasks'),
+    path('api/tasks/complete/', api.completar_tareas, name='api_complete_tasks'),
+    path('api/tasks/stats/', api.estadisticas_tareas, name='api_tasks_stats'),
+    path('metricas/', metricas.exportar, name='metricas'),
+    path('diagnostico/bd/', diagnostico.diagnostico_bd, name='diagnostico_bd'),
+    path('api/cv/<str:seccion>/', api.autoguardar_seccion, name='api_autoguardar_cv'),
 ]
\ No newline at end of file
@@ -1,21 +1,41 @@
+import math
+import secrets
+import tempfile
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db import IntegrityError
 from django.utils import timezone
-from django.forms import inlineformset_factory, widgets
-from django.http import HttpResponse
-from io import BytesIO
-
-# --- IMPORTACIONES PARA EL PDF (REPORTLAB) ---
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import LETTER
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
 
 # Modelos y Formularios
-from .models import Task, DatosPersonales, ExperienciaLaboral, Curso, ProductoLaboral, ProductoAcademico, Recomendacion
-from .form import PerfilForm
+from .models import Task, DatosPersonales
+from .form import (
+    PerfilForm, ExperienciaFormSet, CursoFormSet, ProdLabFormSet, ProdAcadFormSet, guardar_perfil_completo
+)
+from . import pdf
+from .adjuntos import SubidaConHashHandler, descartar_temporales, entregar_adjunto
+from .autenticacion import espera_signin
+from .segundo_plano import encolar
+from .metricas import medir
+from .paginacion import pagina_keyset
+from .cv import (
+    cargar_cv, cargar_perfil, completar_cv, perfiles_completos, version_de_usuario, fragmentos_cv_en_cache,
+    pagina_publica_en_cache, guardar_pagina_publica,
+)
+from .pdf_cache import cache_pdf, EntradaPDF
+from .replicas import PRIMARIO, primario
+from . import analitica, busqueda
 
 def home(request):
     return render(request, 'home.html')
@@ -36,6 +56,14 @@ def signin(request):
     if request.method == 'GET':
         return render(request, 'signin.html', {'form': AuthenticationForm()})
     else:
+        # Antes de autenticar: un intento rechazado no llega a hashear la contraseña
+        espera = espera_signin(request)
+        if espera:
+            response = render(request, 'signin.html', {
+                'form': AuthenticationForm(), 'error': 'Demasiados intentos. Espera un momento y vuelve a intentarlo',
+            }, status=429)
+            response['Retry-After'] = math.ceil(espera)
+            return response
         form = AuthenticationForm(data=request.POST)
         if form.is_valid():
             user = form.get_user()
@@ -49,59 +77,168 @@ def signout(request):
     logout(request)
     return redirect('home')
 
+# Cada lista del panel: (plantilla parcial, campo de orden, filtro)
+LISTAS_TAREAS = {
+    'pendientes': ('task_pendientes.html', 'created', {'datecompleted__isnull': True}),
+    'completadas': ('task_completadas.html', 'datecompleted', {'datecompleted__isnull': False}),
+}
+
+def _pagina_tareas(request, lista, cursor=None):
+    plantilla, campo, filtro = LISTAS_TAREAS[lista]
+    tareas, siguiente = pagina_keyset(
+        Task.objects.filter(user=request.user, **filtro), campo, cursor, settings.TASKS_PAGE_SIZE
+    )
+    return plantilla, {'tareas': tareas, 'siguiente': siguiente, 'lista': lista}
+
 @login_required
 def tasks(request):
-    tasks_pending = Task.objects.filter(user=request.user, datecompleted__isnull=True).order_by('-created')
-    tasks_completed = Task.objects.filter(user=request.user, datecompleted__isnull=False).order_by('-datecompleted')
-    return render(request, 'task.html', {'tasks_pending': tasks_pending, 'tasks_completed': tasks_completed})
+    lista = request.GET.get('lista')
+    if lista in LISTAS_TAREAS:
+        # "Cargar más": devolvemos solo el siguiente tramo de esa lista
+        plantilla, contexto = _pagina_tareas(request, lista, request.GET.get('cursor'))
+        return render(request, plantilla, contexto)
 
+    _, pendientes = _pagina_tareas(request, 'pendientes')
+    _, completadas = _pagina_tareas(request, 'completadas')
+    return render(request, 'task.html', {'pendientes': pendientes, 'completadas': completadas})
+
+# El handler de subida hay que cambiarlo antes de que se lea request.POST, y la
+# verificación CSRF lo lee: por eso la vista externa (csrf_exempt) lo cambia y
+# recién la interna (csrf_protect) verifica el token, como indica la documentación.
+@csrf_exempt
 @login_required
 def create_task(request):
+    if request.method != 'POST':
+        return _crear_tarea(request)
+    request.upload_handlers = [SubidaConHashHandler(request)]
+    try:
+        return _crear_tarea(request)
+    finally:
+        # Pase lo que pase (incluso un 403 de CSRF), ningún temporal sin entregar queda en disco
+        descartar_temporales(request)
+
+@csrf_protect
+def _crear_tarea(request):
     if request.method == 'GET':
         return render(request, 'create_tasks.html')
     else:
         title = request.POST.get('title')
-        if title:
-            Task.objects.create(
-                title=title,
-                description=request.POST.get('description', ''),
-                important='important' in request.POST,
-                archivo=request.FILES.get('archivo'),
-                user=request.user
-            )
-            return redirect('tasks')
-        return render(request, 'create_tasks.html', {'error': 'El título es obligatorio'})
+        adjunto = request.FILES.get('archivo')
+        error = getattr(request, 'error_subida', None)
+        if not title:
+            error = 'El título es obligatorio'
+        if error:
+            return render(request, 'create_tasks.html', {'error': error})
+
+        task = Task.objects.create(
+            title=title,
+            description=request.POST.get('description', ''),
+            important='important' in request.POST,
+            estado_archivo=Task.EstadoArchivo.PENDIENTE if adjunto else '',
+            archivo_sha256=adjunto.sha256 if adjunto else '',
+            user=request.user
+        )
+        if adjunto:
+            # Mover el archivo a tareas/ no bloquea la respuesta
+            entregar_adjunto(task, adjunto)
+        encolar(analitica.registrar_creada, request.user.pk, task.created, task.important)
+        return redirect('tasks')
 
 @login_required
 def complete_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
-    task.datecompleted = timezone.now()
-    task.save()
+    # Un solo UPDATE; solo si falla vemos si la tarea no existe (404) o ya estaba completada
+    ahora = timezone.now()
+    if Task.objects.filter(id=task_id, user=request.user, datecompleted__isnull=True).update(datecompleted=ahora):
+        encolar(analitica.registrar_completadas, request.user.pk, ahora)
+    elif not Task.objects.filter(id=task_id, user=request.user).exists():
+        raise Http404("No existe la tarea")
     return redirect('tasks')
 
+@login_required
+def estadisticas_tareas(request):
+    semanas = _semanas(request)
+    resumen = analitica.resumen(request.user.pk, semanas)
+    return render(request, 'task_estadisticas.html', {
+        'resumen': resumen, 'semanas': semanas, 'opciones_semanas': analitica.SEMANAS_PERMITIDAS,
+        # Para el ancho de las barras
+        'maximo': max(s['completadas'] for s in resumen['semanas']) or 1,
+    })
+
+def _semanas(request):
+    try:
+        semanas = int(request.GET.get('semanas', 12))
+    except ValueError:
+        semanas = 12
+    return semanas if semanas in analitica.SEMANAS_PERMITIDAS else 12
+
 @login_required
 def hoja_vida(request):
-    datos = DatosPersonales.objects.filter(user=request.user).first()
-    return render(request, 'hoja_vida.html', {'perfil': datos})
+    datos = cargar_perfil(request.user)
+    version = None
+    if datos is not None:
+        version = datos.version_cv
+        # Las secciones solo se consultan si la página no está ya en la caché
+        if not fragmentos_cv_en_cache(datos.pk, version):
+            # Lo que se va a cachear se lee del primario: si el perfil vino de la réplica
+            # (atrasada) se vuelve a leer, para no guardar datos viejos con una versión nueva
+            with primario():
+                if datos._state.db != PRIMARIO:
+                    datos = cargar_perfil(request.user)
+                    version = datos.version_cv if datos is not None else None
+                if datos is not None:
+                    completar_cv(datos)
+    return render(request, 'hoja_vida.html', {
+        'perfil': datos, 'version_cv': version, 'cv_cache_timeout': settings.CV_CACHE_TIMEOUT,
+    })
+
+@login_required
+@require_POST
+def compartir_cv(request):
+    # Crea un enlace público nuevo (el anterior deja de funcionar) o, con 'revocar', lo quita
+    perfil = get_object_or_404(DatosPersonales, user=request.user)
+    perfil.slug_publico = None if 'revocar' in request.POST else secrets.token_urlsafe(16)
+    perfil.save(update_fields=['slug_publico'])
+    return redirect('hoja_vida')
+
+def _cabeceras_cv_publico(response, version):
+    response['ETag'] = f'"{version}"'
+    # Es igual para todos los visitantes: la pueden guardar el navegador y los proxies
+    patch_cache_control(response, public=True, max_age=settings.CV_PUBLICO_MAX_AGE)
+    # Es un enlace para compartir, no para los buscadores
+    response['X-Robots-Tag'] = 'noindex'
+    return response
+
+def _version_publica(slug):
+    return DatosPersonales.objects.filter(slug_publico=slug).values_list('pk', 'version_cv').first() or (None, None)
+
+def cv_publico(request, slug):
+    # No toca la sesión ni request.user (nada de Vary: Cookie): la página se guarda entera
+    # y, mientras la versión del CV (en la base, la misma para todos los workers) no
+    # cambie, se responde con una sola consulta y sin renderizar
+    perfil_id, version = _version_publica(slug)
+    if perfil_id is None:
+        raise Http404("CV no encontrado")
+    no_modificado = get_conditional_response(request, etag=f'"{version}"')
+    if no_modificado is not None:
+        return _cabeceras_cv_publico(no_modificado, version)
+
+    html = pagina_publica_en_cache(slug, version)
+    if html is None:
+        # Lo que se va a cachear se lee del primario: la réplica puede ir atrasada.
+        # La versión antes que los datos: si cambian mientras tanto, la copia ya nace vieja
+        with primario():
+            perfil_id, version = _version_publica(slug)
+            perfil = perfiles_completos(DatosPersonales.objects.filter(pk=perfil_id)).first()
+        if perfil is None:
+            raise Http404("CV no encontrado")
+        html = render_to_string('cv_publico.html', {'perfil': perfil, 'publico': True})
+        guardar_pagina_publica(slug, version, html)
+    return _cabeceras_cv_publico(HttpResponse(html), version)
 
 @login_required
 def editar_perfil(request):
     perfil, created = DatosPersonales.objects.get_or_create(user=request.user)
     
-    ExperienciaFormSet = inlineformset_factory(
-        DatosPersonales, ExperienciaLaboral, 
-        fields=['nombre_empresa', 'cargo_desempenado', 'fecha_inicio', 'fecha_fin'], 
-        widgets={
-            'fecha_inicio': widgets.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
-            'fecha_fin': widgets.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
-        },
-        extra=1, can_delete=True
-    )
-    
-    CursoFormSet = inlineformset_factory(DatosPersonales, Curso, fields=['nombre_curso', 'institucion', 'horas'], extra=1, can_delete=True)
-    ProdLabFormSet = inlineformset_factory(DatosPersonales, ProductoLaboral, fields=['nombre_producto', 'descripcion'], extra=1, can_delete=True)
-    ProdAcadFormSet = inlineformset_factory(DatosPersonales, ProductoAcademico, fields=['nombre_recurso', 'descripcion'], extra=1, can_delete=True)
-
     if request.method == 'POST':
         form = PerfilForm(request.POST, request.FILES, instance=perfil)
         formset_exp = ExperienciaFormSet(request.POST, instance=perfil)
@@ -112,15 +249,7 @@ def editar_perfil(request):
         is_valid = all([form.is_valid(), formset_exp.is_valid(), formset_cur.is_valid(), formset_lab.is_valid(), formset_acad.is_valid()])
 
         if is_valid:
-            perfil_obj = form.save()
-            formset_exp.instance = perfil_obj
-            formset_exp.save()
-            formset_cur.instance = perfil_obj
-            formset_cur.save()
-            formset_lab.instance = perfil_obj
-            formset_lab.save()
-            formset_acad.instance = perfil_obj
-            formset_acad.save()
+            guardar_perfil_completo(form, [formset_exp, formset_cur, formset_lab, formset_acad])
             return redirect('hoja_vida')
     else:
         form = PerfilForm(instance=perfil)
@@ -134,83 +263,75 @@ def editar_perfil(request):
         'formset_lab': formset_lab, 'formset_acad': formset_acad
     })
 
+def _datos_pdf(request):
+    # Buscamos el perfil del usuario actual con sus datos relacionados
+    perfil = cargar_cv(request.user)
+    return pdf.extraer_datos(perfil, request.user.username)
+
+def _respuesta_pdf(entrada, bloques, tamano):
+    # Se envía por partes: el PDF nunca se arma entero en la respuesta
+    response = StreamingHttpResponse(bloques, content_type='application/pdf')
+    response['Content-Length'] = tamano
+    response['Content-Disposition'] = f'attachment; filename="{entrada.nombre_archivo}"'
+    return _cabeceras_pdf(response, entrada)
+
+def _cabeceras_pdf(response, entrada):
+    response['ETag'] = entrada.etag
+    response['Last-Modified'] = http_date(entrada.generado)
+    # El navegador puede guardarlo, pero debe revalidar con el ETag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
 def descargar_cv_pdf(request):
-    # 1. Buscamos el perfil del usuario actual
-    perfil = DatosPersonales.objects.filter(user=request.user).first()
-    
-    # 2. Obtenemos datos relacionados usando los nombres de campos de models.py
-    experiencias = ExperienciaLaboral.objects.filter(perfil=perfil)
-    cursos = Curso.objects.filter(perfil=perfil)
-    
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=LETTER)
-    
-    # --- Estilo y Contenido del PDF ---
-    p.setFont("Helvetica-Bold", 20)
-    p.drawString(100, 750, "CURRÍCULUM VITAE")
-    
-    p.setFont("Helvetica-Bold", 14)
-    # Mostramos nombres y apellidos del modelo
-    nombre_completo = f"{perfil.nombres} {perfil.apellidos}" if perfil else request.user.username
-    p.drawString(100, 725, nombre_completo.upper())
-    p.line(100, 720, 500, 720)
-    
-    p.setFont("Helvetica", 11)
-    y = 690
-    
-    if perfil:
-
-        # Usamos 'cedula' porque no hay campo 'telefono' en tu modelo
-        p.drawString(100, y, f"Cédula: {perfil.cedula}")
-        y -= 20
-        # Usamos 'direccion_domiciliaria' que es el nombre correcto
-        p.drawString(100, y, f"Ubicación: {perfil.direccion_domiciliaria}")
-        y -= 40
-
-        # Sección de Experiencia Laboral
-        p.setFont("Helvetica-Bold", 13)
-        p.drawString(100, y, "EXPERIENCIA LABORAL")
-        y -= 20
-        p.setFont("Helvetica", 11)
-        for exp in experiencias:
-            p.drawString(100, y, f"• {exp.cargo_desempenado} en {exp.nombre_empresa}")
-            y -= 15
-            p.setFont("Helvetica-Oblique", 9)
-            p.drawString(115, y, f"({exp.fecha_inicio} a {exp.fecha_fin})")
-            y -= 25
-            if y < 100: # Control de salto de página
-                p.showPage()
-                y = 750
-
-        # Sección de Cursos
-        y -= 10
-        p.setFont("Helvetica-Bold", 13)
-        p.drawString(100, y, "CURSOS Y FORMACIÓN")
-        y -= 20
-        p.setFont("Helvetica", 11)
-        for c in cursos:
-            p.drawString(100, y, f"• {c.nombre_curso} ({c.institucion}) - {c.horas}h")
-            y -= 20
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-
-    # --- NOMBRE DINÁMICO ---
-    if perfil and perfil.nombres and perfil.apellidos:
-        # Reemplazamos espacios por guiones bajos para que el nombre del archivo sea limpio
-        nombre_limpio = f"{perfil.nombres}_{perfil.apellidos}".replace(" ", "_")
-        nombre_archivo = f"CV_{nombre_limpio}.pdf"
-    else:
-        # Si no tiene perfil, usamos su nombre de usuario de Django
-        nombre_archivo = f"CV_{request.user.username}.pdf"
+    # 1. Si ya generamos este CV y nada cambió desde entonces, solo leemos su versión.
+    # La versión antes que los datos: si cambian mientras tanto, la entrada ya nace vieja
+    datos = None
+    version = version_de_usuario(request.user)
+    entrada = cache_pdf.vigente(request.user.pk, version)
 
-    return HttpResponse(
-        buffer, 
-        content_type='application/pdf', 
-        headers={'Content-Disposition': f'attachment; filename="{nombre_archivo}"'}
-    )
+    if entrada is None:
+        datos = _datos_pdf(request)
+        huella = pdf.huella(datos)
+        entrada = cache_pdf.obtener(huella) or EntradaPDF(huella=huella, nombre_archivo=pdf.nombre_archivo(datos))
+        cache_pdf.guardar(request.user.pk, version, entrada)
+
+    # 2. 304 si el navegador ya tiene esta misma versión
+    no_modificado = get_conditional_response(request, etag=entrada.etag, last_modified=entrada.generado)
+    if no_modificado is not None:
+        return _cabeceras_pdf(no_modificado, entrada)
+
+    # 3. Mismo contenido => mismo PDF: solo dibujamos si no lo tenemos guardado
+    if entrada.contenido is not None:
+        return _respuesta_pdf(entrada, pdf.iterar_bytes(entrada.contenido), len(entrada.contenido))
+
+    if datos is None:
+        datos = _datos_pdf(request)
+    # Hasta CV_PDF_SPOOL_MAX_BYTES se genera en memoria; si es más grande pasa a un archivo temporal
+    archivo = tempfile.SpooledTemporaryFile(max_size=settings.CV_PDF_SPOOL_MAX_BYTES)
+    with medir('pdf'):
+        pdf.renderizar(datos, archivo)
+    tamano = archivo.tell()
+    archivo.seek(0)
+
+    if tamano <= settings.CV_PDF_CACHE_MAX_BYTES_ENTRADA:
+        entrada.contenido = archivo.read()
+        archivo.close()
+        return _respuesta_pdf(entrada, pdf.iterar_bytes(entrada.contenido), tamano)
+    return _respuesta_pdf(entrada, pdf.iterar_archivo(archivo), tamano)
+
+@staff_member_required
+def buscar_cvs(request):
+    # Búsqueda de candidatos por nombre, empresa, cargo, curso, institución o producto
+    q = request.GET.get('q', '').strip()
+    try:
+        pagina = max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        pagina = 1
+    perfiles, hay_siguiente = busqueda.buscar(q, pagina, settings.CV_SEARCH_PAGE_SIZE)
+    return render(request, 'buscar_cvs.html', {
+        'q': q, 'perfiles': perfiles, 'pagina': pagina, 'hay_siguiente': hay_siguiente,
+    })
 
 def helloworld(request):
     return render(request, 'helloworld.html')
\ No newline at end of file
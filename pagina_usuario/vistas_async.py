@@ -0,0 +1,148 @@
+# Versiones async de las páginas de solo lectura, para cuando el proyecto corre bajo ASGI
+# (mi_proyecto/urls_asgi.py). Hacen lo mismo que las de views.py con la API async del ORM,
+# y el PDF se dibuja en un pool de hilos acotado: el event loop sigue atendiendo a los
+# demás mientras tanto. Bajo WSGI siguen usándose las de views.py.
+import asyncio
+import contextvars
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+
+from . import pdf
+from .cv import acargar_cv, acargar_perfil, acompletar_cv, aversion_de_usuario, fragmentos_cv_en_cache
+from .metricas import medir
+from .models import Task
+from .paginacion import apagina_keyset
+from .pdf_cache import cache_pdf, EntradaPDF
+from .replicas import PRIMARIO, primario
+from .views import LISTAS_TAREAS, _cabeceras_pdf, _respuesta_pdf
+
+_ejecutor_pdf = None
+
+
+def _obtener_ejecutor_pdf():
+    global _ejecutor_pdf
+    if _ejecutor_pdf is None:
+        _ejecutor_pdf = ThreadPoolExecutor(max_workers=settings.CV_PDF_HILOS, thread_name_prefix='pdf')
+    return _ejecutor_pdf
+
+
+async def _usuario(request):
+    # Reemplazamos el usuario perezoso del middleware: al renderizar en el event loop
+    # las plantillas no pueden consultar la base de datos
+    request.user = await request.auser()
+    return request.user
+
+
+async def _pagina_tareas(user, lista, cursor=None):
+    plantilla, campo, filtro = LISTAS_TAREAS[lista]
+    tareas, siguiente = await apagina_keyset(
+        Task.objects.filter(user=user, **filtro), campo, cursor, settings.TASKS_PAGE_SIZE
+    )
+    return plantilla, {'tareas': tareas, 'siguiente': siguiente, 'lista': lista}
+
+
+@login_required
+async def tasks(request):
+    user = await _usuario(request)
+    lista = request.GET.get('lista')
+    if lista in LISTAS_TAREAS:
+        plantilla, contexto = await _pagina_tareas(user, lista, request.GET.get('cursor'))
+        return render(request, plantilla, contexto)
+
+    await acargar_perfil(user)  # la foto de base.html
+    _, pendientes = await _pagina_tareas(user, 'pendientes')
+    _, completadas = await _pagina_tareas(user, 'completadas')
+    return render(request, 'task.html', {'pendientes': pendientes, 'completadas': completadas})
+
+
+@login_required
+async def hoja_vida(request):
+    user = await _usuario(request)
+    datos = await acargar_perfil(user)
+    version = None
+    if datos is not None:
+        version = datos.version_cv
+        if not fragmentos_cv_en_cache(datos.pk, version):
+            # Como en views.hoja_vida: lo que se va a cachear se lee del primario
+            with primario():
+                if datos._state.db != PRIMARIO:
+                    datos = await acargar_perfil(user)
+                    version = datos.version_cv if datos is not None else None
+                if datos is not None:
+                    await acompletar_cv(datos)
+    return render(request, 'hoja_vida.html', {
+        'perfil': datos, 'version_cv': version, 'cv_cache_timeout': settings.CV_CACHE_TIMEOUT,
+    })
+
+
+async def _datos_pdf(user):
+    perfil = await acargar_cv(user)
+    return pdf.extraer_datos(perfil, user.username)
+
+
+def _renderizar(datos):
+    # Corre en el pool de PDFs: dibuja y, si entra en la caché, lo lee completo.
+    # Devuelve (contenido, archivo, tamano); uno de los dos primeros es None.
+    archivo = tempfile.SpooledTemporaryFile(max_size=settings.CV_PDF_SPOOL_MAX_BYTES)
+    with medir('pdf'):
+        pdf.renderizar(datos, archivo)
+    tamano = archivo.tell()
+    archivo.seek(0)
+    if tamano <= settings.CV_PDF_CACHE_MAX_BYTES_ENTRADA:
+        with archivo:
+            return archivo.read(), None, tamano
+    return None, archivo, tamano
+
+
+async def _iterar_bytes(contenido):
+    for bloque in pdf.iterar_bytes(contenido):
+        yield bloque
+
+
+async def _iterar_archivo(archivo):
+    # Puede estar en disco: cada lectura va a un hilo
+    leer = sync_to_async(archivo.read, thread_sensitive=False)
+    try:
+        while bloque := await leer(pdf.TAMANO_BLOQUE):
+            yield bloque
+    finally:
+        archivo.close()
+
+
+@login_required
+async def descargar_cv_pdf(request):
+    # Mismos pasos que views.descargar_cv_pdf
+    user = await _usuario(request)
+    datos = None
+    version = await aversion_de_usuario(user)
+    entrada = cache_pdf.vigente(user.pk, version)
+
+    if entrada is None:
+        datos = await _datos_pdf(user)
+        huella = pdf.huella(datos)
+        entrada = cache_pdf.obtener(huella) or EntradaPDF(huella=huella, nombre_archivo=pdf.nombre_archivo(datos))
+        cache_pdf.guardar(user.pk, version, entrada)
+
+    no_modificado = get_conditional_response(request, etag=entrada.etag, last_modified=entrada.generado)
+    if no_modificado is not None:
+        return _cabeceras_pdf(no_modificado, entrada)
+
+    if entrada.contenido is not None:
+        return _respuesta_pdf(entrada, _iterar_bytes(entrada.contenido), len(entrada.contenido))
+
+    if datos is None:
+        datos = await _datos_pdf(user)
+    # copy_context: medir('pdf') suma a la medición de esta petición desde el hilo del pool
+    contenido, archivo, tamano = await asyncio.get_running_loop().run_in_executor(
+        _obtener_ejecutor_pdf(), contextvars.copy_context().run, _renderizar, datos
+    )
+    if contenido is not None:
+        entrada.contenido = contenido
+        return _respuesta_pdf(entrada, _iterar_bytes(contenido), tamano)
+    return _respuesta_pdf(entrada, _iterar_archivo(archivo), tamano)